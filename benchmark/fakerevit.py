@@ -0,0 +1,1404 @@
+# In-memory stand-in for the parts of Autodesk.Revit.DB, RevitServices, System and clr used by main.py.
+# It keeps enough geometry and parameter state to run every splitter, and counts each API call and
+# transaction so the benchmark can report them on a machine without Revit.
+import math
+import sys
+import types
+from collections import defaultdict
+
+
+# Global counters shared by every fake object. Reset with resetCounters()
+class Counters:
+
+	apiCalls = defaultdict(int)
+	transactions = 0
+	regenerations = 0
+
+
+def resetCounters():
+	Counters.apiCalls = defaultdict(int)
+	Counters.transactions = 0
+	Counters.regenerations = 0
+
+
+def count(name):
+	Counters.apiCalls[name] += 1
+
+
+# ---------------------------------------------------------------------------------------------------------------
+# Basic value types
+# ---------------------------------------------------------------------------------------------------------------
+
+class ElementId(object):
+
+	def __init__(self, value):
+		self.IntegerValue = int(value)
+
+	def __eq__(self, other):
+		return isinstance(other, ElementId) and other.IntegerValue == self.IntegerValue
+
+	def __ne__(self, other):
+		return not self.__eq__(other)
+
+	def __hash__(self):
+		return hash(self.IntegerValue)
+
+	def __repr__(self):
+		return "ElementId(%d)" % self.IntegerValue
+
+
+ElementId.InvalidElementId = ElementId(-1)
+
+
+class WorksetId(ElementId):
+
+	def __eq__(self, other):
+		return isinstance(other, WorksetId) and other.IntegerValue == self.IntegerValue
+
+	def __hash__(self):
+		return hash(("WorksetId", self.IntegerValue))
+
+	def __repr__(self):
+		return "WorksetId(%d)" % self.IntegerValue
+
+
+class XYZ(object):
+
+	def __init__(self, x=0.0, y=0.0, z=0.0):
+		self.X = float(x)
+		self.Y = float(y)
+		self.Z = float(z)
+
+	def __add__(self, other):
+		return XYZ(self.X + other.X, self.Y + other.Y, self.Z + other.Z)
+
+	def __sub__(self, other):
+		return XYZ(self.X - other.X, self.Y - other.Y, self.Z - other.Z)
+
+	def __mul__(self, value):
+		return XYZ(self.X * value, self.Y * value, self.Z * value)
+
+	def DistanceTo(self, other):
+		return math.sqrt((self.X - other.X) ** 2 + (self.Y - other.Y) ** 2 + (self.Z - other.Z) ** 2)
+
+	def IsAlmostEqualTo(self, other, tolerance=1e-9):
+		count("XYZ.IsAlmostEqualTo")
+		return self.DistanceTo(other) <= max(tolerance, 1e-9)
+
+	def __repr__(self):
+		return "XYZ(%.4f, %.4f, %.4f)" % (self.X, self.Y, self.Z)
+
+
+class Outline(object):
+
+	def __init__(self, minimumPoint, maximumPoint):
+		self.MinimumPoint = minimumPoint
+		self.MaximumPoint = maximumPoint
+
+
+class BoundingBoxXYZ(object):
+
+	def __init__(self, minimum, maximum):
+		self.Min = minimum
+		self.Max = maximum
+
+
+class Line(object):
+
+	def __init__(self, start, end):
+		self.start = start
+		self.end = end
+
+	@staticmethod
+	def CreateBound(start, end):
+		count("Line.CreateBound")
+		return Line(start, end)
+
+	def GetEndPoint(self, index):
+		return self.start if index == 0 else self.end
+
+	@property
+	def Length(self):
+		return self.start.DistanceTo(self.end)
+
+
+class LocationCurve(object):
+
+	def __init__(self, owner, curve):
+		self.owner = owner
+		self._curve = curve
+
+	@property
+	def Curve(self):
+		return self._curve
+
+	@Curve.setter
+	def Curve(self, curve):
+		count("LocationCurve.set_Curve")
+		self._curve = curve
+		self.owner.curveChanged()
+
+
+class LocationPoint(object):
+
+	def __init__(self, point):
+		self.Point = point
+
+
+# .NET generic list stand-in, used as List[ElementId](iterable)
+class _GenericList(list):
+
+	def __init__(self, iterable=()):
+		list.__init__(self, iterable)
+
+	@property
+	def Count(self):
+		return len(self)
+
+	def Add(self, item):
+		self.append(item)
+
+
+class _ListFactory(object):
+
+	def __getitem__(self, itemType):
+		return _GenericList
+
+
+# ---------------------------------------------------------------------------------------------------------------
+# Enumerations
+# ---------------------------------------------------------------------------------------------------------------
+
+class _Enum(object):
+
+	def __init__(self, name, prefix=""):
+		self.name = name
+		self.prefix = prefix
+
+	def __repr__(self):
+		return self.prefix + self.name
+
+
+class _EnumNamespace(object):
+
+	def __init__(self, prefix):
+		self._prefix = prefix
+		self._values = {}
+
+	def __getattr__(self, name):
+		if name.startswith("_"):
+			raise AttributeError(name)
+		values = self.__dict__["_values"]
+		if name not in values:
+			values[name] = _Enum(name, self._prefix + ".")
+		return values[name]
+
+
+BuiltInParameter = _EnumNamespace("BuiltInParameter")
+BuiltInCategory = _EnumNamespace("BuiltInCategory")
+StorageType = _EnumNamespace("StorageType")
+
+
+class StructuralType(object):
+
+	NonStructural = _Enum("StructuralType.NonStructural")
+	Column = _Enum("StructuralType.Column")
+	Beam = _Enum("StructuralType.Beam")
+
+
+# ---------------------------------------------------------------------------------------------------------------
+# Parameters
+# ---------------------------------------------------------------------------------------------------------------
+
+class Definition(object):
+
+	def __init__(self, name):
+		self.Name = name
+
+
+class Parameter(object):
+
+	def __init__(self, owner, key, name, value, readOnly=False):
+		self.owner = owner
+		self.key = key
+		self.Definition = Definition(name)
+		self.value = value
+		self.IsReadOnly = readOnly
+
+	def AsDouble(self):
+		count("Parameter.AsDouble")
+		return self.owner.parameterValue(self.key)
+
+	def AsElementId(self):
+		count("Parameter.AsElementId")
+		return self.owner.parameterValue(self.key)
+
+	def AsInteger(self):
+		count("Parameter.AsInteger")
+		return self.owner.parameterValue(self.key)
+
+	def AsString(self):
+		count("Parameter.AsString")
+		return self.owner.parameterValue(self.key)
+
+	def AsValueString(self):
+		return str(self.owner.parameterValue(self.key))
+
+	def Set(self, value):
+		count("Parameter.Set")
+		if self.IsReadOnly:
+			raise InvalidOperationException("Parameter %s is read-only" % self.Definition.Name)
+		self.owner.setParameterValue(self.key, value)
+		# Revit warns about every element which gets Mark value of another element (segments of split elements)
+		if self.key == "Mark" and value:
+			self.owner.Document.postFailure(FailureMessageAccessor(BuiltInFailures.GeneralFailures.DuplicateValue,
+				FailureSeverity.Warning, "Elements have duplicate 'Mark' values.", [self.owner.Id]))
+		return True
+
+	@property
+	def StorageType(self):
+		value = self.owner.parameterValue(self.key)
+		if isinstance(value, ElementId):
+			return StorageType.ElementId
+		if isinstance(value, float):
+			return StorageType.Double
+		if isinstance(value, int):
+			return StorageType.Integer
+		return StorageType.String
+
+	@property
+	def HasValue(self):
+		return self.owner.parameterValue(self.key) is not None
+
+
+class InvalidOperationException(Exception):
+	pass
+
+
+class ArgumentException(Exception):
+	pass
+
+
+# ---------------------------------------------------------------------------------------------------------------
+# Elements
+# ---------------------------------------------------------------------------------------------------------------
+
+_typeIds = {}
+
+
+def _typeIdOfClass(elementClass):
+	if elementClass not in _typeIds:
+		_typeIds[elementClass] = ElementId(-100 - len(_typeIds))
+	return _typeIds[elementClass]
+
+
+class Element(object):
+
+	# Category of the element (BuiltInCategory value)
+	builtInCategory = None
+	# Parameters exposed through get_Parameter, mapped to storage keys
+	builtInParameters = {}
+	# Parameters exposed through LookupParameter, mapped to storage keys
+	namedParameters = {"Mark": "Mark"}
+
+	def __init__(self, document):
+		self.Document = document
+		self.Id = None
+		self.values = {"Mark": None}
+		self.parameterObjects = {}
+		self.WorksetId = WorksetId(0)
+		self.CreatedPhaseId = None
+
+	def GetType(self):
+		count("Element.GetType")
+		return type(self)
+
+	# Each element class has one type
+	def GetTypeId(self):
+		count("Element.GetTypeId")
+		return _typeIdOfClass(type(self))
+
+	# Elements without category (ie. some hosted sub-elements) return None as in Revit
+	@property
+	def Category(self):
+		if self.builtInCategory is None:
+			return None
+		return Category(self.builtInCategory)
+
+	# Element deleted from its document is not valid any more
+	@property
+	def IsValidObject(self):
+		return self.Id is None or self.Document.elements.get(self.Id.IntegerValue) is self
+
+	def parameterValue(self, key):
+		return self.values.get(key)
+
+	def setParameterValue(self, key, value):
+		self.values[key] = value
+		self.parametersChanged()
+
+	def parametersChanged(self):
+		pass
+
+	def curveChanged(self):
+		pass
+
+	def parameter(self, key, name):
+		if key not in self.parameterObjects:
+			self.parameterObjects[key] = Parameter(self, key, name, None, key in self.readOnlyKeys())
+		return self.parameterObjects[key]
+
+	def readOnlyKeys(self):
+		return ()
+
+	def get_Parameter(self, builtInParameter):
+		count("Element.get_Parameter")
+		if isinstance(builtInParameter, Definition):
+			key = self.namedParameters.get(builtInParameter.Name)
+			if key is None:
+				return None
+			return self.parameter(key, builtInParameter.Name)
+		key = self.builtInParameters.get(builtInParameter.name)
+		if key is None:
+			return None
+		return self.parameter(key, builtInParameter.name)
+
+	def LookupParameter(self, name):
+		count("Element.LookupParameter")
+		key = self.namedParameters.get(name)
+		if key is None:
+			return None
+		return self.parameter(key, name)
+
+	def GetDependentElements(self, elementFilter):
+		count("Element.GetDependentElements")
+		return _GenericList(dependent.Id for dependent in self.dependents() if elementFilter.PassesElement(dependent))
+
+	def dependents(self):
+		return []
+
+	def get_BoundingBox(self, view):
+		count("Element.get_BoundingBox")
+		return self.boundingBox()
+
+	def boundingBox(self):
+		return None
+
+
+class Category(object):
+
+	def __init__(self, builtInCategory):
+		self.builtInCategory = builtInCategory
+		self.Name = builtInCategory.name.split("OST_")[-1] if builtInCategory else ""
+
+	@property
+	def Id(self):
+		return ElementId(-abs(hash(self.Name)) % 100000)
+
+
+class Level(Element):
+
+	builtInCategory = BuiltInCategory.OST_Levels
+	namedParameters = {"Elevation": "Elevation", "Name": "Name"}
+
+	def __init__(self, document, name, elevation, projectElevation=None):
+		Element.__init__(self, document)
+		self.Name = name
+		self.values["Elevation"] = elevation
+		self.values["ProjectElevation"] = elevation if projectElevation is None else projectElevation
+
+	@property
+	def Elevation(self):
+		count("Level.Elevation")
+		return self.values["Elevation"]
+
+	@Elevation.setter
+	def Elevation(self, value):
+		self.values["Elevation"] = value
+
+	@property
+	def ProjectElevation(self):
+		count("Level.ProjectElevation")
+		return self.values["ProjectElevation"]
+
+
+def _levelElevation(document, levelId):
+	level = document.elements.get(levelId.IntegerValue) if levelId is not None else None
+	return level.values["Elevation"] if level is not None else None
+
+
+class Wall(Element):
+
+	builtInCategory = BuiltInCategory.OST_Walls
+	builtInParameters = {
+		"WALL_BASE_CONSTRAINT": "BaseLevel",
+		"WALL_BASE_OFFSET": "BaseOffset",
+		"WALL_HEIGHT_TYPE": "TopLevel",
+		"WALL_TOP_OFFSET": "TopOffset",
+		"WALL_USER_HEIGHT_PARAM": "Height",
+		"ALL_MODEL_MARK": "Mark",
+	}
+
+	def __init__(self, document, curve, baseLevelId, baseOffset, topLevelId, topOffset, height=10.0):
+		Element.__init__(self, document)
+		self.Location = LocationCurve(self, curve)
+		self.values.update({
+			"BaseLevel": baseLevelId,
+			"BaseOffset": baseOffset,
+			"TopLevel": topLevelId,
+			"TopOffset": topOffset,
+			"Height": height,
+		})
+		self.openings = []
+
+	def readOnlyKeys(self):
+		return ("Height",) if self.values["TopLevel"] != ElementId.InvalidElementId else ()
+
+	def baseElevation(self):
+		return _levelElevation(self.Document, self.values["BaseLevel"]) + self.values["BaseOffset"]
+
+	def topElevation(self):
+		if self.values["TopLevel"] == ElementId.InvalidElementId:
+			return self.baseElevation() + self.values["Height"]
+		return _levelElevation(self.Document, self.values["TopLevel"]) + self.values["TopOffset"]
+
+	def parametersChanged(self):
+		if self.values["TopLevel"] != ElementId.InvalidElementId:
+			self.values["Height"] = self.topElevation() - self.baseElevation()
+
+	def dependents(self):
+		return [opening for opening in self.openings if opening.Id.IntegerValue in self.Document.elements]
+
+	def boundingBox(self):
+		start = self.Location.Curve.GetEndPoint(0)
+		end = self.Location.Curve.GetEndPoint(1)
+		return BoundingBoxXYZ(XYZ(min(start.X, end.X), min(start.Y, end.Y), self.baseElevation()),
+			XYZ(max(start.X, end.X), max(start.Y, end.Y), self.topElevation()))
+
+
+# Generic model opening hosted in a wall
+class Opening(Element):
+
+	builtInCategory = BuiltInCategory.OST_GenericModel
+	namedParameters = {"Mark": "Mark", "Level": "Level", "Elevation from Level": "Elevation"}
+
+	def __init__(self, document, host, levelId, elevation):
+		Element.__init__(self, document)
+		self.Host = host
+		self.values.update({"Level": levelId, "Elevation": elevation})
+
+
+class FamilySymbol(Element):
+
+	builtInCategory = BuiltInCategory.OST_StructuralColumns
+
+	def __init__(self, document, name):
+		Element.__init__(self, document)
+		self.Name = name
+
+
+class FamilyInstance(Element):
+
+	builtInCategory = BuiltInCategory.OST_StructuralColumns
+	builtInParameters = {
+		"FAMILY_BASE_LEVEL_PARAM": "BaseLevel",
+		"FAMILY_BASE_LEVEL_OFFSET_PARAM": "BaseOffset",
+		"FAMILY_TOP_LEVEL_PARAM": "TopLevel",
+		"FAMILY_TOP_LEVEL_OFFSET_PARAM": "TopOffset",
+		"SLANTED_COLUMN_BASE_CUT_STYLE": "BaseCutStyle",
+		"SLANTED_COLUMN_TOP_CUT_STYLE": "TopCutStyle",
+		"INSTANCE_LENGTH_PARAM": "Length",
+		"ALL_MODEL_MARK": "Mark",
+	}
+	namedParameters = {"Mark": "Mark", "Length": "Length"}
+
+	def __init__(self, document, symbol, point, baseLevelId, baseOffset, topLevelId, topOffset, slantedCurve=None):
+		Element.__init__(self, document)
+		self.Symbol = symbol
+		self.StructuralType = StructuralType.Column
+		self.IsSlantedColumn = slantedCurve is not None
+		if slantedCurve is not None:
+			self.Location = LocationCurve(self, slantedCurve)
+		else:
+			self.Location = LocationPoint(point)
+		self.values.update({
+			"BaseLevel": baseLevelId,
+			"BaseOffset": baseOffset,
+			"TopLevel": topLevelId,
+			"TopOffset": topOffset,
+			"BaseCutStyle": 0,
+			"TopCutStyle": 0,
+			"Length": 0.0,
+		})
+		self.parametersChanged()
+
+	def readOnlyKeys(self):
+		return ("Length",)
+
+	def GetTypeId(self):
+		count("Element.GetTypeId")
+		return self.Symbol.Id
+
+	def baseElevation(self):
+		return _levelElevation(self.Document, self.values["BaseLevel"]) + self.values["BaseOffset"]
+
+	def topElevation(self):
+		return _levelElevation(self.Document, self.values["TopLevel"]) + self.values["TopOffset"]
+
+	def parametersChanged(self):
+		if not self.IsSlantedColumn:
+			self.values["Length"] = self.topElevation() - self.baseElevation()
+		else:
+			self.values["Length"] = self.Location.Curve.Length
+
+	def curveChanged(self):
+		self.parametersChanged()
+
+	def boundingBox(self):
+		if self.IsSlantedColumn:
+			start = self.Location.Curve.GetEndPoint(0)
+			end = self.Location.Curve.GetEndPoint(1)
+			return BoundingBoxXYZ(XYZ(min(start.X, end.X), min(start.Y, end.Y), min(start.Z, end.Z)),
+				XYZ(max(start.X, end.X), max(start.Y, end.Y), max(start.Z, end.Z)))
+		point = self.Location.Point
+		return BoundingBoxXYZ(XYZ(point.X - 0.5, point.Y - 0.5, self.baseElevation()),
+			XYZ(point.X + 0.5, point.Y + 0.5, self.topElevation()))
+
+	# Splits slanted column at normalized parameter. Original keeps the lower part, returns id of the upper one
+	def Split(self, parameter):
+		count("FamilyInstance.Split")
+		if not self.IsSlantedColumn or parameter <= 0 or parameter >= 1:
+			raise ArgumentException("Invalid split parameter")
+		curve = self.Location.Curve
+		start = curve.GetEndPoint(0)
+		end = curve.GetEndPoint(1)
+		cutPoint = start + (end - start) * parameter
+		newElement = FamilyInstance(self.Document, self.Symbol, None, self.values["BaseLevel"], 0.0,
+			self.values["TopLevel"], self.values["TopOffset"], Line(cutPoint, end))
+		newElement.values.update(dict((key, value) for key, value in self.values.items() if key in ("Mark", "BaseCutStyle", "TopCutStyle")))
+		self.Location._curve = Line(start, cutPoint)
+		self.parametersChanged()
+		return self.Document.addElement(newElement).Id
+
+
+# Fitting created by NewUnionFitting
+class Union(Element):
+
+	builtInCategory = BuiltInCategory.OST_DuctFitting
+	builtInParameters = {"FAMILY_LEVEL_PARAM": "Level", "ALL_MODEL_MARK": "Mark"}
+
+	def __init__(self, document, origin):
+		Element.__init__(self, document)
+		self.Location = LocationPoint(origin)
+		self.values["Level"] = None
+
+
+class Group(Element):
+
+	builtInCategory = BuiltInCategory.OST_IOSModelGroups
+
+	def __init__(self, document, memberIds):
+		Element.__init__(self, document)
+		self.memberIds = list(memberIds)
+
+	def GetMemberIds(self):
+		return _GenericList(self.memberIds)
+
+
+# ---------------------------------------------------------------------------------------------------------------
+# MEP elements and connectors
+# ---------------------------------------------------------------------------------------------------------------
+
+class Connector(object):
+
+	def __init__(self, owner, index):
+		self.Owner = owner
+		self.index = index
+		self.connected = set()
+
+	@property
+	def Id(self):
+		count("Connector.Id")
+		return self.index
+
+	@property
+	def Origin(self):
+		count("Connector.Origin")
+		return self.Owner.Location.Curve.GetEndPoint(self.index)
+
+	@property
+	def AllRefs(self):
+		count("Connector.AllRefs")
+		return list(self.connected)
+
+	@property
+	def IsConnected(self):
+		return len(self.connected) > 0
+
+	def IsConnectedTo(self, other):
+		count("Connector.IsConnectedTo")
+		return other in self.connected
+
+	def ConnectTo(self, other):
+		count("Connector.ConnectTo")
+		if other in self.connected:
+			raise InvalidOperationException("Connectors are already connected")
+		self.connected.add(other)
+		other.connected.add(self)
+
+	def DisconnectFrom(self, other):
+		count("Connector.DisconnectFrom")
+		self.connected.discard(other)
+		other.connected.discard(self)
+
+
+class ConnectorManager(object):
+
+	def __init__(self, owner, numberOfConnectors=2):
+		self.owner = owner
+		self.connectors = [Connector(owner, i) for i in range(numberOfConnectors)]
+
+	def Lookup(self, index):
+		count("ConnectorManager.Lookup")
+		return self.connectors[index]
+
+	@property
+	def Connectors(self):
+		count("ConnectorManager.Connectors")
+		return list(self.connectors)
+
+
+class MEPCurve(Element):
+
+	builtInParameters = {
+		"RBS_START_LEVEL_PARAM": "BaseLevel",
+		"RBS_START_OFFSET_PARAM": "BaseOffset",
+		"ALL_MODEL_MARK": "Mark",
+	}
+
+	def __init__(self, document, curve, levelId):
+		Element.__init__(self, document)
+		self.Location = LocationCurve(self, curve)
+		self.ConnectorManager = ConnectorManager(self)
+		self.values.update({"BaseLevel": levelId, "BaseOffset": 0.0})
+		self.curveChanged()
+
+	# Changing reference level keeps the geometry in place, only the offset is recalculated
+	def setParameterValue(self, key, value):
+		self.values[key] = value
+		if key == "BaseLevel":
+			self.curveChanged()
+
+	def curveChanged(self):
+		level = self.Document.elements.get(self.values["BaseLevel"].IntegerValue) if self.values.get("BaseLevel") else None
+		if level is not None:
+			self.values["BaseOffset"] = self.Location.Curve.GetEndPoint(0).Z - level.values["Elevation"]
+
+	def boundingBox(self):
+		start = self.Location.Curve.GetEndPoint(0)
+		end = self.Location.Curve.GetEndPoint(1)
+		return BoundingBoxXYZ(XYZ(min(start.X, end.X), min(start.Y, end.Y), min(start.Z, end.Z)),
+			XYZ(max(start.X, end.X), max(start.Y, end.Y), max(start.Z, end.Z)))
+
+
+class Duct(MEPCurve):
+	builtInCategory = BuiltInCategory.OST_DuctCurves
+
+
+class Pipe(MEPCurve):
+	builtInCategory = BuiltInCategory.OST_PipeCurves
+
+
+class CableTray(MEPCurve):
+	builtInCategory = BuiltInCategory.OST_CableTray
+
+
+class Conduit(MEPCurve):
+	builtInCategory = BuiltInCategory.OST_Conduit
+
+
+def _breakCurve(document, elementId, point):
+	element = document.GetElement(elementId)
+	curve = element.Location.Curve
+	start = curve.GetEndPoint(0)
+	end = curve.GetEndPoint(1)
+	newElement = type(element)(document, Line(start, point), element.values["BaseLevel"])
+	newElement.values["Mark"] = element.values.get("Mark")
+	document.addElement(newElement)
+	# Connections of the start connector move to the new element
+	oldStart = element.ConnectorManager.connectors[0]
+	newStart = newElement.ConnectorManager.connectors[0]
+	for other in list(oldStart.connected):
+		oldStart.DisconnectFrom(other)
+		newStart.connected.add(other)
+		other.connected.add(newStart)
+	element.Location._curve = Line(point, end)
+	element.curveChanged()
+	return newElement.Id
+
+
+class MechanicalUtils(object):
+
+	@staticmethod
+	def BreakCurve(document, elementId, point):
+		count("MechanicalUtils.BreakCurve")
+		return _breakCurve(document, elementId, point)
+
+
+class PlumbingUtils(object):
+
+	@staticmethod
+	def BreakCurve(document, elementId, point):
+		count("PlumbingUtils.BreakCurve")
+		return _breakCurve(document, elementId, point)
+
+
+# ---------------------------------------------------------------------------------------------------------------
+# Utilities
+# ---------------------------------------------------------------------------------------------------------------
+
+def _cloneElement(document, element):
+	if isinstance(element, Wall):
+		clone = Wall(document, element.Location.Curve, None, 0.0, None, 0.0)
+	elif isinstance(element, FamilyInstance):
+		slantedCurve = element.Location.Curve if element.IsSlantedColumn else None
+		point = None if element.IsSlantedColumn else element.Location.Point
+		clone = FamilyInstance(document, element.Symbol, point, element.values["BaseLevel"], 0.0,
+			element.values["TopLevel"], 0.0, slantedCurve)
+		clone.StructuralType = element.StructuralType
+	elif isinstance(element, MEPCurve):
+		clone = type(element)(document, element.Location.Curve, element.values["BaseLevel"])
+	elif isinstance(element, Opening):
+		clone = type(element)(document, None, element.values["Level"], element.values["Elevation"])
+	else:
+		raise ArgumentException("Element can't be copied")
+	clone.values = dict(element.values)
+	document.addElement(clone)
+	copied = [clone]
+	if isinstance(element, Wall):
+		for opening in element.dependents():
+			openingClone = _cloneElement(document, opening)[0]
+			openingClone.Host = clone
+			clone.openings.append(openingClone)
+			copied.append(openingClone)
+	return copied
+
+
+class ElementTransformUtils(object):
+
+	@staticmethod
+	def CopyElement(document, elementId, translation):
+		count("ElementTransformUtils.CopyElement")
+		return _GenericList(element.Id for element in _cloneElement(document, document.GetElement(elementId)))
+
+	@staticmethod
+	def CopyElements(document, elementIds, translation):
+		count("ElementTransformUtils.CopyElements")
+		copied = []
+		for elementId in elementIds:
+			copied.extend(element.Id for element in _cloneElement(document, document.GetElement(elementId)))
+		return _GenericList(copied)
+
+
+class JoinGeometryUtils(object):
+
+	@staticmethod
+	def JoinGeometry(document, first, second):
+		count("JoinGeometryUtils.JoinGeometry")
+		key = document.joinKey(first, second)
+		if key in document.joins:
+			raise ArgumentException("The elements are already joined.")
+		firstBox = first.boundingBox()
+		secondBox = second.boundingBox()
+		if firstBox is None or secondBox is None or firstBox.Max.Z + 1e-6 < secondBox.Min.Z or secondBox.Max.Z + 1e-6 < firstBox.Min.Z:
+			raise ArgumentException("The elements are not intersecting.")
+		document.addJoin(key)
+
+	@staticmethod
+	def AreElementsJoined(document, first, second):
+		count("JoinGeometryUtils.AreElementsJoined")
+		return document.joinKey(first, second) in document.joins
+
+	@staticmethod
+	def GetJoinedElements(document, element):
+		count("JoinGeometryUtils.GetJoinedElements")
+		return _GenericList(ElementId(other) for other in sorted(document.joinedTo.get(element.Id.IntegerValue, ())))
+
+
+# ---------------------------------------------------------------------------------------------------------------
+# Filters and collector
+# ---------------------------------------------------------------------------------------------------------------
+
+class ElementFilter(object):
+
+	def PassesElement(self, element):
+		return True
+
+
+class ElementCategoryFilter(ElementFilter):
+
+	def __init__(self, builtInCategory):
+		self.builtInCategory = builtInCategory
+
+	def PassesElement(self, element):
+		return element.builtInCategory is self.builtInCategory
+
+
+class ElementMulticategoryFilter(ElementFilter):
+
+	def __init__(self, categories):
+		self.categories = list(categories)
+
+	def PassesElement(self, element):
+		return any(element.builtInCategory is category for category in self.categories)
+
+
+class BoundingBoxIntersectsFilter(ElementFilter):
+
+	def __init__(self, outline, inverted=False):
+		self.outline = outline
+
+	def PassesElement(self, element):
+		box = element.boundingBox()
+		if box is None:
+			return False
+		minimum = self.outline.MinimumPoint
+		maximum = self.outline.MaximumPoint
+		return not (box.Max.X < minimum.X or box.Min.X > maximum.X or box.Max.Y < minimum.Y or box.Min.Y > maximum.Y
+			or box.Max.Z < minimum.Z or box.Min.Z > maximum.Z)
+
+
+class LogicalOrFilter(ElementFilter):
+
+	def __init__(self, filters, second=None):
+		self.filters = list(filters) if second is None else [filters, second]
+
+	def PassesElement(self, element):
+		return any(elementFilter.PassesElement(element) for elementFilter in self.filters)
+
+
+class LogicalAndFilter(ElementFilter):
+
+	def __init__(self, filters, second=None):
+		self.filters = list(filters) if second is None else [filters, second]
+
+	def PassesElement(self, element):
+		return all(elementFilter.PassesElement(element) for elementFilter in self.filters)
+
+
+class ElementWorksetFilter(ElementFilter):
+
+	def __init__(self, worksetId, inverted=False):
+		self.worksetId = worksetId
+
+	def PassesElement(self, element):
+		return getattr(element, "WorksetId", None) == self.worksetId
+
+
+class ElementPhaseStatusFilter(ElementFilter):
+
+	def __init__(self, phaseId, status, inverted=False):
+		self.phaseId = phaseId
+
+	def PassesElement(self, element):
+		return getattr(element, "CreatedPhaseId", None) in (None, self.phaseId)
+
+
+class ElementOnPhaseStatus(object):
+
+	Existing = _Enum("ElementOnPhaseStatus.Existing")
+	New = _Enum("ElementOnPhaseStatus.New")
+
+
+class FilteredElementCollector(object):
+
+	def __init__(self, document, viewId=None):
+		count("FilteredElementCollector")
+		self.document = document
+		self.filters = []
+		self.excludeTypes = False
+
+	def WherePasses(self, elementFilter):
+		self.filters.append(elementFilter)
+		return self
+
+	def OfCategory(self, builtInCategory):
+		self.filters.append(ElementCategoryFilter(builtInCategory))
+		return self
+
+	def OfClass(self, elementType):
+		self.filters.append(_ClassFilter(elementType))
+		return self
+
+	def WhereElementIsNotElementType(self):
+		self.excludeTypes = True
+		return self
+
+	def _elements(self):
+		for element in list(self.document.elements.values()):
+			if self.excludeTypes and isinstance(element, FamilySymbol):
+				continue
+			if all(elementFilter.PassesElement(element) for elementFilter in self.filters):
+				yield element
+
+	def ToElements(self):
+		return _GenericList(self._elements())
+
+	def ToElementIds(self):
+		return _GenericList(element.Id for element in self._elements())
+
+	def GetElementCount(self):
+		return len(list(self._elements()))
+
+	def __iter__(self):
+		return self._elements()
+
+
+class _ClassFilter(ElementFilter):
+
+	def __init__(self, elementType):
+		self.elementType = elementType
+
+	def PassesElement(self, element):
+		return isinstance(element, self.elementType)
+
+
+# ---------------------------------------------------------------------------------------------------------------
+# Failures
+# ---------------------------------------------------------------------------------------------------------------
+
+class FailureSeverity(object):
+
+	Warning = _Enum("FailureSeverity.Warning")
+	Error = _Enum("FailureSeverity.Error")
+
+
+class FailureProcessingResult(object):
+
+	Continue = _Enum("FailureProcessingResult.Continue")
+	ProceedWithCommit = _Enum("FailureProcessingResult.ProceedWithCommit")
+	ProceedWithRollBack = _Enum("FailureProcessingResult.ProceedWithRollBack")
+
+
+class FailureDefinitionId(object):
+
+	def __init__(self, guid):
+		self.Guid = guid
+
+
+class BuiltInFailures(object):
+
+	class JoinElementsFailures(object):
+		JoiningDisjoint = FailureDefinitionId("JoiningDisjoint")
+		CannotJoinElementsError = FailureDefinitionId("CannotJoinElementsError")
+
+	class OverlapFailures(object):
+		WallsOverlap = FailureDefinitionId("WallsOverlap")
+		DuplicateInstances = FailureDefinitionId("DuplicateInstances")
+
+	class GeneralFailures(object):
+		DuplicateValue = FailureDefinitionId("DuplicateValue")
+
+
+class FailureMessageAccessor(object):
+
+	def __init__(self, definitionId, severity, description, elementIds=(), hasResolutions=True):
+		self.definitionId = definitionId
+		self.severity = severity
+		self.description = description
+		self.elementIds = list(elementIds)
+		self.hasResolutions = hasResolutions
+
+	def GetFailureDefinitionId(self):
+		return self.definitionId
+
+	def GetSeverity(self):
+		return self.severity
+
+	def GetDescriptionText(self):
+		return self.description
+
+	def GetFailingElementIds(self):
+		return _GenericList(self.elementIds)
+
+	def HasResolutions(self):
+		return self.hasResolutions
+
+
+class FailuresAccessor(object):
+
+	def __init__(self, messages, document=None):
+		self.messages = list(messages)
+		self.document = document
+		self.deleted = []
+		self.resolved = []
+
+	def GetDocument(self):
+		return self.document
+
+	def GetFailureMessages(self):
+		return list(self.messages)
+
+	def DeleteWarning(self, message):
+		self.deleted.append(message)
+
+	def ResolveFailure(self, message):
+		self.resolved.append(message)
+
+
+class IFailuresPreprocessor(object):
+
+	def PreprocessFailures(self, failuresAccessor):
+		return FailureProcessingResult.Continue
+
+
+class FailuresProcessingEventArgs(object):
+
+	def __init__(self, failuresAccessor):
+		self.failuresAccessor = failuresAccessor
+		self.result = FailureProcessingResult.Continue
+
+	def GetFailuresAccessor(self):
+		return self.failuresAccessor
+
+	def SetProcessingResult(self, result):
+		self.result = result
+
+	def GetProcessingResult(self):
+		return self.result
+
+
+# ---------------------------------------------------------------------------------------------------------------
+# Document, transactions
+# ---------------------------------------------------------------------------------------------------------------
+
+class _Creation(object):
+
+	def __init__(self, document):
+		self.document = document
+
+	def NewUnionFitting(self, first, second):
+		count("Document.Create.NewUnionFitting")
+		if not first.Origin.IsAlmostEqualTo(second.Origin):
+			raise InvalidOperationException("Connectors are not at the same location")
+		if first.IsConnected and second in first.connected:
+			raise InvalidOperationException("Connectors are already connected")
+		union = Union(self.document, first.Origin)
+		union.values["Level"] = first.Owner.values.get("BaseLevel")
+		self.document.addElement(union)
+		first.connected.add(second)
+		second.connected.add(first)
+		return union
+
+	def NewGroup(self, elementIds):
+		count("Document.Create.NewGroup")
+		ids = list(elementIds)
+		if not ids:
+			raise ArgumentException("Group can't be empty")
+		group = Group(self.document, ids)
+		self.document.addElement(group)
+		self.document.groupTypes += 1
+		return group
+
+
+class View(Element):
+
+	def __init__(self, document):
+		Element.__init__(self, document)
+
+
+class ProjectInfo(Element):
+
+	def __init__(self, document):
+		Element.__init__(self, document)
+		self.UniqueId = "fake-project-0000"
+
+
+class Document(object):
+
+	def __init__(self, title="FakeModel"):
+		self.Title = title
+		self.PathName = "C:\\Models\\%s.rvt" % title
+		self.elements = {}
+		self.nextId = 1000
+		self.joins = set()
+		# element id : ids of elements joined with it
+		self.joinedTo = defaultdict(set)
+		self.groupTypes = 0
+		self.Create = _Creation(self)
+		self.ActiveView = self.addElement(View(self))
+		self.ProjectInformation = self.addElement(ProjectInfo(self))
+		self.Application = _Application()
+		# Failures posted in the open transaction, they are processed when it is closed
+		self.pendingFailures = []
+		# Warnings which were not deleted by failure handlers and results of processing of failures
+		self.warnings = []
+		self.processingResults = []
+		# Number of sub-transactions rolled back. Rollback is only recorded, changes are not reverted
+		self.rolledBackSubTransactions = 0
+
+	def postFailure(self, message):
+		self.pendingFailures.append(message)
+
+	# Raises FailuresProcessing event with failures of closed transaction. Warnings which are left are kept in
+	# warnings. Rollback is only recorded, changes are not reverted
+	def processFailures(self):
+		if not self.pendingFailures:
+			return
+		failuresAccessor = FailuresAccessor(self.pendingFailures, self)
+		self.pendingFailures = []
+		arguments = FailuresProcessingEventArgs(failuresAccessor)
+		for handler in list(self.Application.handlers):
+			handler(self.Application, arguments)
+		self.processingResults.append(arguments.GetProcessingResult())
+		handled = failuresAccessor.deleted + failuresAccessor.resolved
+		self.warnings.extend(message for message in failuresAccessor.messages
+			if message not in handled and message.GetSeverity() == FailureSeverity.Warning)
+
+	def addElement(self, element):
+		element.Id = ElementId(self.nextId)
+		self.nextId += 1
+		self.elements[element.Id.IntegerValue] = element
+		return element
+
+	def joinKey(self, first, second):
+		a = first.Id.IntegerValue
+		b = second.Id.IntegerValue
+		return (a, b) if a < b else (b, a)
+
+	def addJoin(self, key):
+		self.joins.add(key)
+		self.joinedTo[key[0]].add(key[1])
+		self.joinedTo[key[1]].add(key[0])
+
+	def removeJoins(self, elementId):
+		for other in self.joinedTo.pop(elementId, ()):
+			self.joins.discard(self.joinKeyOfIds(elementId, other))
+			self.joinedTo[other].discard(elementId)
+
+	def joinKeyOfIds(self, a, b):
+		return (a, b) if a < b else (b, a)
+
+	def Equals(self, other):
+		return self is other
+
+	def GetElement(self, elementId):
+		count("Document.GetElement")
+		if elementId is None:
+			return None
+		if isinstance(elementId, ElementId):
+			return self.elements.get(elementId.IntegerValue)
+		return self.elements.get(int(elementId))
+
+	def Delete(self, elementIds):
+		count("Document.Delete")
+		if isinstance(elementIds, ElementId):
+			elementIds = [elementIds]
+		deleted = []
+		for elementId in list(elementIds):
+			element = self.elements.pop(elementId.IntegerValue, None)
+			if element is None:
+				continue
+			deleted.append(elementId)
+			for dependent in element.dependents():
+				self.elements.pop(dependent.Id.IntegerValue, None)
+				deleted.append(dependent.Id)
+			self.removeJoins(elementId.IntegerValue)
+			if isinstance(element, MEPCurve):
+				for connector in element.ConnectorManager.connectors:
+					for other in list(connector.connected):
+						connector.DisconnectFrom(other)
+		return _GenericList(deleted)
+
+	def Regenerate(self):
+		count("Document.Regenerate")
+		Counters.regenerations += 1
+
+	def GetWorksetTable(self):
+		return None
+
+	@property
+	def IsWorkshared(self):
+		return False
+
+
+class _Application(object):
+
+	def __init__(self):
+		self.handlers = []
+
+	@property
+	def FailuresProcessing(self):
+		return _Event(self.handlers)
+
+	@FailuresProcessing.setter
+	def FailuresProcessing(self, value):
+		pass
+
+
+class _Event(object):
+
+	def __init__(self, handlers):
+		self.handlers = handlers
+
+	def __iadd__(self, handler):
+		self.handlers.append(handler)
+		return self
+
+	def __isub__(self, handler):
+		if handler in self.handlers:
+			self.handlers.remove(handler)
+		return self
+
+
+# Dynamo TransactionManager stand-in. Every EnsureInTransaction opening a new transaction and every closing
+# TransactionTaskDone/ForceCloseTransaction is counted, each commit also counts as one regeneration. Failures posted
+# in the transaction are processed (FailuresProcessing event) when it is committed.
+class TransactionManager(object):
+
+	Instance = None
+
+	def __init__(self):
+		self.isOpen = False
+		self.document = None
+
+	def EnsureInTransaction(self, document):
+		count("TransactionManager.EnsureInTransaction")
+		if not self.isOpen:
+			self.isOpen = True
+			self.document = document
+			Counters.transactions += 1
+
+	def TransactionTaskDone(self):
+		count("TransactionManager.TransactionTaskDone")
+		self.close()
+
+	def ForceCloseTransaction(self):
+		count("TransactionManager.ForceCloseTransaction")
+		self.close()
+
+	# Commits open transaction, its failures are processed first
+	def close(self):
+		if self.isOpen:
+			self.isOpen = False
+			Counters.regenerations += 1
+			self.document.processFailures()
+
+
+TransactionManager.Instance = TransactionManager()
+
+
+class SubTransaction(object):
+
+	def __init__(self, document):
+		self.document = document
+		self.started = False
+
+	def Start(self):
+		count("SubTransaction.Start")
+		if not TransactionManager.Instance.isOpen:
+			raise InvalidOperationException("Sub-transaction can be started only inside open transaction")
+		self.started = True
+
+	def Commit(self):
+		count("SubTransaction.Commit")
+		self.started = False
+
+	def RollBack(self):
+		count("SubTransaction.RollBack")
+		self.started = False
+		self.document.rolledBackSubTransactions += 1
+
+	def HasStarted(self):
+		return self.started
+
+
+class TransactionGroup(object):
+
+	def __init__(self, document, name=""):
+		self.document = document
+		self.name = name
+		self.started = False
+
+	def Start(self):
+		count("TransactionGroup.Start")
+		if TransactionManager.Instance.isOpen:
+			raise InvalidOperationException("Transaction group can't be started while transaction is open")
+		self.started = True
+
+	def Assimilate(self):
+		count("TransactionGroup.Assimilate")
+		self.started = False
+
+	def Commit(self):
+		count("TransactionGroup.Commit")
+		self.started = False
+
+	def RollBack(self):
+		count("TransactionGroup.RollBack")
+		self.started = False
+
+	def HasStarted(self):
+		return self.started
+
+
+class DocumentManager(object):
+
+	Instance = None
+
+	def __init__(self):
+		self.CurrentDBDocument = None
+
+
+DocumentManager.Instance = DocumentManager()
+
+
+# Element passed by Dynamo through IN[0]. Only Id is used by the script
+class DynamoElement(object):
+
+	def __init__(self, element):
+		self.Id = element.Id.IntegerValue
+		self.InternalElement = element
+
+
+# ---------------------------------------------------------------------------------------------------------------
+# Module installation
+# ---------------------------------------------------------------------------------------------------------------
+
+def _module(name, **attributes):
+	module = types.ModuleType(name)
+	for key, value in attributes.items():
+		setattr(module, key, value)
+	sys.modules[name] = module
+	return module
+
+
+# Registers fake clr, System, RevitServices and Autodesk.Revit.DB modules in sys.modules
+def install():
+	_module("clr", AddReference=lambda name: None)
+	_module("System")
+	_module("System.Collections")
+	_module("System.Collections.Generic", List=_ListFactory())
+	_module("RevitServices")
+	_module("RevitServices.Persistence", DocumentManager=DocumentManager)
+	_module("RevitServices.Transactions", TransactionManager=TransactionManager)
+	_module("Autodesk")
+	_module("Autodesk.Revit")
+	mechanical = _module("Autodesk.Revit.DB.Mechanical", Duct=Duct, MechanicalUtils=MechanicalUtils)
+	plumbing = _module("Autodesk.Revit.DB.Plumbing", Pipe=Pipe, PlumbingUtils=PlumbingUtils)
+	electrical = _module("Autodesk.Revit.DB.Electrical", CableTray=CableTray, Conduit=Conduit)
+	structure = _module("Autodesk.Revit.DB.Structure", StructuralType=StructuralType)
+	module = _module("Autodesk.Revit.DB")
+	for name, value in globals().items():
+		if not name.startswith("_") and isinstance(value, type):
+			setattr(module, name, value)
+	module.BuiltInParameter = BuiltInParameter
+	module.BuiltInCategory = BuiltInCategory
+	module.StorageType = StorageType
+	module.Mechanical = mechanical
+	module.Plumbing = plumbing
+	module.Electrical = electrical
+	module.Structure = structure
+	sys.modules["Autodesk"].Revit = sys.modules["Autodesk.Revit"]
+	sys.modules["Autodesk.Revit"].DB = module
+	return module
@@ -0,0 +1,63 @@
+# Runs main.py against a fake document the same way the Dynamo Python node does
+import os
+import re
+import time
+import warnings
+
+import fakerevit as fr
+
+fr.install()
+
+SCRIPT_PATH = os.environ.get("ELEMENT_SPLITTER_SCRIPT", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py"))
+
+
+# Script source with values of Settings replaced by given ones ({name: value})
+def _scriptSource(settings=None):
+	with open(SCRIPT_PATH) as scriptFile:
+		source = scriptFile.read()
+	for name, value in (settings or {}).items():
+		source, replaced = re.subn(r"^(\t%s = ).*$" % name, lambda match: match.group(1) + repr(value), source, count=1, flags=re.M)
+		if not replaced:
+			raise KeyError("Unknown setting %s" % name)
+	return source
+
+
+def _compiledScript(settings=None):
+	source = _scriptSource(settings)
+	with warnings.catch_warnings():
+		warnings.simplefilter("ignore")
+		return compile(source, SCRIPT_PATH, "exec")
+
+
+# Executes the script. inputs is the list assigned to IN, document becomes CurrentDBDocument, settings overrides
+# values of Settings. Returns (OUT, seconds, counters snapshot)
+def runScript(document, inputs, settings=None):
+	fr.DocumentManager.Instance.CurrentDBDocument = document
+	fr.TransactionManager.Instance = fr.TransactionManager()
+	fr.resetCounters()
+	code = _compiledScript(settings)
+	scope = {"__name__": "__dynamo__", "IN": list(inputs)}
+	start = time.perf_counter()
+	exec(code, scope)
+	elapsed = time.perf_counter() - start
+	return scope.get("OUT"), elapsed, {
+		"apiCalls": dict(fr.Counters.apiCalls),
+		"transactions": fr.Counters.transactions,
+		"regenerations": fr.Counters.regenerations,
+	}
+
+
+def selection(elements):
+	return [fr.DynamoElement(element) for element in elements]
+
+
+# Returns namespace with classes and functions of the script, without running it. Document is an empty fake document
+def loadDefinitions(settings=None):
+	fr.DocumentManager.Instance.CurrentDBDocument = fr.Document("Definitions")
+	source = _scriptSource(settings)
+	source = source[:source.index("# #### RUNS HERE ####")]
+	scope = {"__name__": "__dynamo__", "IN": [[], True, False]}
+	with warnings.catch_warnings():
+		warnings.simplefilter("ignore")
+		exec(compile(source, SCRIPT_PATH, "exec"), scope)
+	return scope
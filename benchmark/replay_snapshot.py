@@ -0,0 +1,78 @@
+# Plans splits of a snapshot written by the script (Settings.SNAPSHOT_FILE) without Revit. Reports time of loading
+# and planning and numbers of split elements and segments per category.
+#
+# Usage (from repository root):
+#   python benchmark/replay_snapshot.py model.snapshot
+#   python benchmark/replay_snapshot.py model.snapshot --risers
+#   python benchmark/replay_snapshot.py --synthetic 50 10000 --save tower.snapshot
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import harness
+import synthetic
+
+
+def parseArguments(argv):
+	parser = argparse.ArgumentParser(description="Plans splits of ElementSplitter snapshot without Revit")
+	parser.add_argument("snapshot", nargs="?", help="snapshot file")
+	parser.add_argument("--synthetic", type=int, nargs=2, metavar=("LEVELS", "ELEMENTS"),
+		help="writes snapshot of synthetic tower first (dry run of the script)")
+	parser.add_argument("--save", help="path of snapshot of synthetic tower (temporary file by default)")
+	parser.add_argument("--batch-size", type=int, default=1000, help="number of records planned together")
+	parser.add_argument("--risers", action="store_true",
+		help="plans connected vertical MEP elements as risers (MEP_RISERS)")
+	parser.add_argument("--seed", type=int, default=0)
+	return parser.parse_args(argv)
+
+
+# Writes snapshot of synthetic tower by dry run of the script. Returns (path, seconds of the run)
+def writeSyntheticSnapshot(numberOfLevels, numberOfElements, path, seed):
+	document, levels, elements = synthetic.buildTower(numberOfLevels, numberOfElements, seed=seed)
+	out, seconds, counters = harness.runScript(document, [harness.selection(elements), True, True, True],
+		{"SNAPSHOT_FILE": path})
+	return path, seconds
+
+
+# Plans all records of snapshot. Returns (seconds of loading, seconds of planning, rows of report)
+def replay(path, batchSize, risers=False):
+	definitions = harness.loadDefinitions({"MEP_RISERS": risers})
+	start = time.perf_counter()
+	snapshot = definitions["readSnapshot"](path)
+	loaded = time.perf_counter()
+	planner = definitions["SplitPlanner"](snapshot.levelIndex)
+	rows = dict()
+	for i in range(0, len(snapshot), batchSize):
+		for plan in planner.planMany(snapshot.getRecords(i, i + batchSize)):
+			row = rows.setdefault(plan.record.kind, [0, 0, 0])
+			row[0] += 1
+			if plan.isSplit:
+				row[1] += 1
+				row[2] += plan.getNumberOfSegments()
+	planned = time.perf_counter()
+	return loaded - start, planned - loaded, rows
+
+
+def main(argv=None):
+	arguments = parseArguments(argv)
+	path = arguments.snapshot
+	if arguments.synthetic:
+		path = arguments.save or os.path.join(tempfile.mkdtemp(), "tower.snapshot")
+		path, seconds = writeSyntheticSnapshot(arguments.synthetic[0], arguments.synthetic[1], path, arguments.seed)
+		print("Snapshot %s written in %.3f s (%d bytes)" % (path, seconds, os.path.getsize(path)))
+	if path is None:
+		raise SystemExit("Snapshot file or --synthetic is required")
+	loading, planning, rows = replay(path, arguments.batch_size, arguments.risers)
+	print("Loaded in %.3f s, planned in %.3f s" % (loading, planning))
+	print("%-20s %10s %15s %10s" % ("Category", "Elements", "Split elements", "Segments"))
+	for kind in sorted(rows):
+		print("%-20s %10d %15d %10d" % ((kind,) + tuple(rows[kind])))
+	return rows
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,138 @@
+# Scaling benchmark of main.py. For each tower size (levels x elements) the script is run once for every splitter
+# class on a tower which contains only elements of that class and once on a tower with mixed categories.
+# Reports wall-clock time, number of API calls and number of transactions.
+# With --risers towers of risers of each MEP class are run instead, once with MEP_RISERS off and once on.
+#
+# Usage (from repository root):
+#   python benchmark/run_benchmark.py
+#   python benchmark/run_benchmark.py --levels 10 50 200 --elements 1000 10000 100000 --json results.json
+#   python benchmark/run_benchmark.py --levels 20 --risers 100 1000
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fakerevit as fr
+import harness
+import synthetic
+
+
+# Splitter class of main.py : category of synthetic element split by it
+SPLITTER_CATEGORIES = [
+	("WallSplitter", "Wall"),
+	("ColumnSplitter", "Column"),
+	("SlantedColumnSplitter", "SlantedColumn"),
+	("DuctSplitter", "Duct"),
+	("PipeSplitter", "Pipe"),
+	("ElectricalElementsSplitter (CableTray)", "CableTray"),
+	("ElectricalElementsSplitter (Conduit)", "Conduit"),
+]
+
+# Classes of synthetic riser segments
+RISER_CLASSES = [fr.Duct, fr.Pipe, fr.CableTray, fr.Conduit]
+
+
+def parseArguments(argv):
+	parser = argparse.ArgumentParser(description="Scaling benchmark of ElementSplitter on synthetic towers")
+	parser.add_argument("--levels", type=int, nargs="+", default=[10, 50, 200], help="numbers of levels of towers")
+	parser.add_argument("--elements", type=int, nargs="+", default=[1000, 10000], help="numbers of selected elements")
+	parser.add_argument("--crossing-ratio", type=float, default=0.3, help="share of elements crossing levels")
+	parser.add_argument("--max-span", type=int, default=4, help="maximal number of storeys of crossing element")
+	parser.add_argument("--no-group", action="store_true", help="don't group split elements (IN[2] = False)")
+	parser.add_argument("--dry-run", action="store_true", help="run script in dry run mode (IN[3] = True)")
+	parser.add_argument("--mixed-only", action="store_true", help="skip towers of one splitter class")
+	parser.add_argument("--risers", type=int, nargs="+", help="numbers of risers - runs towers of risers instead")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--json", help="writes results into given file")
+	parser.add_argument("--top-calls", type=int, default=0, help="prints given number of most frequent API calls")
+	return parser.parse_args(argv)
+
+
+# Runs script on one synthetic tower. Returns dictionary with results
+def runCase(splitterName, numberOfLevels, numberOfElements, mix, arguments):
+	document, levels, elements = synthetic.buildTower(numberOfLevels, numberOfElements, mix,
+		arguments.crossing_ratio, arguments.max_span, seed=arguments.seed)
+	return runScript(splitterName, document, levels, elements, arguments)
+
+
+# Runs script on one synthetic tower of risers with given MEP_RISERS. Returns dictionary with results
+def runRiserCase(numberOfLevels, numberOfRisers, elementClass, risers, arguments):
+	document, levels, elements = synthetic.buildRiserTower(numberOfLevels, numberOfRisers, elementClass,
+		arguments.max_span, seed=arguments.seed)
+	return runScript("%s risers, MEP_RISERS=%s" % (elementClass.__name__, risers), document, levels, elements,
+		arguments, {"MEP_RISERS": risers})
+
+
+# Runs script on elements of the document. Returns dictionary with results
+def runScript(splitterName, document, levels, elements, arguments, settings=None):
+	inputs = [harness.selection(elements), True, not arguments.no_group]
+	if arguments.dry_run:
+		inputs.append(True)
+	out, seconds, counters = harness.runScript(document, inputs, settings)
+	return {
+		"splitter": splitterName,
+		"levels": len(levels),
+		"elements": len(elements),
+		"seconds": seconds,
+		"apiCalls": sum(counters["apiCalls"].values()),
+		"transactions": counters["transactions"],
+		"regenerations": counters["regenerations"],
+		"apiCallsByName": counters["apiCalls"],
+		"out": out if arguments.dry_run else None,
+	}
+
+
+def printResult(result, arguments):
+	print("%-40s %7d %9d %10.3f %12d %12d %13d" % (result["splitter"], result["levels"], result["elements"],
+		result["seconds"], result["apiCalls"], result["transactions"], result["regenerations"]))
+	if arguments.top_calls:
+		calls = sorted(result["apiCallsByName"].items(), key=lambda item: -item[1])
+		for name, number in calls[:arguments.top_calls]:
+			print("%44s %-40s %d" % ("", name, number))
+
+
+def main(argv=None):
+	arguments = parseArguments(argv)
+	if arguments.risers:
+		return mainRisers(arguments)
+	cases = list()
+	if not arguments.mixed_only:
+		cases.extend((name, {category: 1.0}) for name, category in SPLITTER_CATEGORIES)
+	cases.append(("Mixed", synthetic.DEFAULT_MIX))
+	print("%-40s %7s %9s %10s %12s %12s %13s" % ("Splitter", "Levels", "Elements", "Time [s]", "API calls",
+		"Transactions", "Regenerations"))
+	results = list()
+	for numberOfLevels in arguments.levels:
+		for numberOfElements in arguments.elements:
+			for splitterName, mix in cases:
+				result = runCase(splitterName, numberOfLevels, numberOfElements, mix, arguments)
+				printResult(result, arguments)
+				results.append(result)
+	if arguments.json:
+		with open(arguments.json, "w") as resultsFile:
+			json.dump(results, resultsFile, indent=2, default=str)
+	return results
+
+
+# Runs towers of risers of each MEP class with MEP_RISERS off and on
+def mainRisers(arguments):
+	print("%-40s %7s %9s %10s %12s %12s %13s" % ("Splitter", "Levels", "Segments", "Time [s]", "API calls",
+		"Transactions", "Regenerations"))
+	results = list()
+	for numberOfLevels in arguments.levels:
+		for numberOfRisers in arguments.risers:
+			for elementClass in RISER_CLASSES:
+				for risers in (False, True):
+					result = runRiserCase(numberOfLevels, numberOfRisers, elementClass, risers, arguments)
+					printResult(result, arguments)
+					results.append(result)
+	if arguments.json:
+		with open(arguments.json, "w") as resultsFile:
+			json.dump(results, resultsFile, indent=2, default=str)
+	return results
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,134 @@
+# Checks of main.py on small fake documents built for one situation each. Every check runs the script and raises
+# AssertionError when the document doesn't end in the expected state.
+#
+# Usage (from repository root):
+#   python benchmark/scenarios.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fakerevit as fr
+import harness
+import synthetic
+
+
+# Returns walls of the document which vertical ranges are (bottom, top) with given x of start point
+def _wallsAt(document, x):
+	walls = list()
+	for element in document.elements.values():
+		if isinstance(element, fr.Wall) and element.Location.Curve.GetEndPoint(0).X == x:
+			walls.append(element)
+	return sorted(walls, key=lambda wall: wall.baseElevation())
+
+
+# Two corner-joined walls crossing the same levels are both selected. Each segment of one wall has to be joined with
+# the segment of the other wall on the same storey, although the original of the other wall is deleted by its split
+def checkJoinedWallsSplitTogether():
+	document = fr.Document("Joined walls")
+	levels = synthetic.createLevels(document, 4)
+	walls = list()
+	for x in (0.0, 20.0):
+		wall = fr.Wall(document, fr.Line(fr.XYZ(x, 0, 0), fr.XYZ(x + 20, 0, 0)), levels[0].Id, 0.0, levels[3].Id, 0.0)
+		document.addElement(wall)
+		wall.parametersChanged()
+		walls.append(wall)
+	document.addJoin(document.joinKey(walls[0], walls[1]))
+	out, seconds, counters = harness.runScript(document, [harness.selection(walls), True, False])
+	assert out == "done", out
+	first = _wallsAt(document, 0.0)
+	second = _wallsAt(document, 20.0)
+	assert len(first) == 3 and len(second) == 3, (len(first), len(second))
+	for i in range(3):
+		assert fr.JoinGeometryUtils.AreElementsJoined(document, first[i], second[i]), i
+	for i in range(2):
+		assert not fr.JoinGeometryUtils.AreElementsJoined(document, first[i], second[i + 1]), i
+
+
+# Hosted sub-element without category, copied together with its wall
+class _UncategorizedSubElement(fr.Opening):
+
+	builtInCategory = None
+
+
+# Wall hosts a sub-element without category. Wall is split and the sub-element copied with each segment is not
+# taken for a segment
+def checkWallWithUncategorizedSubElement():
+	document = fr.Document("Uncategorized sub-element")
+	levels = synthetic.createLevels(document, 4)
+	wall = fr.Wall(document, fr.Line(fr.XYZ(0, 0, 0), fr.XYZ(20, 0, 0)), levels[0].Id, 0.0, levels[3].Id, 0.0)
+	document.addElement(wall)
+	wall.parametersChanged()
+	subElement = _UncategorizedSubElement(document, wall, levels[1].Id, 2.0)
+	document.addElement(subElement)
+	wall.openings.append(subElement)
+	out, seconds, counters = harness.runScript(document, [harness.selection([wall]), True, False])
+	assert out == "done", out
+	assert len(_wallsAt(document, 0.0)) == 3, len(_wallsAt(document, 0.0))
+
+
+# Wall which can't be read is not split and is reported in OUT as skipped by the script
+def checkUnreadableWallReported():
+	document = fr.Document("Unreadable wall")
+	levels = synthetic.createLevels(document, 4)
+	wall = fr.Wall(document, fr.Line(fr.XYZ(0, 0, 0), fr.XYZ(20, 0, 0)), levels[0].Id, 0.0, levels[3].Id, 0.0)
+	document.addElement(wall)
+	wall.parametersChanged()
+	# Base offset parameter is not exposed by the wall
+	wall.builtInParameters = dict((name, key) for name, key in fr.Wall.builtInParameters.items()
+		if name != "WALL_BASE_OFFSET")
+	out, seconds, counters = harness.runScript(document, [harness.selection([wall]), True, False])
+	assert len(_wallsAt(document, 0.0)) == 1, len(_wallsAt(document, 0.0))
+	failures = [row for report in out[1:] for row in report if row[1:3] == ["Script", "Skipped"]]
+	assert len(failures) == 1 and failures[0][4] == [wall.Id.IntegerValue], out
+
+
+# Pipe riser with joints just above and below levels is selected in pieces between other pipes, so its segments fall
+# into different planning batches. In risers mode it is planned as a whole - levels next to joints don't cut it - and
+# the model is regenerated once for the riser
+def checkRiserAcrossBatches():
+	document = fr.Document("Riser across batches")
+	levels = synthetic.createLevels(document, 4)
+	segments = list()
+	for bottom, top in ((1.0, 12.2), (12.2, 23.8), (23.8, 38.0)):
+		segment = fr.Pipe(document, fr.Line(fr.XYZ(0, 0, bottom), fr.XYZ(0, 0, top)), levels[0].Id)
+		document.addElement(segment)
+		segment.curveChanged()
+		if segments:
+			segments[-1].ConnectorManager.connectors[1].ConnectTo(segment.ConnectorManager.connectors[0])
+		segments.append(segment)
+	others = list()
+	for x in (10.0, 20.0):
+		pipe = fr.Pipe(document, fr.Line(fr.XYZ(x, 0, 1.0), fr.XYZ(x, 0, 14.0)), levels[0].Id)
+		document.addElement(pipe)
+		pipe.curveChanged()
+		others.append(pipe)
+	selection = [segments[2], others[0], segments[0], others[1], segments[1]]
+	out, seconds, counters = harness.runScript(document, [harness.selection(selection), True, False],
+		{"MEP_RISERS": True, "PLANNING_BATCH_SIZE": 2})
+	assert out == "done", out
+	pieces = sorted([element for element in document.elements.values() if isinstance(element, fr.Pipe)
+		and element.Location.Curve.GetEndPoint(0).X == 0], key=lambda pipe: pipe.Location.Curve.GetEndPoint(0).Z)
+	lengths = [pipe.Location.Curve.GetEndPoint(1).Z - pipe.Location.Curve.GetEndPoint(0).Z for pipe in pieces]
+	assert len(pieces) == 4 and min(lengths) > 0.5, lengths
+	for i in range(len(pieces) - 1):
+		assert pieces[i].ConnectorManager.connectors[1].IsConnected and pieces[i + 1].ConnectorManager.connectors[0].IsConnected, i
+	assert counters["apiCalls"]["Document.Regenerate"] == 3, counters["apiCalls"]["Document.Regenerate"]
+
+
+CHECKS = [
+	checkJoinedWallsSplitTogether,
+	checkWallWithUncategorizedSubElement,
+	checkUnreadableWallReported,
+	checkRiserAcrossBatches,
+]
+
+
+def main():
+	for check in CHECKS:
+		check()
+		print("%s ok" % check.__name__)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,169 @@
+# Generator of synthetic towers for the benchmark suite. Builds a fake document with levels and a mix of walls,
+# columns, slanted columns, ducts, pipes, cable trays and conduits. Part of the elements crosses several levels,
+# the rest stays between two levels like in a regular "select all" input.
+import random
+
+import fakerevit as fr
+
+
+# Share of each category in generated selection
+DEFAULT_MIX = {
+	"Wall": 0.35,
+	"Column": 0.15,
+	"SlantedColumn": 0.05,
+	"Duct": 0.15,
+	"Pipe": 0.15,
+	"CableTray": 0.075,
+	"Conduit": 0.075,
+}
+
+
+# Creates levels with constant storey height. Returns list of levels sorted by elevation
+def createLevels(document, numberOfLevels, storeyHeight=12.0):
+	levels = list()
+	for i in range(numberOfLevels):
+		level = fr.Level(document, "Level %d" % i, i * storeyHeight)
+		document.addElement(level)
+		levels.append(level)
+	return levels
+
+
+# Picks base and top level indexes. crossingRatio decides how many elements go through at least one level
+def _levelRange(rnd, numberOfLevels, crossingRatio, maxSpan):
+	if rnd.random() < crossingRatio and numberOfLevels > 2:
+		base = rnd.randint(0, numberOfLevels - 3)
+		top = min(numberOfLevels - 1, base + rnd.randint(2, max(2, maxSpan)))
+	else:
+		base = rnd.randint(0, numberOfLevels - 2)
+		top = base + 1
+	return base, top
+
+
+def _addWall(document, rnd, levels, base, top, openingsPerLevel):
+	x = rnd.uniform(0, 1000)
+	y = rnd.uniform(0, 1000)
+	curve = fr.Line(fr.XYZ(x, y, 0), fr.XYZ(x + 20, y, 0))
+	if rnd.random() < 0.1:
+		# Unconnected wall with height instead of top constraint
+		height = levels[top].values["Elevation"] - levels[base].values["Elevation"] + 1.0
+		wall = fr.Wall(document, curve, levels[base].Id, 0.0, fr.ElementId.InvalidElementId, 0.0, height)
+	else:
+		wall = fr.Wall(document, curve, levels[base].Id, rnd.choice([0.0, 0.0, -0.5]), levels[top].Id, rnd.choice([0.0, 0.0, 1.0]))
+	wall.values["Mark"] = "W-%d" % rnd.randint(0, 99999)
+	document.addElement(wall)
+	wall.parametersChanged()
+	for i in range(base, top):
+		for j in range(openingsPerLevel):
+			opening = fr.Opening(document, wall, levels[i].Id, rnd.uniform(1.0, 9.0))
+			document.addElement(opening)
+			wall.openings.append(opening)
+	return wall
+
+
+def _addColumn(document, rnd, levels, base, top, symbol, slanted):
+	x = rnd.uniform(0, 1000)
+	y = rnd.uniform(0, 1000)
+	slantedCurve = None
+	if slanted:
+		bottom = levels[base].values["Elevation"]
+		upper = levels[top].values["Elevation"]
+		slantedCurve = fr.Line(fr.XYZ(x, y, bottom), fr.XYZ(x + 4, y + 2, upper))
+	column = fr.FamilyInstance(document, symbol, fr.XYZ(x, y, 0), levels[base].Id, 0.0, levels[top].Id, 0.0, slantedCurve)
+	column.values["Mark"] = "C-%d" % rnd.randint(0, 99999)
+	document.addElement(column)
+	column.parametersChanged()
+	return column
+
+
+def _addMEPCurve(document, rnd, levels, base, top, elementClass, vertical):
+	x = rnd.uniform(0, 1000)
+	y = rnd.uniform(0, 1000)
+	bottom = levels[base].values["Elevation"] + 1.0
+	if vertical:
+		upper = levels[top].values["Elevation"] + 2.0
+		start, end = fr.XYZ(x, y, bottom), fr.XYZ(x, y, upper)
+		if rnd.random() < 0.3:
+			start, end = end, start
+	else:
+		start, end = fr.XYZ(x, y, bottom + 6.0), fr.XYZ(x + 30, y, bottom + 6.0)
+	element = elementClass(document, fr.Line(start, end), levels[base].Id)
+	document.addElement(element)
+	element.curveChanged()
+	return element
+
+
+# Builds tower. Returns (document, levels, elements) where elements are Revit elements to pass as selection
+def buildTower(numberOfLevels, numberOfElements, mix=None, crossingRatio=0.3, maxSpan=4, openingsPerLevel=1, seed=0):
+	rnd = random.Random(seed)
+	mix = mix or DEFAULT_MIX
+	document = fr.Document("Tower_%dL_%dE" % (numberOfLevels, numberOfElements))
+	levels = createLevels(document, numberOfLevels)
+	symbol = document.addElement(fr.FamilySymbol(document, "Concrete-Square"))
+	categories = sorted(mix)
+	weights = [mix[category] for category in categories]
+	elements = list()
+	for i in range(numberOfElements):
+		category = rnd.choices(categories, weights)[0]
+		base, top = _levelRange(rnd, numberOfLevels, crossingRatio, maxSpan)
+		if category == "Wall":
+			elements.append(_addWall(document, rnd, levels, base, top, openingsPerLevel))
+		elif category == "Column":
+			elements.append(_addColumn(document, rnd, levels, base, top, symbol, False))
+		elif category == "SlantedColumn":
+			elements.append(_addColumn(document, rnd, levels, base, top, symbol, True))
+		else:
+			elementClass = {"Duct": fr.Duct, "Pipe": fr.Pipe, "CableTray": fr.CableTray, "Conduit": fr.Conduit}[category]
+			elements.append(_addMEPCurve(document, rnd, levels, base, top, elementClass, top > base + 1))
+	return document, levels, elements
+
+
+# Builds a riser: collinear vertical segments connected end to end, spanning given levels
+def buildRiser(document, levels, elementClass, base, top, numberOfSegments, x=0.0, y=0.0):
+	bottom = levels[base].values["Elevation"] + 1.0
+	upper = levels[top].values["Elevation"] + 2.0
+	step = (upper - bottom) / numberOfSegments
+	segments = list()
+	for i in range(numberOfSegments):
+		start = fr.XYZ(x, y, bottom + i * step)
+		end = fr.XYZ(x, y, bottom + (i + 1) * step)
+		element = elementClass(document, fr.Line(start, end), levels[base].Id)
+		document.addElement(element)
+		element.curveChanged()
+		if segments:
+			segments[-1].ConnectorManager.connectors[1].ConnectTo(element.ConnectorManager.connectors[0])
+		segments.append(element)
+	return segments
+
+
+# Builds tower of risers. Each riser spans random storeys and is made of segments about one storey long, part of the
+# joints of segments lies just above or below a level. Segments of all risers are shuffled in the selection, so
+# segments of one riser are far from each other. Returns (document, levels, elements)
+def buildRiserTower(numberOfLevels, numberOfRisers, elementClass, maxSpan=6, nearJointRatio=0.3, seed=0):
+	rnd = random.Random(seed)
+	document = fr.Document("Risers_%dL_%dR" % (numberOfLevels, numberOfRisers))
+	levels = createLevels(document, numberOfLevels)
+	elements = list()
+	for i in range(numberOfRisers):
+		base = rnd.randint(0, numberOfLevels - 3)
+		top = min(numberOfLevels - 1, base + rnd.randint(2, max(2, maxSpan)))
+		joints = [levels[base].values["Elevation"] + 1.0]
+		for j in range(base + 1, top):
+			elevation = levels[j].values["Elevation"]
+			if rnd.random() < nearJointRatio:
+				joints.append(elevation + rnd.choice([-0.2, 0.2]))
+			else:
+				joints.append(elevation + rnd.uniform(2.0, 8.0))
+		joints.append(levels[top].values["Elevation"] + 2.0)
+		x = rnd.uniform(0, 1000)
+		y = rnd.uniform(0, 1000)
+		segments = list()
+		for j in range(len(joints) - 1):
+			element = elementClass(document, fr.Line(fr.XYZ(x, y, joints[j]), fr.XYZ(x, y, joints[j + 1])), levels[base].Id)
+			document.addElement(element)
+			element.curveChanged()
+			if segments:
+				segments[-1].ConnectorManager.connectors[1].ConnectTo(element.ConnectorManager.connectors[0])
+			segments.append(element)
+		elements.extend(segments)
+	rnd.shuffle(elements)
+	return document, levels, elements
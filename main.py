@@ -1,5 +1,15 @@
 import clr
 import math
+import bisect
+import time
+import json
+import gc
+import struct
+# numpy is optional - it is not available in IronPython. Without it MEP cuts are computed in a plain loop
+try:
+	import numpy
+except ImportError:
+	numpy = None
 from sys import path as sysPath
 sysPath.append("C:\Program Files (x86)\IronPython 2.7\Lib")
 
@@ -33,309 +43,2137 @@ class Settings:
 	# Rounding number of digits
 	ROUNDING = 3
 
-# Function dedicated for getting levels depending upon the condition
-# Returns list of levels sorted by elevation
-def getListOfLevelIds(doc, getAllLevels = IN[1]):
-		
+	# Granularity of transactions: "Run" - one transaction around the whole run, "Element" - one transaction per
+	# split element, "Chunk" - one transaction per TRANSACTION_CHUNK_SIZE split elements
+	TRANSACTION_SCOPE = "Run"
+
+	# Number of split elements committed together in "Chunk" transaction scope
+	TRANSACTION_CHUNK_SIZE = 50
+
+	# Time of one chunk (in seconds). If it is set, size of next chunk is changed after each commit according to
+	# measured time of split elements, starting from TRANSACTION_CHUNK_SIZE. If None chunk size is constant
+	TRANSACTION_CHUNK_TIME = None
+
+	# Regenerates document before each commit
+	CHUNK_REGENERATE = False
+
+	# Collects garbage after each commit, so memory of released elements is freed before next chunk
+	CHUNK_COLLECT_GARBAGE = False
+
+	# Groups of split elements (IN[2]) created at the end of the run: "Element" - group of pieces of each split
+	# element, "Level" - group of pieces on each level, "Category" - group of pieces of each category, "Run" - one
+	# group of all pieces
+	GROUPING = "Element"
+
+	# Wraps transactions of "Element" and "Chunk" scope into one transaction group, so the run is one undo step
+	TRANSACTION_GROUP = True
+
+	# Counts calls and measures time of each phase of splitting per element class. Without profiling methods are
+	# not wrapped at all
+	PROFILE = False
+
+	# Path of a file where profile summary is written. If None summary is returned in OUT together with result
+	PROFILE_FILE = None
+
+	# Skips elements which don't cross any level before splitters are created. Vertical extents of elements are read
+	# from their bounding boxes (location curves of MEP elements and slanted columns). Constraints of skipped
+	# elements are not modified
+	LEVEL_CROSSING_FILTER = True
+
+	# Number of elements planned together before their splits are applied. MEP elements of a batch are planned in
+	# one pass. Bigger batches keep more plans in memory
+	PLANNING_BATCH_SIZE = 1000
+
+	# Number of worker processes planning splits in parallel (CPython on systems which can fork processes, ie.
+	# standalone runner). Bigger PLANNING_BATCH_SIZE gives workers more work at once. With 0 or 1, or if processes
+	# can't be started, splits are planned in the run process
+	PLANNING_WORKERS = 0
+
+	# Plans MEP elements connected end to end into vertical runs (risers) together. Levels crossing a riser are found
+	# once and its segments are cut only where they cross a level. Levels closer than OFFSET_TOLERANCE to a joint of
+	# segments are not cut, as the joint already separates pieces of the riser. Risers are found in the whole selection
+	# before planning batches (RiserIndex) and segments of duct and pipe riser are connected after one regeneration
+	MEP_RISERS = False
+
+	# Path of a snapshot file (ModelSnapshot). Levels and records of all read elements are written to it at the end
+	# of the run - with dry run the model is not changed. If None snapshot is not written
+	SNAPSHOT_FILE = None
+
+	# Names of parameters copied from split element to its segments. Parameters which element doesn't have are skipped
+	CARRY_OVER_PARAMETERS = ["Mark"]
+
+	# Collects elements from the document instead of IN[0] (which is ignored). Only elements of categories of
+	# registered splitters which bounding boxes reach past a level by more than ELEVATION_TOL are collected
+	COLLECT_ELEMENTS = False
+
+	# Integer id of workset or phase. Collected elements are limited to elements of the workset or created in the
+	# phase. If None elements aren't filtered
+	COLLECTOR_WORKSET_ID = None
+	COLLECTOR_PHASE_ID = None
+
+	# Half of horizontal size of flat outlines of levels which collected elements intersect (in feets)
+	COLLECTOR_EXTENT = 1000000.0
+
+	# Path of a file with levels and joints of MEP elements split by the script (LevelState). If the file holds
+	# state of the document, the run is incremental - MEP elements are merged at joints on levels moved or removed
+	# since the last run and elements around levels added or moved since then are split together with selected (or
+	# collected) elements. File is written at the end of each run. If None only selected elements are split
+	LEVEL_STATE_FILE = None
+
+	# Path of progress journal (JSON lines). Elements recorded in the journal as done are skipped, so interrupted
+	# run can be continued. Use with "Element" or "Chunk" transaction scope. If None journal is not used
+	JOURNAL_FILE = None
+
+	# If True failures of transactions of the run are handled by the script (FailureHandler) - warnings listed in
+	# DELETED_WARNINGS are deleted, other warnings are kept in the document and reported in OUT, transaction with
+	# an error is rolled back and the error is reported, so no failure dialog stops the run. If False failures are
+	# left to Revit
+	FAILURE_HANDLING = True
+
+	# If True errors which have a resolution are resolved by their default resolution (which may delete failing
+	# elements) instead of rolling back their transaction
+	RESOLVE_ERRORS = False
+
+	# Names of built-in failures (db.BuiltInFailures) which are expected when elements are split and are deleted
+	# without being reported
+	DELETED_WARNINGS = ["JoinElementsFailures.JoiningDisjoint", "OverlapFailures.WallsOverlap",
+		"OverlapFailures.DuplicateInstances", "GeneralFailures.DuplicateValue"]
+
+# Immutable index of levels sorted by elevation. Holds parallel tuples of level ids, elevations and project
+# elevations and a dictionary levelId.IntegerValue : position, so all lookups are done without going back to
+# the document. Z queries are bisect based
+class LevelIndex():
+
+	def __init__(self, levelIds, elevations, projectElevations):
+		self.ids = tuple(levelIds)
+		self.elevations = tuple(elevations)
+		self.projectElevations = tuple(projectElevations)
+		self.positions = dict()
+		for i in range(len(self.ids)):
+			self.positions[self.ids[i].IntegerValue] = i
+
+	def __len__(self):
+		return len(self.ids)
+
+	# Returns list of elevations or project elevations
+	def getElevations(self, project = False):
+		if project:
+			return self.projectElevations
+		return self.elevations
+
+	# Returns position of level on the list of levels. Raises ValueError if level is not indexed (as list.index)
+	def indexOf(self, levelId):
+		try:
+			return self.positions[levelId.IntegerValue]
+		except (KeyError, AttributeError):
+			raise ValueError("Level is not in the index")
+
+	# Returns elevation of level. Raises ValueError if level is not indexed
+	def elevationOf(self, levelId):
+		return self.elevations[self.indexOf(levelId)]
+
+	# Returns index of the highest level with elevation less or equal to z or None if there is no such level
+	def levelAtOrBelow(self, z, project = False):
+		index = bisect.bisect_right(self.getElevations(project), z) - 1
+		if index < 0:
+			return None
+		return index
+
+	# Returns index of the lowest level with elevation greater or equal to z or None if there is no such level
+	def levelAtOrAbove(self, z, project = False):
+		index = bisect.bisect_left(self.getElevations(project), z)
+		if index == len(self.ids):
+			return None
+		return index
+
+	# Returns range of indexes of levels which elevations are between z0 and z1 (both excluded)
+	def levelsCrossing(self, z0, z1, project = False):
+		elevations = self.getElevations(project)
+		return range(bisect.bisect_right(elevations, z0), bisect.bisect_left(elevations, z1))
+
+	# Returns index of the lowest level located closer than tolerance to z or None if there is no such level
+	def levelNear(self, z, tolerance, project = False):
+		elevations = self.getElevations(project)
+		index = bisect.bisect_right(elevations, z - tolerance)
+		if index < len(elevations) and elevations[index] < z + tolerance:
+			return index
+		return None
+
+# Returns level index of all levels of the document or of levels visible in its active view
+def readLevelIndex(doc, getAllLevels):
 	fltr = db.ElementCategoryFilter(db.BuiltInCategory.OST_Levels)
 	if getAllLevels:
 		allLevels = db.FilteredElementCollector(doc).WherePasses(fltr).WhereElementIsNotElementType().ToElements()
 	else:
 		allLevels = db.FilteredElementCollector(doc, doc.ActiveView.Id).WherePasses(fltr).WhereElementIsNotElementType().ToElements()
-	lst = list()
-	for level in sorted(allLevels, key=lambda x: x.Elevation):
-		lst.append(level.Id)
-	return lst
-
-# Dedicated class for opening which is hosted in a wall
+	levelsData = list()
+	for level in allLevels:
+		levelsData.append((level.Elevation, level.ProjectElevation, level.Id))
+	levelIds, elevations, projectElevations = list(), list(), list()
+	for elevation, projectElevation, levelId in sorted(levelsData, key=lambda x: x[0]):
+		levelIds.append(levelId)
+		elevations.append(elevation)
+		projectElevations.append(projectElevation)
+	return LevelIndex(levelIds, elevations, projectElevations)
+
+# Index of items with vertical ranges (bottom, top) by bands between elevations of levels. Item is stored in each
+# band its range overlaps, so items around an elevation are found without checking items of other bands
+class LevelBandIndex():
+
+	def __init__(self, elevations):
+		self.elevations = sorted(elevations)
+		# band : list of (bottom, top, item). Band i is between levels i - 1 and i
+		self.bands = dict()
+
+	# Returns band of elevation
+	def getBand(self, z):
+		return bisect.bisect_right(self.elevations, z)
+
+	# Adds item with its vertical range
+	def add(self, bottom, top, item):
+		for band in range(self.getBand(bottom - Settings.ELEVATION_TOL), self.getBand(top + Settings.ELEVATION_TOL) + 1):
+			if band not in self.bands:
+				self.bands[band] = list()
+			self.bands[band].append((bottom, top, item))
+
+	# Returns items which ranges are closer than tolerance to elevation. Each item is returned once
+	def find(self, z, tolerance = Settings.ELEVATION_TOL):
+		items = list()
+		for band in range(self.getBand(z - tolerance), self.getBand(z + tolerance) + 1):
+			for bottom, top, item in self.bands.get(band, ()):
+				if bottom - tolerance <= z <= top + tolerance and item not in items:
+					items.append(item)
+		return items
+
+# Definitions of named parameters resolved once per element type. Parameters of other elements of the same type
+# (ie. copies of split element) are got directly by definition, without search by name
+class ParameterDefinitions():
+
+	def __init__(self):
+		self.definitions = dict()
+
+	# Returns definition of the first of names which element has or None if there is no such parameter
+	def getDefinition(self, element, names):
+		key = (element.GetTypeId().IntegerValue, names)
+		if key not in self.definitions:
+			self.definitions[key] = None
+			for name in names:
+				parameter = element.LookupParameter(name)
+				if parameter != None:
+					self.definitions[key] = parameter.Definition
+					break
+		return self.definitions[key]
+
+	# Returns parameter of element found by definition of the first of names or None
+	def getParameter(self, element, names):
+		definition = self.getDefinition(element, names)
+		if definition == None:
+			return None
+		return element.get_Parameter(definition)
+
+# Definitions of parameters resolved during the run
+parameterDefinitions = ParameterDefinitions()
+
+# Returns value of parameter depending upon its storage type
+def getParameterValue(parameter):
+	storageType = parameter.StorageType
+	if storageType == db.StorageType.Double:
+		return parameter.AsDouble()
+	elif storageType == db.StorageType.Integer:
+		return parameter.AsInteger()
+	elif storageType == db.StorageType.ElementId:
+		return parameter.AsElementId()
+	return parameter.AsString()
+
+# Class which controls transactions of the run. Splitters don't open transactions on their own, all changes are made
+# inside transaction opened here. Depending upon Settings.TRANSACTION_SCOPE transaction is closed at the end of
+# the run, after each element or after each chunk of elements. In two last cases transactions are grouped into
+# one TransactionGroup. Changes of each transaction are made in a sub-transaction, so they can be rolled back when
+# the run fails
+class TransactionScope():
+
+	def __init__(self, doc, scope = Settings.TRANSACTION_SCOPE, chunkSize = Settings.TRANSACTION_CHUNK_SIZE,
+		chunkTime = Settings.TRANSACTION_CHUNK_TIME):
+		self.doc = doc
+		self.scope = scope
+		self.chunkSize = max(1, chunkSize)
+		self.chunkTime = chunkTime
+		# Time when transaction was started
+		self.transactionStart = None
+		self.elementsInTransaction = 0
+		self.isOpen = False
+		self.transactionGroup = None
+		self.subTransaction = None
+		# Failure handler of the run. When it is attached, transaction of "Run" scope is committed here instead of
+		# being left to Dynamo, so failures of all transactions are handled by it
+		self.failureHandler = None
+		self.numberOfTransactions = 0
+		self.numberOfRolledBackTransactions = 0
+		# Functions called before and after transaction is committed and after it is rolled back
+		self.beforeCommit = list()
+		self.afterCommit = list()
+		self.afterRollBack = list()
+
+	# Opens transaction (and transaction group) if it is not opened yet
+	def start(self):
+		if self.isOpen:
+			return
+		if self.scope != "Run" and Settings.TRANSACTION_GROUP and self.transactionGroup == None:
+			# Transaction opened by other nodes must be closed before group is started
+			TransactionManager.Instance.ForceCloseTransaction()
+			self.transactionGroup = db.TransactionGroup(self.doc, "ElementSplitter")
+			self.transactionGroup.Start()
+		TransactionManager.Instance.EnsureInTransaction(self.doc)
+		self.subTransaction = db.SubTransaction(self.doc)
+		self.subTransaction.Start()
+		self.isOpen = True
+		self.transactionStart = timer()
+
+	# Commits transaction. In "Run" scope without failure handler it is left to Dynamo which commits it at the end of
+	# the run. If failure handler rolls the transaction back, functions after rollback are called instead of these
+	# after commit
+	def commit(self):
+		if self.isOpen:
+			for function in self.beforeCommit:
+				function()
+			self.subTransaction.Commit()
+			self.subTransaction = None
+			isHandled = self.failureHandler != None and self.failureHandler.isAttached
+			if isHandled:
+				self.failureHandler.isRolledBack = False
+			if self.scope == "Run" and not isHandled:
+				TransactionManager.Instance.TransactionTaskDone()
+			else:
+				TransactionManager.Instance.ForceCloseTransaction()
+			self.isOpen = False
+			self.numberOfTransactions += 1
+			if self.scope == "Chunk" and self.chunkTime != None and self.elementsInTransaction > 0:
+				self.adaptChunkSize(timer() - self.transactionStart)
+			if isHandled and self.failureHandler.isRolledBack:
+				self.numberOfRolledBackTransactions += 1
+				for function in self.afterRollBack:
+					function()
+			else:
+				for function in self.afterCommit:
+					function()
+		self.elementsInTransaction = 0
+
+	# Sets size of next chunk, so it takes about chunkTime. Time per element is measured on committed chunk
+	# (together with the commit). Size is at least 1 and at most doubles after each chunk
+	def adaptChunkSize(self, seconds):
+		timePerElement = seconds / self.elementsInTransaction
+		if timePerElement > 0:
+			chunkSize = int(self.chunkTime / timePerElement)
+		else:
+			chunkSize = 2 * self.chunkSize
+		self.chunkSize = max(1, min(2 * self.chunkSize, chunkSize))
+
+	# Marks element as done. Commits transaction if scope requires it
+	def elementDone(self):
+		self.elementsInTransaction += 1
+		if self.scope == "Element":
+			self.commit()
+		elif self.scope == "Chunk" and self.elementsInTransaction >= self.chunkSize:
+			self.commit()
+
+	# Commits last transaction and assimilates transaction group
+	def finish(self):
+		self.commit()
+		self.assimilateGroup()
+
+	# Rolls back changes of open transaction (ie. of element which failed) and assimilates transaction group, so
+	# transactions committed before are kept as they are recorded in journal. Nothing is done after finish
+	def abort(self):
+		if self.isOpen:
+			self.subTransaction.RollBack()
+			self.subTransaction = None
+			TransactionManager.Instance.ForceCloseTransaction()
+			self.isOpen = False
+			for function in self.afterRollBack:
+				function()
+		self.elementsInTransaction = 0
+		self.assimilateGroup()
+
+	def assimilateGroup(self):
+		if self.transactionGroup != None:
+			self.transactionGroup.Assimilate()
+			self.transactionGroup = None
+
+	# Returns number of transactions committed for given number of split elements. Joins of segments are made
+	# after all elements, in the last transaction if it is still open or in additional one
+	def estimateTransactions(self, numberOfElements, hasJoins = False):
+		if numberOfElements == 0:
+			return 0
+		if self.scope == "Element":
+			return numberOfElements + int(hasJoins)
+		if self.scope == "Chunk":
+			numberOfTransactions = int(math.ceil(float(numberOfElements) / self.chunkSize))
+			if hasJoins and numberOfElements % self.chunkSize == 0:
+				numberOfTransactions += 1
+			return numberOfTransactions
+		return 1
+
+
+# Handles failures of transactions of the run (IFailuresPreprocessor). Dynamo TransactionManager doesn't give access
+# to failure handling options of its transactions, so the handler is attached to FailuresProcessing event of the
+# application for the time of the run. Known warnings (Settings.DELETED_WARNINGS) are deleted, other warnings are
+# deleted and counted, errors are resolved by their default resolution or transaction is rolled back. Failures of
+# the script itself (e.g. parameters which can't be set) are counted together with them
+class FailureHandler(db.IFailuresPreprocessor):
+
+	def __init__(self, doc):
+		self.doc = doc
+		self.deletedWarnings = self.getDeletedWarnings()
+		# (description, severity, action) : [number of messages, integer values of ids of failing elements]
+		self.failures = dict()
+		self.isAttached = False
+		# True if the last processed transaction was rolled back. Reset by TransactionScope before it is committed
+		self.isRolledBack = False
+		# The same handler has to be used to detach it
+		self.eventHandler = self.onFailuresProcessing
+
+	# Returns Guids of failure definitions of Settings.DELETED_WARNINGS. Names which are not found are skipped
+	def getDeletedWarnings(self):
+		guids = set()
+		for name in Settings.DELETED_WARNINGS:
+			definition = db.BuiltInFailures
+			for attribute in name.split("."):
+				definition = getattr(definition, attribute, None)
+			if definition != None:
+				guids.add(definition.Guid)
+		return guids
+
+	def attach(self):
+		if not self.isAttached:
+			self.doc.Application.FailuresProcessing += self.eventHandler
+			self.isAttached = True
+
+	def detach(self):
+		if self.isAttached:
+			self.doc.Application.FailuresProcessing -= self.eventHandler
+			self.isAttached = False
+
+	# Event is raised for transactions of all documents, failures of other documents are left to Revit
+	def onFailuresProcessing(self, sender, args):
+		failuresAccessor = args.GetFailuresAccessor()
+		if self.isOfDocument(failuresAccessor):
+			args.SetProcessingResult(self.PreprocessFailures(failuresAccessor))
+
+	# Returns True if failures are of transaction of the document of the run
+	def isOfDocument(self, failuresAccessor):
+		return self.doc.Equals(failuresAccessor.GetDocument())
+
+	# Deletes expected warnings, other warnings are kept and reported. Transaction with an error is rolled back,
+	# errors are resolved only with Settings.RESOLVE_ERRORS (and rolled back if any of them has no resolution)
+	def PreprocessFailures(self, failuresAccessor):
+		result = db.FailureProcessingResult.Continue
+		if not self.isOfDocument(failuresAccessor):
+			return result
+		for message in failuresAccessor.GetFailureMessages():
+			elementIds = ()
+			if message.GetSeverity() == db.FailureSeverity.Warning:
+				severity = "Warning"
+				if message.GetFailureDefinitionId().Guid in self.deletedWarnings:
+					action = "Deleted"
+					failuresAccessor.DeleteWarning(message)
+				else:
+					action = "Kept"
+					elementIds = message.GetFailingElementIds()
+			else:
+				severity = "Error"
+				elementIds = message.GetFailingElementIds()
+				if Settings.RESOLVE_ERRORS and message.HasResolutions():
+					failuresAccessor.ResolveFailure(message)
+					action = "Resolved"
+					if result == db.FailureProcessingResult.Continue:
+						result = db.FailureProcessingResult.ProceedWithCommit
+				else:
+					action = "Rolled back"
+					result = db.FailureProcessingResult.ProceedWithRollBack
+					self.isRolledBack = True
+			self.addFailure(message.GetDescriptionText(), severity, action,
+				[elementId.IntegerValue for elementId in elementIds])
+		return result
+
+	# Counts failure. Severity is "Warning", "Error" or "Script" for failures of the script
+	def addFailure(self, description, severity, action, elementIds = ()):
+		key = (description, severity, action)
+		if key not in self.failures:
+			self.failures[key] = [0, set()]
+		self.failures[key][0] += 1
+		self.failures[key][1].update(elementIds)
+
+	# Returns table of failures - description, severity, action, number of messages and ids of failing elements.
+	# None if only known warnings were deleted
+	def getFailureReport(self):
+		if all(key[2] == "Deleted" for key in self.failures):
+			return None
+		report = [["Failure", "Severity", "Action", "Messages", "Elements"]]
+		for key in sorted(self.failures):
+			number, elementIds = self.failures[key]
+			report.append(list(key) + [number, sorted(elementIds)])
+		return report
+
+
+# Journal of progress of runs - JSON lines file. Each line is status of one element of a document identified by
+# UniqueId of its project information: {"document": ..., "element": id, "status": "split"/"unchanged",
+# "produced": ids of elements created by the split}. Lines are written after transaction with the element is
+# committed, so elements recorded in the journal are never rolled back
+class ProgressJournal():
+
+	def __init__(self, path, doc):
+		self.path = path
+		self.documentKey = doc.ProjectInformation.UniqueId
+		# element id : status of elements done in previous runs
+		self.doneElements = dict()
+		# Number of selected elements skipped in this run as done
+		self.numberOfSkippedElements = 0
+		self.pendingLines = list()
+		self.read()
+
+	# Reads elements of the document done in previous runs. Missing journal means that there were no runs
+	def read(self):
+		try:
+			journalFile = open(self.path, "r")
+		except IOError:
+			return
+		with journalFile:
+			for line in journalFile:
+				try:
+					entry = json.loads(line)
+				# Last line might be cut when Revit crashed
+				except ValueError:
+					continue
+				if entry.get("document") == self.documentKey:
+					self.doneElements[entry["element"]] = entry["status"]
+
+	# Returns True if element of given id (IntegerValue) was done in previous run
+	def isDone(self, elementId):
+		return elementId in self.doneElements
+
+	# Records element after its plan is applied. Line is written when transaction is committed
+	def elementDone(self, splitter, plan):
+		if plan.isSplit:
+			status = "split"
+		else:
+			status = "unchanged"
+		entry = {
+			"document": self.documentKey,
+			"element": plan.record.elementId,
+			"status": status,
+			"produced": [element.Id.IntegerValue for element in splitter.listOfElements],
+		}
+		self.pendingLines.append(json.dumps(entry, sort_keys = True))
+
+	# Drops elements recorded in transaction which was rolled back
+	def discard(self):
+		self.pendingLines = list()
+
+	# Appends recorded elements to the journal
+	def flush(self):
+		if not self.pendingLines:
+			return
+		with open(self.path, "a") as journalFile:
+			journalFile.write("\n".join(self.pendingLines) + "\n")
+		self.pendingLines = list()
+
+
+# State of the document after the last run - JSON file with levels (ids and project elevations) and joints of MEP
+# elements split by the script ([id of lower piece, id of union, id of upper piece, elevation of joint]). It is
+# compared with current levels to find levels added, moved or removed since the last run
+class LevelState():
+
+	def __init__(self, path, doc):
+		self.path = path
+		self.documentKey = doc.ProjectInformation.UniqueId
+		# [level id, project elevation] of the last run. None if there is no state of the document
+		self.levels = None
+		self.joints = list()
+		# Joints added and removed in open transaction. They are applied when the transaction is committed
+		self.addedJoints = list()
+		self.removedJoints = list()
+		self.read()
+
+	# Reads state of the document. Missing file or state of other document means that there were no runs
+	def read(self):
+		try:
+			stateFile = open(self.path, "r")
+		except IOError:
+			return
+		with stateFile:
+			try:
+				state = json.load(stateFile)
+			except ValueError:
+				return
+		if state.get("document") == self.documentKey:
+			self.levels = state["levels"]
+			self.joints = state["joints"]
+
+	# Returns True if the run is incremental
+	def isIncremental(self):
+		return self.levels != None
+
+	# Returns (old elevations, new elevations) of changed levels. Removed levels have only old, added levels only new
+	# elevation. Level is moved if its elevation changed more than ELEVATION_TOL
+	def getChangedElevations(self, levelIndex):
+		currentElevations = dict()
+		for i in range(len(levelIndex)):
+			currentElevations[levelIndex.ids[i].IntegerValue] = levelIndex.projectElevations[i]
+		oldElevations, newElevations = list(), list()
+		for levelId, elevation in self.levels:
+			if levelId not in currentElevations:
+				oldElevations.append(elevation)
+				continue
+			currentElevation = currentElevations.pop(levelId)
+			if abs(currentElevation - elevation) > Settings.ELEVATION_TOL:
+				oldElevations.append(elevation)
+				newElevations.append(currentElevation)
+		# levels added since the last run
+		newElevations.extend(currentElevations.values())
+		return oldElevations, newElevations
+
+	# Returns joints closer than OFFSET_TOLERANCE to any of elevations, sorted from the lowest one. Joints are found
+	# in level band index of the last run
+	def getJointsOnElevations(self, elevations):
+		bandIndex = LevelBandIndex([elevation for levelId, elevation in self.levels])
+		for i in range(len(self.joints)):
+			bandIndex.add(self.joints[i][3], self.joints[i][3], i)
+		positions = set()
+		for elevation in elevations:
+			positions.update(bandIndex.find(elevation, Settings.OFFSET_TOLERANCE))
+		return sorted([self.joints[i] for i in positions], key = lambda joint: joint[3])
+
+	# Adds joint of pieces of split MEP element
+	def addJoint(self, lowerId, unionId, upperId, z):
+		self.addedJoints.append([lowerId, unionId, upperId, z])
+
+	# Removes merged joints
+	def removeJoints(self, joints):
+		self.removedJoints.extend([tuple(joint) for joint in joints])
+
+	# Applies joints added and removed in committed transaction
+	def commit(self):
+		if self.removedJoints:
+			removed = set(self.removedJoints)
+			self.joints = [joint for joint in self.joints if tuple(joint) not in removed]
+		self.joints.extend(self.addedJoints)
+		self.addedJoints = list()
+		self.removedJoints = list()
+
+	# Drops joints added and removed in transaction which was rolled back
+	def rollBack(self):
+		self.addedJoints = list()
+		self.removedJoints = list()
+
+	# Writes current levels and joints
+	def write(self, levelIndex):
+		levels = [[levelIndex.ids[i].IntegerValue, levelIndex.projectElevations[i]] for i in range(len(levelIndex))]
+		with open(self.path, "w") as stateFile:
+			json.dump({"document": self.documentKey, "levels": levels, "joints": self.joints}, stateFile)
+
+
+# Forecast of a run created in dry run mode. Splitters only plan their splits, so document is not modified.
+# Numbers are counted per category, API calls are estimated by splitters (ElementSplitter.estimateApiCalls)
+class SplitForecast():
+
+	CATEGORIES = ("Wall", "Column", "Slanted column", "Duct", "Pipe", "CableTray/Conduit")
+	HEADER = ["Category", "Elements", "Not crossing levels", "Split elements", "Segments", "Unions", "Groups",
+		"Deleted openings", "API calls"]
+
+	def __init__(self, transactionScope):
+		self.transactionScope = transactionScope
+		# True if any segments will be joined at the end of the run
+		self.hasJoins = False
+		# Number of elements skipped as done in previous runs (ProgressJournal). None if journal is not used
+		self.numberOfDoneElements = None
+		# Number of joints of MEP elements merged in incremental run (LevelState). None if run is not incremental
+		self.numberOfJointsToMerge = None
+		# Keys of planned groups
+		self.elementGrouper = ElementGrouper(None)
+		self.groupKeys = set()
+		self.rows = dict()
+		self.categories = list()
+		for category in self.CATEGORIES:
+			self.addCategory(category)
+
+	# Adds row of category. Splitters registered for other categories get their rows when their first plan is added
+	def addCategory(self, category):
+		self.rows[category] = [0] * (len(self.HEADER) - 1)
+		self.categories.append(category)
+
+	# Adds planned split of an element to the forecast
+	def addPlan(self, splitter, plan):
+		if splitter.KIND not in self.rows:
+			self.addCategory(splitter.KIND)
+		row = self.rows[splitter.KIND]
+		row[0] += 1
+		if plan.isSplit:
+			row[2] += 1
+			row[3] += plan.getNumberOfSegments()
+			row[4] += len(plan.cuts)
+			if IN[2]:
+				# Group is counted in the category of its first element, each group is one NewGroup call
+				newGroups = self.addGroupKeys(splitter, plan)
+				row[5] += newGroups
+				row[7] += newGroups
+			row[6] += splitter.countOpeningsToDelete(plan)
+			if plan.segments:
+				self.hasJoins = True
+		# GetElement and GetType of selected element
+		row[7] += 2 + splitter.estimateApiCalls(plan)
+
+	# Adds elements of splitter class tested by LevelCrossingFilter. Rejected elements are counted as not crossing
+	# levels (with GetElement and GetType calls), vertical extents of all of them are read
+	def addFilteredElements(self, splitterClass, numberOfElements, numberOfRejected):
+		if splitterClass.KIND not in self.rows:
+			self.addCategory(splitterClass.KIND)
+		row = self.rows[splitterClass.KIND]
+		row[0] += numberOfRejected
+		row[1] += numberOfRejected
+		row[7] += numberOfElements * splitterClass.estimateVerticalExtentApiCalls() + 2 * numberOfRejected
+
+	# Adds keys of groups of pieces of planned split (ElementGrouper). Returns number of groups which were not
+	# counted before
+	def addGroupKeys(self, splitter, plan):
+		numberOfGroups = len(self.groupKeys)
+		self.groupKeys.update(self.elementGrouper.getKeys(splitter, plan.getPieceLevelIndices()))
+		return len(self.groupKeys) - numberOfGroups
+
+	# Returns forecast as list of rows (header, categories, total) and estimated number of transactions
+	def getReport(self):
+		report = [list(self.HEADER)]
+		total = [0] * (len(self.HEADER) - 1)
+		for category in self.categories:
+			row = self.rows[category]
+			report.append([category] + row)
+			total = [total[i] + row[i] for i in range(len(row))]
+		report.append(["Total"] + total)
+		# Joins and groups are made in the last transaction
+		hasLastPhase = self.hasJoins or len(self.groupKeys) > 0
+		report.append(["Transactions", self.transactionScope.estimateTransactions(total[0], hasLastPhase)])
+		if self.numberOfDoneElements != None:
+			report.append(["Done in previous runs", self.numberOfDoneElements])
+		if self.numberOfJointsToMerge != None:
+			report.append(["Joints to merge", self.numberOfJointsToMerge])
+		return report
+
+
+# High resolution timer - time.clock in IronPython 2.7, time.perf_counter in Python 3
+try:
+	timer = time.perf_counter
+except AttributeError:
+	timer = time.clock
+
+# Optional profiling layer. Methods of splitters, planner, openings and transaction scope are wrapped with timers
+# which count calls and accumulate time per element class and phase. Time of a phase includes phases called
+# inside it, nested calls of the same phase (ie. overridden method calling parent method) are counted once
+class Profiler():
+
+	# Method name : phase
+	PHASES = {
+		"start": "Transactions",
+		"commit": "Transactions",
+		"finish": "Transactions",
+		"abort": "Transactions",
+		"applyPlan": "Element split",
+		"applyRiserPlans": "Element split",
+		"readElementRecord": "Reading element",
+		"plan": "Planning",
+		"planMany": "Planning",
+		"computeCuts": "Planning",
+		"computeCutsWithNumpy": "Planning",
+		"createPlan": "Planning",
+		"addElements": "Risers",
+		"walkRiser": "Risers",
+		"modifyLevelsAndOffsets": "Levels and offsets",
+		"applyBoundries": "Boundries modification",
+		"getBaseConstraintLevelId": "Parameters get",
+		"getBaseOffsetValue": "Parameters get",
+		"getTopConstraintLevelId": "Parameters get",
+		"getTopOffsetValue": "Parameters get",
+		"getHeight": "Parameters get",
+		"getElementData": "Parameters get",
+		"setBaseLevel": "Parameters set",
+		"setBaseOffsetValue": "Parameters set",
+		"setTopLevel": "Parameters set",
+		"setTopOffsetValue": "Parameters set",
+		"setElementData": "Parameters set",
+		"getDefinition": "Parameters get",
+		"copyElement": "Segment creation",
+		"copyElements": "Segment creation",
+		"applySegment": "Segment creation",
+		"splitSlantedColumn": "Segment creation",
+		"cutElement": "Segment creation",
+		"getListOfOpeningsHostedInWall": "Openings",
+		"createDictionaryOpeningAndItsLevel": "Openings",
+		"createElevationIndex": "Openings",
+		"collectOpeningsOfCopy": "Openings",
+		"deleteCollectedOpenings": "Openings",
+		"collectJoins": "Joining",
+		"joinAll": "Joining",
+		"connectElements": "Union insertion",
+		"connectPiecesAtCuts": "Union insertion",
+		"getCoincidentPairs": "Union insertion",
+		"deleteOriginalElement": "Deleting original element",
+		"collectGroupMembers": "Grouping",
+		"createGroups": "Grouping",
+	}
+
+	def __init__(self):
+		# Class of element which is currently split
+		self.elementClass = "Run"
+		# (element class, phase) : [number of calls, time]
+		self.results = dict()
+		self.activePhases = set()
+		self.startTime = timer()
+
+	# Wraps methods defined in given classes
+	def instrument(self, classes):
+		for cls in classes:
+			for methodName in list(cls.__dict__):
+				if methodName in self.PHASES:
+					setattr(cls, methodName, self.profiledMethod(cls.__dict__[methodName], self.PHASES[methodName]))
+
+	# Returns method wrapped with timer
+	def profiledMethod(self, method, phase):
+		profiler = self
+		def profiled(*args, **kwargs):
+			if phase in profiler.activePhases:
+				return method(*args, **kwargs)
+			profiler.activePhases.add(phase)
+			start = timer()
+			try:
+				return method(*args, **kwargs)
+			finally:
+				profiler.activePhases.discard(phase)
+				profiler.add(phase, timer() - start)
+		return profiled
+
+	# Adds call of a phase to the results of currently split element class
+	def add(self, phase, seconds):
+		key = (self.elementClass, phase)
+		if key not in self.results:
+			self.results[key] = [0, 0.0]
+		self.results[key][0] += 1
+		self.results[key][1] += seconds
+
+	# Returns summary as list of rows: header, (element class, phase, calls, seconds) sorted by time and total
+	def getSummary(self):
+		summary = [["Element class", "Phase", "Calls", "Time [s]"]]
+		for key in sorted(self.results, key = lambda x : -self.results[x][1]):
+			calls, seconds = self.results[key]
+			summary.append([key[0], key[1], calls, round(seconds, 6)])
+		summary.append(["Run", "Total", 1, round(timer() - self.startTime, 6)])
+		return summary
+
+	# Writes summary as tab separated values
+	def writeSummary(self, path):
+		with open(path, "w") as summaryFile:
+			for row in self.getSummary():
+				summaryFile.write("\t".join([str(value) for value in row]) + "\n")
+
+
+# Plain record of element data needed for planning of a split. It is filled once from the document by a splitter
+# (ElementSplitter.readElementRecord) and contains only numbers, level positions and coordinate tuples. Records and
+# plans have fixed slots instead of dictionaries of attributes, as there are thousands of them in a batch
+class ElementRecord(object):
+
+	# Fields of the record in order of its data tuple (getData)
+	FIELDS = ("elementId", "kind", "baseLevelIndex", "baseOffset", "topLevelIndex", "topOffset", "topElevation",
+		"startPoint", "endPoint", "connectedIds")
+	__slots__ = FIELDS
+
+	def __init__(self, elementId, kind):
+		self.elementId = elementId
+		# "Wall", "Column", "Slanted column", "Duct", "Pipe" or "CableTray/Conduit"
+		self.kind = kind
+		# Position of base level in level index or None if level is not in the index
+		self.baseLevelIndex = None
+		self.baseOffset = 0.0
+		# Position of top level in level index or None if element is unconnected or level is not in the index
+		self.topLevelIndex = None
+		self.topOffset = 0.0
+		# Elevation of top of an element
+		self.topElevation = None
+		# Start and end point (x, y, z) of location curve
+		self.startPoint = None
+		self.endPoint = None
+		# Ids of MEP curves connected with the element (Settings.MEP_RISERS or Settings.SNAPSHOT_FILE)
+		self.connectedIds = None
+
+	# Returns record as tuple of plain values
+	def getData(self):
+		return tuple([getattr(self, field) for field in self.FIELDS])
+
+# Returns record created from tuple returned by ElementRecord.getData
+def recordFromData(data):
+	record = ElementRecord(data[0], data[1])
+	for i in range(2, len(ElementRecord.FIELDS)):
+		setattr(record, ElementRecord.FIELDS[i], data[i])
+	return record
+
+# Plan of one segment of wall or column - constraints of a copy of split element
+class SegmentPlan(object):
+
+	__slots__ = ("baseLevelIndex", "topLevelIndex", "baseOffset", "topOffset", "copyData")
+
+	def __init__(self, baseLevelIndex, topLevelIndex, baseOffset, topOffset, copyData = False):
+		self.baseLevelIndex = baseLevelIndex
+		self.topLevelIndex = topLevelIndex
+		self.baseOffset = baseOffset
+		self.topOffset = topOffset
+		# If True data of split element (setElementData) is copied to the segment
+		self.copyData = copyData
+
+# Plan of one cut of MEP element. Pieces are (start point, end point) tuples in the direction of original curve
+class CutPlan(object):
+
+	__slots__ = ("cutPoint", "lowerPiece", "upperPiece", "lowerLevelIndex")
+
+	def __init__(self, cutPoint, lowerPiece, upperPiece, lowerLevelIndex):
+		self.cutPoint = cutPoint
+		self.lowerPiece = lowerPiece
+		self.upperPiece = upperPiece
+		# Level assigned to piece below the cut and to the union
+		self.lowerLevelIndex = lowerLevelIndex
+
+# Plan of one cut of slanted column by level. Parameter is normalized parameter of the cut on location curve of the
+# original column, so it doesn't depend on other cuts. Piece below the cut gets level and the next one as constraints
+class SlantedCutPlan(object):
+
+	__slots__ = ("levelIndex", "parameter")
+
+	def __init__(self, levelIndex, parameter):
+		self.levelIndex = levelIndex
+		self.parameter = parameter
+
+# Complete split plan of one element created by SplitPlanner and applied by splitter (ElementSplitter.applyPlan)
+class SplitPlan(object):
+
+	__slots__ = ("record", "isSplit", "baseLevelIndex", "baseOffset", "topLevelIndex", "topOffset", "segments",
+		"slantedCuts", "modelingStyle", "cuts", "lastPieceLevelIndex")
+
+	def __init__(self, record):
+		self.record = record
+		self.isSplit = False
+		# Constraints of original element after moving base as low and top as high as it is possible. None if
+		# constraint remains unchanged
+		self.baseLevelIndex = None
+		self.baseOffset = None
+		self.topLevelIndex = None
+		self.topOffset = None
+		# Walls and columns
+		self.segments = list()
+		# Slanted columns
+		self.slantedCuts = list()
+		# MEP elements
+		self.modelingStyle = None
+		self.cuts = list()
+		self.lastPieceLevelIndex = None
+
+	# Number of elements which exist after the split
+	def getNumberOfSegments(self):
+		if not self.isSplit:
+			return 1
+		if self.segments:
+			return len(self.segments)
+		return 1 + len(self.slantedCuts) + len(self.cuts)
+
+	# Level positions of bases of elements which exist after the split, from the bottom one
+	def getPieceLevelIndices(self):
+		levelIndices = [segment.baseLevelIndex for segment in self.segments] + \
+			[cut.levelIndex for cut in self.slantedCuts] + [cut.lowerLevelIndex for cut in self.cuts]
+		if self.segments:
+			return levelIndices
+		if self.lastPieceLevelIndex != None:
+			return levelIndices + [self.lastPieceLevelIndex]
+		if self.baseLevelIndex != None:
+			return [self.baseLevelIndex]
+		return [self.record.baseLevelIndex]
+
+	# Returns plan (without record) as tuple of plain values
+	def getData(self):
+		segments = [(segment.baseLevelIndex, segment.topLevelIndex, segment.baseOffset, segment.topOffset,
+			segment.copyData) for segment in self.segments]
+		slantedCuts = [(cut.levelIndex, cut.parameter) for cut in self.slantedCuts]
+		cuts = [(cut.cutPoint, cut.lowerPiece, cut.upperPiece, cut.lowerLevelIndex) for cut in self.cuts]
+		return (self.isSplit, self.baseLevelIndex, self.baseOffset, self.topLevelIndex, self.topOffset,
+			self.modelingStyle, self.lastPieceLevelIndex, segments, slantedCuts, cuts)
+
+# Returns plan of record created from tuple returned by SplitPlan.getData
+def planFromData(record, data):
+	plan = SplitPlan(record)
+	plan.isSplit, plan.baseLevelIndex, plan.baseOffset, plan.topLevelIndex, plan.topOffset = data[:5]
+	plan.modelingStyle, plan.lastPieceLevelIndex = data[5:7]
+	plan.segments = [SegmentPlan(*segment) for segment in data[7]]
+	plan.slantedCuts = [SlantedCutPlan(*cut) for cut in data[8]]
+	plan.cuts = [CutPlan(*cut) for cut in data[9]]
+	return plan
+
+
+# Columnar snapshot of data read by splitters - levels and element records. File starts with a JSON header (after
+# a magic line and its length) describing columns, columns follow as little-endian binary arrays aligned to 8
+# bytes, so they can be memory-mapped. None is stored as -1 (level positions and counts) or NaN (numbers). Ids of
+# connected MEP curves of all records are stored in one column, one count per record. With numpy columns are read
+# as memory-mapped arrays, without it with struct. Records (ElementRecord) are created only for requested slices,
+# so the planner can run against the snapshot as well as against a live document
+class ModelSnapshot():
+
+	MAGIC = b"ElementSplitterSnapshot 1\n"
+	KINDS = ("Wall", "Column", "Slanted column", "Duct", "Pipe", "CableTray/Conduit")
+	# name, struct format of one value
+	LEVEL_COLUMNS = (("levelIds", "q"), ("elevations", "d"), ("projectElevations", "d"))
+	RECORD_COLUMNS = (("elementId", "q"), ("kind", "b"), ("baseLevelIndex", "i"), ("baseOffset", "d"),
+		("topLevelIndex", "i"), ("topOffset", "d"), ("topElevation", "d"), ("startX", "d"), ("startY", "d"),
+		("startZ", "d"), ("endX", "d"), ("endY", "d"), ("endZ", "d"))
+	# Connectivity of records - number of connected ids of each record and ids of all records one after another.
+	# Snapshots written without them have no connectivity
+	CONNECTIVITY_COLUMNS = (("connectedCounts", "i"), ("connectedIds", "q"))
+
+	def __init__(self):
+		# column name : list or array of values
+		self.columns = dict()
+		for name, valueFormat in self.LEVEL_COLUMNS + self.RECORD_COLUMNS + self.CONNECTIVITY_COLUMNS:
+			self.columns[name] = list()
+		# Positions of first connected id of each record in connectedIds column, computed when records are read
+		self.connectedOffsets = None
+		self.levelIndex = None
+		# Kinds of elements. Kinds of splitters of other categories are added after KINDS
+		self.kinds = list(self.KINDS)
+
+	def __len__(self):
+		return len(self.columns["elementId"])
+
+	# Sets levels of the snapshot
+	def setLevels(self, levelIndex):
+		self.levelIndex = levelIndex
+		self.columns["levelIds"] = [levelId.IntegerValue for levelId in levelIndex.ids]
+		self.columns["elevations"] = list(levelIndex.elevations)
+		self.columns["projectElevations"] = list(levelIndex.projectElevations)
+
+	# Adds records to the snapshot
+	def addRecords(self, records):
+		nan = float("nan")
+		for record in records:
+			if record.kind not in self.kinds:
+				self.kinds.append(record.kind)
+			values = (record.elementId, self.kinds.index(record.kind), self.fromPosition(record.baseLevelIndex),
+				record.baseOffset, self.fromPosition(record.topLevelIndex), record.topOffset,
+				self.fromNumber(record.topElevation)) + (record.startPoint or (nan, nan, nan)) + (record.endPoint or (nan, nan, nan))
+			for i in range(len(values)):
+				self.columns[self.RECORD_COLUMNS[i][0]].append(values[i])
+			if record.connectedIds == None:
+				self.columns["connectedCounts"].append(-1)
+			else:
+				self.columns["connectedCounts"].append(len(record.connectedIds))
+				self.columns["connectedIds"].extend(record.connectedIds)
+
+	# Returns level position stored in the snapshot
+	def fromPosition(self, position):
+		if position == None:
+			return -1
+		return position
+
+	# Returns number stored in the snapshot
+	def fromNumber(self, number):
+		if number == None:
+			return float("nan")
+		return number
+
+	# Writes snapshot into a file
+	def write(self, path):
+		columns = list()
+		offset = 0
+		for name, valueFormat in self.LEVEL_COLUMNS + self.RECORD_COLUMNS + self.CONNECTIVITY_COLUMNS:
+			count = len(self.columns[name])
+			columns.append({"name": name, "format": valueFormat, "offset": offset, "count": count})
+			size = count * struct.calcsize("<" + valueFormat)
+			offset += size + (-size) % 8
+		header = json.dumps({"columns": columns, "kinds": self.kinds}).encode("utf-8")
+		header += b" " * ((-len(self.MAGIC) - 4 - len(header)) % 8)
+		with open(path, "wb") as snapshotFile:
+			snapshotFile.write(self.MAGIC + struct.pack("<i", len(header)) + header)
+			for column in columns:
+				data = struct.pack("<%d%s" % (column["count"], column["format"]), *self.columns[column["name"]])
+				snapshotFile.write(data + b"\0" * ((-len(data)) % 8))
+
+	# Returns list of ElementRecords of elements from start to stop (excluded)
+	def getRecords(self, start, stop):
+		columns = list()
+		for name, valueFormat in self.RECORD_COLUMNS:
+			column = self.columns[name][start:stop]
+			if numpy != None and isinstance(column, numpy.ndarray):
+				column = column.tolist()
+			columns.append(column)
+		records = list()
+		for i in range(len(columns[0])):
+			record = ElementRecord(columns[0][i], self.kinds[columns[1][i]])
+			record.baseLevelIndex = self.toPosition(columns[2][i])
+			record.baseOffset = columns[3][i]
+			record.topLevelIndex = self.toPosition(columns[4][i])
+			record.topOffset = columns[5][i]
+			record.topElevation = self.toNumber(columns[6][i])
+			if not math.isnan(columns[7][i]):
+				record.startPoint = (columns[7][i], columns[8][i], columns[9][i])
+				record.endPoint = (columns[10][i], columns[11][i], columns[12][i])
+			records.append(record)
+		self.readConnectedIds(records, start)
+		return records
+
+	# Sets connected ids of records read from start position. Records of snapshot without connectivity keep None
+	def readConnectedIds(self, records, start):
+		if len(self.columns["connectedCounts"]) == 0:
+			return
+		if self.connectedOffsets == None:
+			allCounts = self.columns["connectedCounts"]
+			if numpy != None and isinstance(allCounts, numpy.ndarray):
+				self.connectedOffsets = numpy.concatenate(([0], numpy.cumsum(numpy.maximum(allCounts, 0)))).tolist()
+			else:
+				self.connectedOffsets = [0]
+				for count in allCounts:
+					self.connectedOffsets.append(self.connectedOffsets[-1] + max(count, 0))
+		counts = self.columns["connectedCounts"][start:start + len(records)]
+		connectedIds = self.columns["connectedIds"][self.connectedOffsets[start]:self.connectedOffsets[start + len(records)]]
+		if numpy != None and isinstance(counts, numpy.ndarray):
+			counts = counts.tolist()
+		if numpy != None and isinstance(connectedIds, numpy.ndarray):
+			connectedIds = connectedIds.tolist()
+		offset = 0
+		for i in range(len(records)):
+			if counts[i] >= 0:
+				records[i].connectedIds = connectedIds[offset:offset + counts[i]]
+				offset += counts[i]
+
+	# Returns level position read from the snapshot
+	def toPosition(self, position):
+		if position < 0:
+			return None
+		return position
+
+	# Returns number read from the snapshot
+	def toNumber(self, number):
+		if math.isnan(number):
+			return None
+		return number
+
+# Reads snapshot written by ModelSnapshot.write. Level ids of its level index are plain integers
+def readSnapshot(path):
+	snapshot = ModelSnapshot()
+	with open(path, "rb") as snapshotFile:
+		magic = snapshotFile.read(len(ModelSnapshot.MAGIC))
+		if magic != ModelSnapshot.MAGIC:
+			raise ValueError("File is not a snapshot of ElementSplitter")
+		headerLength = struct.unpack("<i", snapshotFile.read(4))[0]
+		header = json.loads(snapshotFile.read(headerLength).decode("utf-8"))
+		dataOffset = len(ModelSnapshot.MAGIC) + 4 + headerLength
+		snapshot.kinds = header["kinds"]
+		if numpy == None:
+			data = snapshotFile.read()
+	for column in header["columns"]:
+		if column["count"] == 0:
+			snapshot.columns[column["name"]] = list()
+		elif numpy != None:
+			snapshot.columns[column["name"]] = numpy.memmap(path, dtype = "<" + column["format"], mode = "r",
+				offset = dataOffset + column["offset"], shape = (column["count"],))
+		else:
+			snapshot.columns[column["name"]] = list(struct.unpack_from("<%d%s" % (column["count"], column["format"]),
+				data, column["offset"]))
+	levels = [snapshot.columns[name] for name, valueFormat in ModelSnapshot.LEVEL_COLUMNS]
+	if numpy != None:
+		levels = [numpy.asarray(column).tolist() for column in levels]
+	snapshot.levelIndex = LevelIndex([SnapshotLevelId(levelId) for levelId in levels[0]], levels[1], levels[2])
+	return snapshot
+
+# Level id read from snapshot. Has IntegerValue as db.ElementId
+class SnapshotLevelId():
+
+	def __init__(self, integerValue):
+		self.IntegerValue = integerValue
+
+
+# Creates split plans from element records. Uses only level index and records, so it never touches the document
+class SplitPlanner():
+
+	def __init__(self, levelIndex):
+		self.levelIndex = levelIndex
+		self.mepCutEngine = MEPCutEngine(levelIndex)
+
+	# Returns split plan of an element
+	def plan(self, record):
+		if record.kind in ("Wall", "Column"):
+			return self.planVerticalElement(record)
+		elif record.kind == "Slanted column":
+			return self.planSlantedColumn(record)
+		return self.mepCutEngine.plan([record])[0]
+
+	# Returns split plans of many records in the same order. MEP elements are planned together in one batch
+	def planMany(self, records):
+		plans = [None] * len(records)
+		mepPositions = list()
+		for i in range(len(records)):
+			if records[i].kind in ("Wall", "Column", "Slanted column"):
+				plans[i] = self.plan(records[i])
+			else:
+				mepPositions.append(i)
+		mepPlans = self.mepCutEngine.plan([records[i] for i in mepPositions])
+		for i in range(len(mepPositions)):
+			plans[mepPositions[i]] = mepPlans[i]
+		return plans
+
+	# Tries to set base level as low as it is possible and reduce offset. Instead of situation: Level no 3 with
+	# offset -10m it changes elements base level ie. Level no 0 with offset -50cm. Returns (levelIndex, offset)
+	def tryToModifyBaseBoundries(self, record):
+		index = record.baseLevelIndex
+		if index != 0:
+			# the lowest level which is still above or at the bottom of the element
+			indexOfNewLevel = self.levelIndex.levelAtOrAbove(self.levelIndex.elevations[index] + record.baseOffset)
+			if indexOfNewLevel != None and indexOfNewLevel < index:
+				offsetDifference = self.levelIndex.elevations[index] - self.levelIndex.elevations[indexOfNewLevel]
+				return indexOfNewLevel, record.baseOffset + offsetDifference
+		return index, record.baseOffset
+
+	# Tries to set top level as high as it is possible and reduce offset. Instead of situation: Level no 3 with
+	# offset 10m it changes elements top level ie. Level no 5 with offset -50cm. Unconnected element gets top
+	# constraint. Returns (levelIndex, offset), levelIndex is None if there is no level below top of an element
+	def tryToModifyTopBoundries(self, record):
+		indexOfNewLevel = self.levelIndex.levelAtOrBelow(record.topElevation)
+		if indexOfNewLevel == None:
+			return None, record.topOffset
+		if record.topLevelIndex != None:
+			offsetDifference = self.levelIndex.elevations[record.topLevelIndex] - self.levelIndex.elevations[indexOfNewLevel]
+			return indexOfNewLevel, record.topOffset + offsetDifference
+		return indexOfNewLevel, record.topElevation - self.levelIndex.elevations[indexOfNewLevel]
+
+	# Sets boundries of an element after modification in the plan and returns True if element is split
+	def modifyLevelsAndOffsets(self, record, plan):
+		if record.baseLevelIndex == None or record.topElevation == None:
+			return False
+		plan.baseLevelIndex, plan.baseOffset = self.tryToModifyBaseBoundries(record)
+		plan.topLevelIndex, plan.topOffset = self.tryToModifyTopBoundries(record)
+		if plan.topLevelIndex == None:
+			plan.topOffset = None
+			return False
+		# Element must go trought at least one level between base and top level
+		return plan.topLevelIndex - plan.baseLevelIndex > 1
+
+	# Plan for walls and columns. Each segment is a copy of element constrained between two neighbouring levels.
+	# Element with top offset gets additional segment above the top level
+	def planVerticalElement(self, record):
+		plan = SplitPlan(record)
+		if not self.modifyLevelsAndOffsets(record, plan):
+			return plan
+		plan.isSplit = True
+		startLevelIndex = plan.baseLevelIndex
+		endLevelIndex = plan.topLevelIndex
+		for i in range(startLevelIndex, endLevelIndex):
+			if i == startLevelIndex:
+				segment = SegmentPlan(i, i + 1, plan.baseOffset, 0)
+			elif i == endLevelIndex - 1:
+				# optionaly top offset might be set here instead of additional segment
+				segment = SegmentPlan(i, i + 1, 0, 0)
+			else:
+				segment = SegmentPlan(i, i + 1, 0, 0, True)
+			plan.segments.append(segment)
+		if plan.topOffset != 0:
+			plan.segments.append(SegmentPlan(endLevelIndex, endLevelIndex, 0, plan.topOffset))
+		return plan
+
+	# Plan for slanted columns. Column is cut by each level crossing it. Parameter of each cut is distance from base
+	# of the column to the level related to height of the whole column. Cuts closer than Settings.ROUNDING to the
+	# previous cut or to the end of the column are skipped. lastPieceLevelIndex is base level of the top piece
+	def planSlantedColumn(self, record):
+		plan = SplitPlan(record)
+		if not self.modifyLevelsAndOffsets(record, plan):
+			return plan
+		plan.isSplit = True
+		startLevelIndex = plan.baseLevelIndex
+		endLevelIndex = plan.topLevelIndex
+		elevations = self.levelIndex.elevations
+		baseElevation = elevations[startLevelIndex] + plan.baseOffset
+		height = record.endPoint[2] - record.startPoint[2]
+		lastParameter = 0
+		for i in range(startLevelIndex, endLevelIndex):
+			cutElevation = elevations[i+1]
+			if i == endLevelIndex - 1:
+				cutElevation = cutElevation + plan.topOffset
+			parameter = (cutElevation - baseElevation) / height
+			if round(parameter - lastParameter, Settings.ROUNDING) > 0 and round(parameter, Settings.ROUNDING) < 1:
+				plan.slantedCuts.append(SlantedCutPlan(i, parameter))
+				lastParameter = parameter
+				plan.lastPieceLevelIndex = i + 1
+			else:
+				plan.lastPieceLevelIndex = i
+		return plan
+
+
+# Pool of worker processes planning splits in parallel. Workers are forked from the run process, so they share its
+# planner and level index. Records and plans are sent as tuples of plain values, only the planning is done in
+# workers - elements are read and split in the run process. If processes can't be forked (IronPython, Windows)
+# or a worker fails, records are planned by the planner of the run process
+class PlanningPool():
+
+	# Smaller batches are planned in the run process, as sending them costs more than their planning
+	MIN_RECORDS = 256
+
+	def __init__(self, planner, numberOfWorkers):
+		self.planner = planner
+		self.numberOfWorkers = numberOfWorkers
+		self.connections = None
+		self.processes = None
+		self.isBroken = False
+
+	# Starts workers if they are not started yet. Returns False if workers can't be started
+	def start(self):
+		if self.connections != None:
+			return True
+		try:
+			import multiprocessing
+			context = multiprocessing.get_context("fork")
+		except (ImportError, AttributeError, ValueError):
+			self.isBroken = True
+			return False
+		self.connections = list()
+		self.processes = list()
+		for i in range(self.numberOfWorkers):
+			connection, workerConnection = context.Pipe()
+			process = context.Process(target = self.work, args = (workerConnection,))
+			process.daemon = True
+			process.start()
+			workerConnection.close()
+			self.connections.append(connection)
+			self.processes.append(process)
+		return True
+
+	# Loop of worker process. Plans received records until None is received
+	def work(self, connection):
+		while True:
+			data = connection.recv()
+			if data == None:
+				break
+			plans = self.planner.planMany([recordFromData(recordData) for recordData in data])
+			connection.send([plan.getData() for plan in plans])
+
+	# Returns split plans of records in the same order. Records are divided between workers equally
+	def planMany(self, records):
+		# Risers are planned together, so they are not divided between workers
+		if self.isBroken or Settings.MEP_RISERS or len(records) < self.MIN_RECORDS or not self.start():
+			return self.planner.planMany(records)
+		chunkSize = int(math.ceil(float(len(records)) / self.numberOfWorkers))
+		chunks = [records[i:i + chunkSize] for i in range(0, len(records), chunkSize)]
+		try:
+			for i in range(len(chunks)):
+				self.connections[i].send([record.getData() for record in chunks[i]])
+			plans = list()
+			for i in range(len(chunks)):
+				plansData = self.connections[i].recv()
+				for j in range(len(chunks[i])):
+					plans.append(planFromData(chunks[i][j], plansData[j]))
+			return plans
+		except Exception:
+			self.close()
+			self.isBroken = True
+			return self.planner.planMany(records)
+
+	# Stops workers
+	def close(self):
+		if self.connections == None:
+			return
+		for connection in self.connections:
+			try:
+				connection.send(None)
+				connection.close()
+			except Exception:
+				pass
+		for process in self.processes:
+			process.join(1)
+		self.connections = None
+		self.processes = None
+
+
+# Batched planning of MEP elements. Start and end points of all records are loaded into arrays and verticality,
+# levels crossed by elements and cut points are computed for all elements at once - with numpy if it is available,
+# otherwise in one loop using bisect. Cut point lies exactly on level plane. Revit elements are only cut in
+# precomputed points later
+class MEPCutEngine():
+
+	# Smaller batches are computed without numpy, as its overhead is bigger than the gain
+	NUMPY_MIN_RECORDS = 64
+
+	def __init__(self, levelIndex):
+		self.levelIndex = levelIndex
+
+	# Returns split plans of MEP element records. Records connected into risers are planned per riser
+	def plan(self, records):
+		cuts = [None] * len(records)
+		# Connected ids are read also for snapshot, risers are planned only in risers mode
+		risers = list()
+		if Settings.MEP_RISERS:
+			risers = self.getRisers(records)
+		for riser in risers:
+			riserCuts = self.computeRiserCuts([records[i] for i in riser])
+			for i in range(len(riser)):
+				cuts[riser[i]] = riserCuts[i]
+		positions = [i for i in range(len(records)) if cuts[i] == None]
+		otherRecords = [records[i] for i in positions]
+		if numpy != None and len(otherRecords) >= self.NUMPY_MIN_RECORDS and len(self.levelIndex) > 0:
+			otherCuts = self.computeCutsWithNumpy(otherRecords)
+		else:
+			otherCuts = self.computeCuts(otherRecords)
+		for i in range(len(positions)):
+			cuts[positions[i]] = otherCuts[i]
+		return [self.createPlan(records[i], cuts[i]) for i in range(len(records))]
+
+	# Returns True if record of MEP element is almost vertical
+	def isVertical(self, record):
+		verticalLength = abs(record.endPoint[2] - record.startPoint[2])
+		horizontalLength = math.sqrt((record.endPoint[0] - record.startPoint[0])**2 + (record.endPoint[1] - record.startPoint[1])**2)
+		return verticalLength > 0 and horizontalLength / verticalLength <= Settings.VERTICAL_RATIO
+
+	# Returns risers - lists of positions of vertical records of the same kind, which are connected with each other
+	# (record.connectedIds) and lie on one vertical line. Positions are sorted from the lowest segment. Risers of
+	# one segment are not returned
+	def getRisers(self, records):
+		positionOfId = dict()
+		for i in range(len(records)):
+			if records[i].connectedIds != None and self.isVertical(records[i]):
+				positionOfId[records[i].elementId] = i
+		# Union-find of connected segments
+		parents = dict([(i, i) for i in positionOfId.values()])
+		def findRoot(i):
+			while parents[i] != i:
+				parents[i] = parents[parents[i]]
+				i = parents[i]
+			return i
+		for i in positionOfId.values():
+			for connectedId in records[i].connectedIds:
+				j = positionOfId.get(connectedId)
+				if j != None and records[j].kind == records[i].kind and self.areCollinear(records[i], records[j]):
+					parents[findRoot(i)] = findRoot(j)
+		risers = dict()
+		for i in positionOfId.values():
+			risers.setdefault(findRoot(i), list()).append(i)
+		lowZ = lambda i : min(records[i].startPoint[2], records[i].endPoint[2])
+		return [sorted(riser, key = lowZ) for riser in risers.values() if len(riser) > 1]
+
+	# Returns True if two vertical records lie on one vertical line
+	def areCollinear(self, firstRecord, secondRecord):
+		return abs(firstRecord.startPoint[0] - secondRecord.startPoint[0]) <= Settings.ELEVATION_TOL \
+			and abs(firstRecord.startPoint[1] - secondRecord.startPoint[1]) <= Settings.ELEVATION_TOL
+
+	# Returns cuts (as computeCuts) of records of one riser sorted from the lowest segment. Levels crossing the riser
+	# are found once and each of them is assigned to the segment which it crosses. Levels near joints are skipped
+	def computeRiserCuts(self, records):
+		elevations = self.levelIndex.projectElevations
+		lows = [min(record.startPoint[2], record.endPoint[2]) for record in records]
+		highs = [max(record.startPoint[2], record.endPoint[2]) for record in records]
+		joints = lows[1:]
+		cutElevations = [list() for record in records]
+		for levelIndex in self.levelIndex.levelsCrossing(lows[0] + Settings.OFFSET_TOLERANCE, highs[-1] - Settings.ELEVATION_TOL, True):
+			z = elevations[levelIndex]
+			jointIndex = bisect.bisect_left(joints, z)
+			isNearJoint = (jointIndex < len(joints) and joints[jointIndex] - z < Settings.OFFSET_TOLERANCE) \
+				or (jointIndex > 0 and z - joints[jointIndex - 1] < Settings.OFFSET_TOLERANCE)
+			segmentIndex = bisect.bisect_right(lows, z) - 1
+			if not isNearJoint and z < highs[segmentIndex] - Settings.ELEVATION_TOL:
+				cutElevations[segmentIndex].append(z)
+		cuts = list()
+		for i in range(len(records)):
+			cutPoints = [pointOnElevation(records[i].startPoint, records[i].endPoint, z) for z in cutElevations[i]]
+			pieceLevels = list()
+			if cutPoints:
+				boundries = [lows[i]] + cutElevations[i] + [highs[i]]
+				for j in range(len(boundries) - 1):
+					pieceLevels.append(self.getProperLevelOfElement(boundries[j], boundries[j + 1]))
+			cuts.append((len(cutPoints) > 0, cutPoints, pieceLevels))
+		return cuts
+
+	# Returns list of (isSplit, cut points sorted by elevation, levels of pieces from the lowest) for each record
+	def computeCuts(self, records):
+		elevations = self.levelIndex.projectElevations
+		cuts = list()
+		for record in records:
+			startPoint = record.startPoint
+			endPoint = record.endPoint
+			lowZ = min(startPoint[2], endPoint[2])
+			highZ = max(startPoint[2], endPoint[2])
+			verticalLength = highZ - lowZ
+			dx = endPoint[0] - startPoint[0]
+			dy = endPoint[1] - startPoint[1]
+			horizontalLength = math.sqrt(dx * dx + dy * dy)
+			# element is almost vertical and goes trought at least one level
+			isSplit = verticalLength > 0 and horizontalLength / verticalLength <= Settings.VERTICAL_RATIO \
+				and bisect.bisect_left(elevations, highZ - Settings.ELEVATION_TOL) > bisect.bisect_right(elevations, lowZ)
+			cutPoints = list()
+			pieceLevels = list()
+			if isSplit:
+				for levelIndex in self.levelIndex.levelsCrossing(lowZ + Settings.OFFSET_TOLERANCE, highZ - Settings.ELEVATION_TOL, True):
+					cutPoints.append(pointOnElevation(startPoint, endPoint, elevations[levelIndex]))
+			if cutPoints:
+				boundries = [lowZ] + [cutPoint[2] for cutPoint in cutPoints] + [highZ]
+				for i in range(len(boundries) - 1):
+					pieceLevels.append(self.getProperLevelOfElement(boundries[i], boundries[i + 1]))
+			cuts.append((isSplit, cutPoints, pieceLevels))
+		return cuts
+
+	# The same as computeCuts, but all elements, cuts and pieces are computed in arrays
+	def computeCutsWithNumpy(self, records):
+		elevations = numpy.array(self.levelIndex.projectElevations, dtype = float)
+		startPoints = numpy.array([record.startPoint for record in records], dtype = float)
+		endPoints = numpy.array([record.endPoint for record in records], dtype = float)
+		lowZ = numpy.minimum(startPoints[:, 2], endPoints[:, 2])
+		highZ = numpy.maximum(startPoints[:, 2], endPoints[:, 2])
+		verticalLength = highZ - lowZ
+		dx = endPoints[:, 0] - startPoints[:, 0]
+		dy = endPoints[:, 1] - startPoints[:, 1]
+		horizontalLength = numpy.sqrt(dx * dx + dy * dy)
+		isVertical = verticalLength > 0
+		isVertical[isVertical] = horizontalLength[isVertical] / verticalLength[isVertical] <= Settings.VERTICAL_RATIO
+		lastLevel = numpy.searchsorted(elevations, highZ - Settings.ELEVATION_TOL, "left")
+		isSplit = isVertical & (lastLevel > numpy.searchsorted(elevations, lowZ, "right"))
+		firstLevel = numpy.searchsorted(elevations, lowZ + Settings.OFFSET_TOLERANCE, "right")
+		numberOfCuts = numpy.where(isSplit, numpy.maximum(lastLevel - firstLevel, 0), 0)
+		# Cuts of all elements in one flat array. cutOwners are positions of records
+		cutOffsets = numpy.cumsum(numberOfCuts) - numberOfCuts
+		cutOwners = numpy.repeat(numpy.arange(len(records)), numberOfCuts)
+		cutZ = elevations[firstLevel[cutOwners] + numpy.arange(len(cutOwners)) - cutOffsets[cutOwners]]
+		ratio = (cutZ - startPoints[cutOwners, 2]) / (endPoints[cutOwners, 2] - startPoints[cutOwners, 2])
+		cutX = startPoints[cutOwners, 0] + (endPoints[cutOwners, 0] - startPoints[cutOwners, 0]) * ratio
+		cutY = startPoints[cutOwners, 1] + (endPoints[cutOwners, 1] - startPoints[cutOwners, 1]) * ratio
+		# Pieces of all elements in one flat array. Element with n cuts has n + 1 pieces
+		numberOfPieces = numpy.where(numberOfCuts > 0, numberOfCuts + 1, 0)
+		pieceOffsets = numpy.cumsum(numberOfPieces) - numberOfPieces
+		pieceOwners = numpy.repeat(numpy.arange(len(records)), numberOfPieces)
+		pieceLevels = numpy.zeros(0, dtype = int)
+		if len(cutZ) > 0:
+			positionInElement = numpy.arange(len(pieceOwners)) - pieceOffsets[pieceOwners]
+			cutPosition = cutOffsets[pieceOwners] + positionInElement
+			pieceLowZ = numpy.where(positionInElement == 0, lowZ[pieceOwners], cutZ[numpy.maximum(cutPosition - 1, 0)])
+			pieceHighZ = numpy.where(positionInElement == numberOfCuts[pieceOwners], highZ[pieceOwners], cutZ[numpy.minimum(cutPosition, len(cutZ) - 1)])
+			pieceLevels = self.getProperLevelsOfElements(elevations, pieceLowZ, pieceHighZ)
+		cutX = cutX.tolist()
+		cutY = cutY.tolist()
+		cutZ = cutZ.tolist()
+		pieceLevels = pieceLevels.tolist()
+		cuts = list()
+		for i in range(len(records)):
+			start = int(cutOffsets[i])
+			end = start + int(numberOfCuts[i])
+			pieceStart = int(pieceOffsets[i])
+			cutPoints = [(cutX[j], cutY[j], cutZ[j]) for j in range(start, end)]
+			cuts.append((bool(isSplit[i]), cutPoints, pieceLevels[pieceStart:pieceStart + int(numberOfPieces[i])]))
+		return cuts
+
+	# Creates split plan from computed cuts. Pieces are kept in the direction of original curve
+	def createPlan(self, record, cuts):
+		isSplit, cutPoints, pieceLevels = cuts
+		plan = SplitPlan(record)
+		# checks style of a MEP element is it model from Top to Down or from Down to Top
+		if record.startPoint[2] > record.endPoint[2]:
+			plan.modelingStyle = "TopToDown"
+		else:
+			plan.modelingStyle = "DownToTop"
+		if not isSplit:
+			# Element which is below the lowest level is assigned to the lowest level
+			highZ = max(record.startPoint[2], record.endPoint[2])
+			if len(self.levelIndex) > 0 and highZ < self.levelIndex.projectElevations[0]:
+				plan.baseLevelIndex = 0
+			return plan
+		plan.isSplit = True
+		lowerPoint = record.endPoint if plan.modelingStyle == "TopToDown" else record.startPoint
+		for i in range(len(cutPoints)):
+			cutPoint = cutPoints[i]
+			if plan.modelingStyle == "TopToDown":
+				lowerPiece, remainingPiece = (cutPoint, lowerPoint), (record.startPoint, cutPoint)
+			else:
+				lowerPiece, remainingPiece = (lowerPoint, cutPoint), (cutPoint, record.endPoint)
+			plan.cuts.append(CutPlan(cutPoint, lowerPiece, remainingPiece, pieceLevels[i]))
+			lowerPoint = cutPoint
+		if plan.cuts:
+			plan.lastPieceLevelIndex = pieceLevels[-1]
+		return plan
+
+	# Returns index of level where piece of MEP element belongs to - description of conditions inside the method.
+	# startPoint and endPoint are Z coordinates of the lower and the upper end of the piece
+	def getProperLevelOfElement(self, startPoint, endPoint):
+		# levels are sorted by elevation in ascending order. Condition checks if start point is located close
+		# to an level. If so found level is set as host level
+		levelIndex = self.levelIndex.levelNear(startPoint, Settings.ELEVATION_TOL, True)
+		endLevelIndex = self.levelIndex.levelNear(endPoint, Settings.ELEVATION_TOL, True)
+		# The same as condition for start point. But in case of end point levelIndex is decreased by one (if 
+		# levelIndex != 0), because element has its start point somewhere between levelIndex and levelIndex - 1,
+		# so levelIndex - 1 is choosen. The lower of both levels wins
+		if endLevelIndex != None and (levelIndex == None or endLevelIndex < levelIndex):
+			levelIndex = endLevelIndex
+			elevation = self.levelIndex.projectElevations[levelIndex]
+			if levelIndex != 0 and not (startPoint > elevation and endPoint >= elevation):
+				levelIndex = levelIndex - 1
+		# Element is not located close to any level - the highest level is assigned
+		elif levelIndex == None:
+			levelIndex = len(self.levelIndex) - 1
+		return levelIndex
+
+	# The same as getProperLevelOfElement for arrays of Z coordinates of many pieces
+	def getProperLevelsOfElements(self, elevations, startPoints, endPoints):
+		highestLevel = len(elevations) - 1
+		levelIndex = numpy.searchsorted(elevations, startPoints - Settings.ELEVATION_TOL, "right")
+		isStartNear = (levelIndex <= highestLevel) & (elevations[numpy.minimum(levelIndex, highestLevel)] < startPoints + Settings.ELEVATION_TOL)
+		endLevelIndex = numpy.searchsorted(elevations, endPoints - Settings.ELEVATION_TOL, "right")
+		isEndNear = (endLevelIndex <= highestLevel) & (elevations[numpy.minimum(endLevelIndex, highestLevel)] < endPoints + Settings.ELEVATION_TOL)
+		isEndLevel = isEndNear & (~isStartNear | (endLevelIndex < levelIndex))
+		elevation = elevations[numpy.minimum(endLevelIndex, highestLevel)]
+		isLevelBelow = (endLevelIndex != 0) & ~((startPoints > elevation) & (endPoints >= elevation))
+		levels = numpy.where(isStartNear, levelIndex, highestLevel)
+		return numpy.where(isEndLevel, numpy.where(isLevelBelow, endLevelIndex - 1, endLevelIndex), levels)
+
+# Returns distance between two (x, y, z) points
+def pointDistance(startPoint, endPoint):
+	return math.sqrt((endPoint[0] - startPoint[0])**2 + (endPoint[1] - startPoint[1])**2 + (endPoint[2] - startPoint[2])**2)
+
+# Returns point of line from startPoint to endPoint located at given elevation
+def pointOnElevation(startPoint, endPoint, z):
+	ratio = (z - startPoint[2]) / (endPoint[2] - startPoint[2])
+	return (startPoint[0] + (endPoint[0] - startPoint[0]) * ratio, startPoint[1] + (endPoint[1] - startPoint[1]) * ratio, z)
+
+# Converts db.XYZ into (x, y, z) tuple
+def xyzToTuple(point):
+	return (point.X, point.Y, point.Z)
+
+# Converts (x, y, z) tuple into db.XYZ
+def tupleToXYZ(point):
+	return db.XYZ(point[0], point[1], point[2])
+
+# Returns (bottom, top) of location curve of an element
+def getCurveVerticalExtent(element):
+	curve = element.Location.Curve
+	startZ = curve.GetEndPoint(0).Z
+	endZ = curve.GetEndPoint(1).Z
+	return min(startZ, endZ), max(startZ, endZ)
+
+
+# Dedicated class for opening which is hosted in a wall. Openings of a wall are read once into an index sorted by
+# elevation, so openings out of range of any segment are found by interval lookup
 class WallOpenings():
 
 
-	def __init__(self, levels, wall, doc):
-		self.levels = levels
+	def __init__(self, levelIndex, wall, doc):
+		self.levelIndex = levelIndex
 		self.wall = wall
 		self.doc = doc
 		self.getListOfOpeningsHostedInWall()
 		self.createDictionaryOpeningAndItsLevel()
+		self.createElevationIndex()
+		# Openings of wall copies collected for deletion
+		self.openingsToDelete = list()
 
-	# Deletes openings which are not in boundries of new/edited wall element
-	def deleteOpeningsNotInWallRange(self):
-		wallBaseConstrainId = self.wall.get_Parameter(db.BuiltInParameter.WALL_BASE_CONSTRAINT).AsElementId()
-		wallBaseOffset = self.wall.get_Parameter(db.BuiltInParameter.WALL_BASE_OFFSET).AsDouble()
-		wallTopConstrain = self.wall.get_Parameter(db.BuiltInParameter.WALL_HEIGHT_TYPE).AsElementId()
-		wallTopOffset = self.wall.get_Parameter(db.BuiltInParameter.WALL_TOP_OFFSET).AsDouble()
-
-		wallBaseElevation = self.doc.GetElement(wallBaseConstrainId).Elevation + wallBaseOffset
-		wallTopElevation = self.doc.GetElement(wallTopConstrain).Elevation + wallTopOffset
-		TransactionManager.Instance.EnsureInTransaction(self.doc)
-		for openingId in self.openingDictionary:
-			openingElevation = self.openingDictionary[openingId]
-			if openingElevation < wallBaseElevation or openingElevation > wallTopElevation:
-				self.doc.Delete(openingId)
-		TransactionManager.Instance.TransactionTaskDone()
-		   
 	# Creates list of openings elements ids and assigns it to allOpeningsId element
 	def getListOfOpeningsHostedInWall(self):
-		self.allOpeningsId = self.wall.GetDependentElements(db.ElementCategoryFilter(db.BuiltInCategory.OST_GenericModel))
-		
-	# Creates dictionary of openings. Pair is openingId : levelId
+		self.allOpeningsId = self.getOpeningsOfWall(self.wall)
+
+	# Returns ids of openings hosted in a wall sorted by IntegerValue
+	def getOpeningsOfWall(self, wall):
+		openingIds = wall.GetDependentElements(db.ElementCategoryFilter(db.BuiltInCategory.OST_GenericModel))
+		return sorted(openingIds, key = lambda x : x.IntegerValue)
+
+	# Creates dictionary of openings. Pair is openingId : elevation
 	def createDictionaryOpeningAndItsLevel(self):
 		self.openingDictionary = {}
 		for openingId in self.allOpeningsId:
-			opening = doc.GetElement(openingId)
+			opening = self.doc.GetElement(openingId)
 			self.openingDictionary[openingId] = self.getElevationOfOpening(opening)
 		return self.openingDictionary
 
-	# Returns levelId of the closest to an opening
+	# Creates tuples of opening elevations sorted ascending and of positions of these openings in allOpeningsId
+	def createElevationIndex(self):
+		order = sorted(range(len(self.allOpeningsId)), key = lambda x : self.openingDictionary[self.allOpeningsId[x]])
+		self.sortedElevations = tuple([self.openingDictionary[self.allOpeningsId[i]] for i in order])
+		self.sortedPositions = tuple(order)
+
+	# Returns elevation of an opening. Depending upon family elevation is stored in "Elevation" or "Elevation from
+	# Level" parameter, definitions are resolved once per family type
 	def getElevationOfOpening(self, opening):
-		openingLevelId = opening.LookupParameter("Level").AsElementId()
-		openingLevel = self.doc.GetElement(openingLevelId)
-		index = self.levels.index(openingLevelId)
+		openingLevelElevation = self.getLevelElevation(parameterDefinitions.getParameter(opening, ("Level",)).AsElementId())
+		elevationParameter = parameterDefinitions.getParameter(opening, ("Elevation", "Elevation from Level"))
+		return openingLevelElevation + elevationParameter.AsDouble()
+
+	# Returns elevation of level. Level which is not in the index (ie. hidden in current view) is read from document
+	def getLevelElevation(self, levelId):
 		try:
-			openingGeneralElevation = openingLevel.Elevation + opening.LookupParameter("Elevation").AsDouble()
-		except AttributeError:
-			openingGeneralElevation = openingLevel.Elevation + opening.LookupParameter("Elevation from Level").AsDouble()
-		return openingGeneralElevation
-
-	# Gets level index in list of levels
-	def getLevelIndex(self, index, opening, openingGeneralElevation):
-		i = index
-		while i < len(self.levels):
-			levelElement = doc.GetElement(self.levels[i])
-			if levelElement.Elevation <= openingGeneralElevation:
-				index = i
+			return self.levelIndex.elevationOf(levelId)
+		except ValueError:
+			return self.doc.GetElement(levelId).Elevation
+
+	# Returns positions (in allOpeningsId) of openings which are below baseElevation or above topElevation
+	def getPositionsOutOfRange(self, baseElevation, topElevation):
+		below = bisect.bisect_left(self.sortedElevations, baseElevation)
+		above = bisect.bisect_right(self.sortedElevations, topElevation)
+		return self.sortedPositions[:below] + self.sortedPositions[above:]
+
+	# Returns number of openings which are not in given range
+	def countOpeningsOutOfRange(self, baseElevation, topElevation):
+		return len(self.getPositionsOutOfRange(baseElevation, topElevation))
+
+	# Collects openings of wall copy which are not in its range. Copies of openings are usually created in the same
+	# order as original openings, so they are matched by order of ids and elevation of each matched opening to
+	# delete is compared with its original. If number of openings differs or any elevation doesn't match, openings
+	# of the copy are read
+	def collectOpeningsOfCopy(self, wallCopy, baseElevation, topElevation):
+		openingsOfCopy = self.getOpeningsOfWall(wallCopy)
+		positions = None
+		if len(openingsOfCopy) == len(self.allOpeningsId):
+			positions = self.getPositionsOutOfRange(baseElevation, topElevation)
+			for position in positions:
+				elevation = self.getElevationOfOpening(self.doc.GetElement(openingsOfCopy[position]))
+				if abs(elevation - self.openingDictionary[self.allOpeningsId[position]]) > Settings.ELEVATION_TOL:
+					positions = None
+					break
+		if positions == None:
+			copyOpenings = WallOpenings(self.levelIndex, wallCopy, self.doc)
+			openingsOfCopy = copyOpenings.allOpeningsId
+			positions = copyOpenings.getPositionsOutOfRange(baseElevation, topElevation)
+		for position in positions:
+			self.openingsToDelete.append(openingsOfCopy[position])
+
+	# Deletes all collected openings at once
+	def deleteCollectedOpenings(self):
+		if self.openingsToDelete:
+			self.doc.Delete(sysList[db.ElementId](self.openingsToDelete))
+		self.openingsToDelete = list()
+
+
+# Joins geometry of split elements at the end of the run. Pairs of segments of all split walls and columns and pairs
+# of segments and elements joined with original elements are collected first, each pair only once. Original
+# elements deleted later in the run (ie. split neighbours) are replaced by their segments when pairs are joined.
+# Geometry is regenerated once, pairs which are already joined are skipped and failed joins are counted by reason
+class GeometryJoiner():
+
+	def __init__(self, doc):
+		self.doc = doc
+		self.pairs = list()
+		self.pairKeys = set()
+		# id of deleted original element : list of (id, bottom, top) of its segments
+		self.replacedIds = dict()
+		# id : (bottom, top) of segments and neighbours in pairs
+		self.ranges = dict()
+		self.numberOfJoined = 0
+		self.numberOfAlreadyJoined = 0
+		self.failures = dict()
+
+	# Adds pair of element ids to join. The same pair added again is ignored. Pairs are kept as integer values of
+	# ids, elements are got from the document when they are joined
+	def addPair(self, firstId, secondId):
+		key = tuple(sorted((firstId.IntegerValue, secondId.IntegerValue)))
+		if key[0] == key[1] or key in self.pairKeys:
+			return
+		self.pairKeys.add(key)
+		self.pairs.append((firstId.IntegerValue, secondId.IntegerValue))
+
+	# Returns list of (id, bottom, top) of elements joined with an element. It has to be read before the element
+	# is deleted
+	def getNeighbours(self, element):
+		neighbours = list()
+		for neighbourId in db.JoinGeometryUtils.GetJoinedElements(self.doc, element):
+			boundingBox = self.doc.GetElement(neighbourId).get_BoundingBox(None)
+			if boundingBox != None:
+				neighbours.append((neighbourId, boundingBox.Min.Z, boundingBox.Max.Z))
+		return neighbours
+
+	# Adds pairs of neighbours and elements which vertical ranges overlap. Elements are (id, bottom, top) tuples
+	def addNeighbourPairs(self, neighbours, elements):
+		for neighbourId, neighbourBottom, neighbourTop in neighbours:
+			for elementId, bottom, top in elements:
+				if self.areOverlapping((neighbourBottom, neighbourTop), (bottom, top)):
+					self.ranges[neighbourId.IntegerValue] = (neighbourBottom, neighbourTop)
+					self.ranges[elementId.IntegerValue] = (bottom, top)
+					self.addPair(elementId, neighbourId)
+
+	# Records segments of original element which is deleted after the split. Segments are (id, bottom, top) tuples
+	def addReplacedElement(self, elementId, segments):
+		self.replacedIds[elementId.IntegerValue] = [(segmentId.IntegerValue, bottom, top)
+			for segmentId, bottom, top in segments]
+		for segmentId, bottom, top in segments:
+			self.ranges[segmentId.IntegerValue] = (bottom, top)
+
+	# Returns True if vertical ranges (bottom, top) overlap
+	def areOverlapping(self, firstRange, secondRange):
+		return firstRange[0] <= secondRange[1] + Settings.ELEVATION_TOL \
+			and firstRange[1] >= secondRange[0] - Settings.ELEVATION_TOL
+
+	# Returns True if vertical ranges (bottom, top) have common part longer than ELEVATION_TOL, so ranges which only
+	# touch at a level are not sharing
+	def areSharingRange(self, firstRange, secondRange):
+		return firstRange[0] < secondRange[1] - Settings.ELEVATION_TOL \
+			and firstRange[1] > secondRange[0] + Settings.ELEVATION_TOL
+
+	# Returns collected pairs in which deleted original elements are replaced by their segments. Segment replaces
+	# the original only in pairs with elements which vertical ranges share part of its range
+	def resolvePairs(self):
+		pairs = list()
+		keys = set()
+		for firstId, secondId in self.pairs:
+			for first in self.replacedIds.get(firstId, [(firstId,) + self.ranges.get(firstId, (None, None))]):
+				for second in self.replacedIds.get(secondId, [(secondId,) + self.ranges.get(secondId, (None, None))]):
+					isReplaced = firstId in self.replacedIds or secondId in self.replacedIds
+					if isReplaced and first[1] != None and second[1] != None and not self.areSharingRange(first[1:], second[1:]):
+						continue
+					key = tuple(sorted((first[0], second[0])))
+					if key[0] != key[1] and key not in keys:
+						keys.add(key)
+						pairs.append((first[0], second[0]))
+		return pairs
+
+	# Joins all collected pairs
+	def joinAll(self):
+		if not self.pairs:
+			return
+		self.doc.Regenerate()
+		elements = dict()
+		for firstId, secondId in self.resolvePairs():
+			first = self.getElement(firstId, elements)
+			second = self.getElement(secondId, elements)
+			if first == None or second == None:
+				self.addFailure("Element doesn't exist")
+			elif db.JoinGeometryUtils.AreElementsJoined(self.doc, first, second):
+				self.numberOfAlreadyJoined += 1
 			else:
-				break
-			i += 1
-		return index
+				try:
+					db.JoinGeometryUtils.JoinGeometry(self.doc, first, second)
+					self.numberOfJoined += 1
+				except Exception as exception:
+					self.addFailure(str(exception))
+		self.pairs = list()
+
+	# Returns element of given id (IntegerValue). Elements are got from document once
+	def getElement(self, elementId, elements):
+		if elementId not in elements:
+			elements[elementId] = self.doc.GetElement(db.ElementId(elementId))
+		return elements[elementId]
+
+	# Counts failed join. Reason is message of exception
+	def addFailure(self, reason):
+		self.failures[reason] = self.failures.get(reason, 0) + 1
+
+	# Returns table of failed joins - reason and number of pairs. None if all joins succeeded
+	def getFailureReport(self):
+		if not self.failures:
+			return None
+		report = [["Join failure", "Pairs"]]
+		for reason in sorted(self.failures):
+			report.append([reason, self.failures[reason]])
+		return report
+
+
+# Collects ids of split elements into groups of the run by strategy (Settings.GROUPING). Groups are created at the
+# end of the run, one NewGroup call per group
+class ElementGrouper():
+
+	STRATEGIES = ("Element", "Level", "Category", "Run")
+
+	def __init__(self, doc, strategy = Settings.GROUPING):
+		if strategy not in self.STRATEGIES:
+			raise ValueError("Unknown grouping strategy %s" % strategy)
+		self.doc = doc
+		self.strategy = strategy
+		# key : list of integer values of element ids, keys in order of their first member
+		self.groups = dict()
+		self.keys = list()
+		self.numberOfSplitElements = 0
+		self.numberOfGroups = 0
+
+	# Returns keys of groups of pieces of one split element. levelIndices are level positions of pieces
+	def getKeys(self, splitter, levelIndices):
+		self.numberOfSplitElements += 1
+		if self.strategy == "Element":
+			return [self.numberOfSplitElements] * len(levelIndices)
+		if self.strategy == "Level":
+			return list(levelIndices)
+		if self.strategy == "Category":
+			return [splitter.KIND] * len(levelIndices)
+		return [None] * len(levelIndices)
+
+	# Adds pieces of one split element to their groups
+	def addMembers(self, splitter, elements, levelIndices):
+		keys = self.getKeys(splitter, levelIndices)
+		for i in range(len(elements)):
+			if keys[i] not in self.groups:
+				self.groups[keys[i]] = list()
+				self.keys.append(keys[i])
+			self.groups[keys[i]].append(elements[i].Id.IntegerValue)
+
+	# Creates all collected groups
+	def createGroups(self):
+		for key in self.keys:
+			self.doc.Create.NewGroup(sysList[db.ElementId]([db.ElementId(elementId) for elementId in self.groups[key]]))
+		self.numberOfGroups += len(self.keys)
+		self.groups = dict()
+		self.keys = list()
+
+
+# Objects shared by all splitters of the run - level index, geometry joiner, element grouper, level state (None if
+# Settings.LEVEL_STATE_FILE is not set), failure handler and riser index (None if Settings.MEP_RISERS is off). Run
+# is created once when the script is run and passed to splitters
+class SplitRun():
+
+	def __init__(self, doc, getAllLevels):
+		self.doc = doc
+		self.levelIndex = readLevelIndex(doc, getAllLevels)
+		self.geometryJoiner = GeometryJoiner(doc)
+		self.elementGrouper = ElementGrouper(doc)
+		self.levelState = None
+		if Settings.LEVEL_STATE_FILE != None:
+			self.levelState = LevelState(Settings.LEVEL_STATE_FILE, doc)
+		self.failureHandler = FailureHandler(doc)
+		# Risers of selected MEP elements (Settings.MEP_RISERS), filled before elements are split
+		self.riserIndex = None
+		if Settings.MEP_RISERS:
+			self.riserIndex = RiserIndex(self)
 
 
 # Abstract class - main class
 class ElementSplitter():
 
-	def __init__(self, doc, element):
-		self.doc = doc
+	# Kind of element used by planner
+	KIND = None
+
+	# Categories of elements split by the class, used when elements are collected from the document
+	BUILT_IN_CATEGORIES = ()
+
+	def __init__(self, run, element):
+		self.run = run
+		self.doc = run.doc
 		self.element = element
-		self.levelIdsList = getListOfLevelIds(doc)
-		self.listLevels = self.convertListOfLevelIdsToElements()
+		self.levelIndex = run.levelIndex
+		self.levelIdsList = self.levelIndex.ids
 		self.listOfElements = list()
-	
-	# Lanuch function which tries to modify offsets
-	def modifyLevelsAndOffsets(self):
-		self.tryToModifyBaseBoundries()
-		self.tryToModifyTopBoundries()
-	
-	# Gets data from splitting element
+
+	# Returns True if the class splits given element. Used by SplitterRegistry when there are more splitters
+	# registered for the same type of element
+	@classmethod
+	def canSplit(cls, element):
+		return True
+
+	# Returns (bottom, top) of the element read from its bounding box or None if element has no bounding box. Used by
+	# LevelCrossingFilter before splitter is created
+	@classmethod
+	def getVerticalExtent(cls, element):
+		boundingBox = element.get_BoundingBox(None)
+		if boundingBox == None:
+			return None
+		return boundingBox.Min.Z, boundingBox.Max.Z
+
+	# Returns estimated number of API calls of getVerticalExtent - bounding box or location curve
+	@classmethod
+	def estimateVerticalExtentApiCalls(cls):
+		return 1
+
+	# Returns record of the element or None if element can't be read
+	def getElementRecord(self):
+		try:
+			return self.readElementRecord()
+		# Element without required parameters or location can't be split. It is reported by failure handler of the run
+		except Exception as exception:
+			self.run.failureHandler.addFailure("Element not read: %s" % exception, "Script", "Skipped",
+				[self.element.Id.IntegerValue])
+			return None
+
+	# Returns plan which leaves element unchanged
+	def getEmptyPlan(self):
+		return SplitPlan(ElementRecord(self.element.Id.IntegerValue, self.KIND))
+
+	# Reads constraints of the element into a record for the planner
+	def readElementRecord(self):
+		record = ElementRecord(self.element.Id.IntegerValue, self.KIND)
+		baseLevelId = self.getBaseConstraintLevelId()
+		topLevelId = self.getTopConstraintLevelId()
+		record.baseLevelIndex = self.levelIndex.positions.get(baseLevelId.IntegerValue)
+		record.baseOffset = self.getBaseOffsetValue()
+		record.topLevelIndex = self.levelIndex.positions.get(topLevelId.IntegerValue)
+		record.topOffset = self.getTopOffsetValue()
+		if record.topLevelIndex != None:
+			record.topElevation = self.levelIndex.elevations[record.topLevelIndex] + record.topOffset
+		# means it's unconnected wall so top is calculated from base and unconnected height
+		elif topLevelId.IntegerValue == -1:
+			if record.baseLevelIndex != None:
+				record.topElevation = self.levelIndex.elevations[record.baseLevelIndex] + record.baseOffset + self.getHeight()
+		# Top level is not in the index (ie. it is not visible in current view)
+		else:
+			record.topElevation = self.doc.GetElement(topLevelId).Elevation + record.topOffset
+		return record
+
+	# Applies split plan. Segments are created as copies of element, joined together and original element is deleted.
+	# Element which is not split gets only modified boundries
+	def applyPlan(self, plan):
+		if not plan.isSplit:
+			return self.applyBoundries(plan)
+		self.getElementData()
+		# All segments (and additional element for top offset) are copied at once
+		copies = self.copyElements(len(plan.segments))
+		for i in range(len(plan.segments)):
+			self.applySegment(copies[i], plan.segments[i])
+			self.listOfElements.append(copies[i])
+		self.additionalModificationOfSegments()
+		self.collectJoins(plan)
+		self.deleteOriginalElement()
+		if IN[2]:
+			self.collectGroupMembers(plan)
+
+	# Sets constraints of a segment
+	def applySegment(self, element, segment):
+		self.setBaseOffsetValue(element, segment.baseOffset)
+		self.setTopOffsetValue(element, segment.topOffset)
+		if segment.copyData:
+			self.setElementData(element)
+		self.setBaseLevel(element, self.levelIdsList[segment.baseLevelIndex])
+		self.setTopLevel(element, self.levelIdsList[segment.topLevelIndex])
+		self.additionalModificationOfElement(element, segment)
+
+	# Sets modified base and top boundries to the original element (base as low and top as high as it is possible)
+	def applyBoundries(self, plan):
+		if plan.baseLevelIndex != None and plan.baseLevelIndex != plan.record.baseLevelIndex:
+			self.setBaseLevel(self.element, self.levelIdsList[plan.baseLevelIndex])
+			self.setBaseOffsetValue(self.element, plan.baseOffset)
+		if plan.topLevelIndex != None and plan.topLevelIndex != plan.record.topLevelIndex:
+			self.setTopLevel(self.element, self.levelIdsList[plan.topLevelIndex])
+			self.setTopOffsetValue(self.element, plan.topOffset)
+
+	# Returns number of openings deleted while plan is applied. Only walls host openings
+	def countOpeningsToDelete(self, plan):
+		return 0
+
+	# Returns estimated number of Revit API calls needed to read the element and apply the plan. Each parameter
+	# read or write is counted as two calls (get_Parameter and As.../Set)
+	def estimateApiCalls(self, plan):
+		# base and top constraints
+		calls = 8
+		if not plan.isSplit:
+			if plan.baseLevelIndex != None and plan.baseLevelIndex != plan.record.baseLevelIndex:
+				calls += 4
+			if plan.topLevelIndex != None and plan.topLevelIndex != plan.record.topLevelIndex:
+				calls += 4
+			return calls
+		numberOfSegments = len(plan.segments)
+		# element data, CopyElements and GetElement of each copy
+		calls += self.estimateElementDataApiCalls() + numberOfSegments.bit_length() + numberOfSegments
+		for segment in plan.segments:
+			calls += 8 + self.estimateSegmentApiCalls(segment)
+			if segment.copyData:
+				calls += self.estimateElementDataApiCalls()
+		# regeneration, joins and deletion of original element
+		calls += 1 + (numberOfSegments - 1) + 1
+		return calls
+
+	# Returns estimated number of API calls of additionalModificationOfElement
+	def estimateSegmentApiCalls(self, segment):
+		return 0
+
+	# Returns estimated number of API calls of reading or writing element data
+	def estimateElementDataApiCalls(self):
+		return 2 * len(Settings.CARRY_OVER_PARAMETERS)
+
+	# Gets data from splitting element - values of parameters listed in Settings.CARRY_OVER_PARAMETERS. Values are
+	# read once and kept with definitions of parameters
 	# For custom configuration
 	def getElementData(self):
-		self.param_Mark = self.element.LookupParameter("Mark").AsString()
+		self.carriedParameters = list()
+		for name in Settings.CARRY_OVER_PARAMETERS:
+			definition = parameterDefinitions.getDefinition(self.element, (name,))
+			if definition != None:
+				self.carriedParameters.append((definition, getParameterValue(self.element.get_Parameter(definition))))
 	
-	# Sets basic parameters to newly created elements
+	# Sets all carried parameters to newly created elements. Parameters which can't be set are skipped and counted
+	# by failure handler of the run
 	# For custom configuration
 	def setElementData(self, element):
-		TransactionManager.Instance.EnsureInTransaction(self.doc)
-		try:
-			element.LookupParameter("Mark").Set(self.param_Mark)
-		except:
-			pass
-		TransactionManager.Instance.TransactionTaskDone()
+		for definition, value in self.carriedParameters:
+			try:
+				element.get_Parameter(definition).Set(value)
+			except Exception as exception:
+				self.run.failureHandler.addFailure("Parameter %s not set: %s" % (definition.Name, exception),
+					"Script", "Skipped", [element.Id.IntegerValue])
 	
 	# Copies element
 	def copyElement(self):
-		TransactionManager.Instance.EnsureInTransaction(self.doc)
 		elementIdsCollection = db.ElementTransformUtils.CopyElement(self.doc, self.element.Id, db.XYZ(0,0,0))
-		TransactionManager.Instance.TransactionTaskDone()
 		# new is type of  ICollection<ElementId>, that is why have to convert it into list and get first element, 
 		# because only one element is copying 
 		return self.doc.GetElement(elementIdsCollection[0])
 
+	# Copies element numberOfCopies times. Copies are created in bulk - each CopyElements call copies the element
+	# together with all copies created so far, so number of calls grows logarithmically instead of linearly.
+	# Returns list of copies (without hosted elements copied together with them)
+	def copyElements(self, numberOfCopies):
+		copies = list()
+		sourceIds = [self.element.Id]
+		categoryId = self.getCategoryId(self.element)
+		while len(copies) < numberOfCopies:
+			sourceIds = sourceIds[:numberOfCopies - len(copies)]
+			elementIdsCollection = db.ElementTransformUtils.CopyElements(self.doc, sysList[db.ElementId](sourceIds), db.XYZ(0,0,0))
+			for elementId in elementIdsCollection:
+				element = self.doc.GetElement(elementId)
+				if self.getCategoryId(element) == categoryId:
+					copies.append(element)
+					sourceIds.append(elementId)
+		return copies
+
+	# Returns integer value of id of category of an element. None if element has no category (ie. some hosted
+	# sub-elements returned by CopyElements)
+	def getCategoryId(self, element):
+		if element.Category == None:
+			return None
+		return element.Category.Id.IntegerValue
+
 	# Deletes element
 	def deleteOriginalElement(self):
-		TransactionManager.Instance.EnsureInTransaction(self.doc)
 		self.doc.Delete(self.element.Id)
-		TransactionManager.Instance.TransactionTaskDone()
-
-	# Additional element for columns with top offset
-	def additionalElementWhileTopOffset(self, index):
-		if self.getTopOffsetValue() != 0:
-			element = self.copyElement()
-			self.setBaseOffsetValue(element, 0)
-			self.setTopOffsetValue(element, self.getTopOffsetValue())
-			self.setBaseLevel(element, self.levelIdsList[index + 1])
-			self.setTopLevel(element, self.levelIdsList[index + 1])
-			self.additionalModificationOfElement(element)
-			return element
-
-	# Create group from elements stored in self.listOfElements
-	def createGroup(self):
-		lst = list()
-		for el in self.listOfElements:
-			lst.append(el.Id)
-		newList = sysList[db.ElementId](lst)
-		TransactionManager.Instance.EnsureInTransaction(self.doc)
-		self.doc.Create.NewGroup(newList)
-		TransactionManager.Instance.TransactionTaskDone()
 
-	# General function for splitting elements
-	def splitElement(self):
-		self.getElementData()
-		if self.isElementPossibleToSplit():
-			startLevelIndex = self.getIndexOfBaseLevel()
-			endLevelIndex = self.getIndexOfTopLevel()
-			additionalElement = None
-			for i in range(startLevelIndex, endLevelIndex):
-				elementToChange = self.copyElement()
-				if i == startLevelIndex:
-					self.setBaseOffsetValue(elementToChange, self.getBaseOffsetValue())
-					self.setTopOffsetValue(elementToChange, 0)
-				elif i == endLevelIndex - 1:
-					self.setBaseOffsetValue(elementToChange, 0)
-					# optionaly two lines below might be replaced with:
-					# self.setTopOffsetValue(elementToChange, self.getTopOffsetValue())
-					self.setTopOffsetValue(elementToChange, 0)
-					additionalElement = self.additionalElementWhileTopOffset(i)
-				else:
-					self.setBaseOffsetValue(elementToChange, 0)
-					self.setTopOffsetValue(elementToChange, 0)
-					self.setElementData(elementToChange)
-				self.setBaseLevel(elementToChange, self.levelIdsList[i])
-				self.setTopLevel(elementToChange, self.levelIdsList[i+1])
-				self.additionalModificationOfElement(elementToChange)
-				self.listOfElements.append(elementToChange)
-				if additionalElement:
-					self.listOfElements.append(additionalElement)
-			self.joinElementsInList()
-			self.deleteOriginalElement()
-			if IN[2]:
-				self.createGroup()
+	# Adds elements stored in self.listOfElements to groups of the run (ElementGrouper). Groups are created at the
+	# end of the run
+	def collectGroupMembers(self, plan):
+		self.run.elementGrouper.addMembers(self, self.listOfElements, self.getGroupLevelIndices(plan))
 
-	# Joins list of elements 
-	def joinElementsInList(self):
-		TransactionManager.Instance.EnsureInTransaction(self.doc)
+	# Returns level positions of elements stored in self.listOfElements
+	def getGroupLevelIndices(self, plan):
+		return plan.getPieceLevelIndices()
+
+	# Adds pairs of neighbouring segments and pairs of segments and elements joined with the original element (ie.
+	# floors, other walls) to the geometry joiner of the run. Elements are joined at the end of the run
+	def collectJoins(self, plan):
+		geometryJoiner = self.run.geometryJoiner
 		for i in range(len(self.listOfElements) -1):
-			firstElement = self.listOfElements[i]
-			secondElement = self.listOfElements[i + 1]
-			try:
-				db.JoinGeometryUtils.JoinGeometry(self.doc, firstElement, secondElement)
-			except:
-				pass
-		TransactionManager.Instance.TransactionTaskDone()
+			geometryJoiner.addPair(self.listOfElements[i].Id, self.listOfElements[i + 1].Id)
+		segments = list()
+		for i in range(len(plan.segments)):
+			baseElevation, topElevation = self.getSegmentElevations(plan.segments[i])
+			segments.append((self.listOfElements[i].Id, baseElevation, topElevation))
+		geometryJoiner.addNeighbourPairs(geometryJoiner.getNeighbours(self.element), segments)
+		# Neighbours split before the element were joined with it by its id
+		geometryJoiner.addReplacedElement(self.element.Id, segments)
+
+	# Returns (base elevation, top elevation) of planned segment
+	def getSegmentElevations(self, segment):
+		baseElevation = self.levelIndex.elevations[segment.baseLevelIndex] + segment.baseOffset
+		topElevation = self.levelIndex.elevations[segment.topLevelIndex] + segment.topOffset
+		return baseElevation, topElevation
+
+	# Releases references to Revit elements after the plan is applied, so they can be freed
+	def releaseElements(self):
+		self.listOfElements = list()
+		self.element = None
 
 	# Adds Additional modification to element or its subelements
-	def additionalModificationOfElement(self, elementToChange):
+	def additionalModificationOfElement(self, elementToChange, segment):
 		pass
 
-	# checks if element goes trought more than
-	def isElementPossibleToSplit(self):
-		try:
-			self.modifyLevelsAndOffsets()
-			startLevelIndex = self.getIndexOfBaseLevel()
-			endLevelIndex = self.getIndexOfTopLevel()
-			if startLevelIndex + 1 == endLevelIndex:
-				return False
-			else:
-				return True
-		except:
-			return False
-		
-	# Calculates distance between levels
-	def getDistanceBetweenLevels(self, originalLevelIndex, newLevelIndex):
-		listOfLevels = self.convertListOfLevelIdsToElements()
-		return listOfLevels[originalLevelIndex].Elevation - listOfLevels[newLevelIndex].Elevation
-
-	# Converts list of levels ids to elements
-	def convertListOfLevelIdsToElements(self):
-		lst = list()
-		for levelId in self.levelIdsList:
-			lst.append(self.doc.GetElement(levelId))
-		return lst
-
-	# tries to modify element to set level as high as it is possible
-	# and reduce offset. Instead of situation: Level no 3 with offset 10m
-	# it changes elements base level ie. Level no 5 with offset -50cm 
-	def tryToModifyTopBoundries(self):
-		lst = list()
-		levels = self.convertListOfLevelIdsToElements()
-		try:
-			index = self.getIndexOfTopLevel()
-			endLevelOffset = self.getTopOffsetValue()
-		# means it's unconnected wall so treat base constraint as top with 
-		# offset as unconnected height +/- base offset value
-		except ValueError:
-			index = self.getIndexOfBaseLevel()
-			if self.getBaseOffsetValue() < 0:
-				endLevelOffset = self.getHeight() + self.getBaseOffsetValue()
-			else:
-				endLevelOffset = self.getHeight() - self.getBaseOffsetValue()
-		elementElevation = levels[index].Elevation + endLevelOffset
-		indexOfNewLevel = None
-		for i in range(len(levels)):
-			if levels[i].Elevation <= elementElevation:
-				indexOfNewLevel = i
-				lst.append(indexOfNewLevel)
-			else:
-				break
-		if indexOfNewLevel != None:
-			return self.setNewTopBoundries(index, indexOfNewLevel)
-
-	# Sets new top boundry for element
-	def setNewTopBoundries(self, levelIndex, newLevelIndex):
-		offsetDifference = self.getDistanceBetweenLevels(levelIndex, newLevelIndex)
-		# if wall is unconnected
-		if self.getTopConstraintLevelId().IntegerValue == -1:
-			newOffset = self.getHeight() + self.getBaseOffsetValue() + offsetDifference
-		# Top is constrained to level
-		else:
-			newOffset = self.getTopOffsetValue() + offsetDifference
-		newLevelId = self.levelIdsList[newLevelIndex]
-		TransactionManager.Instance.EnsureInTransaction(doc)
-		self.setTopLevel(self.element, newLevelId)
-		self.setTopOffsetValue(self.element, newOffset)
-		TransactionManager.Instance.TransactionTaskDone()
-
-	# tries to modify element to set level as low as it is possible
-	# and reduce offset. Instead of situation: Level no 3 with offset -10m
-	# it changes elements base level ie. Level no 0 with offset -50cm 
-	def tryToModifyBaseBoundries(self):
-		index = self.getIndexOfBaseLevel()
-		startLevelId = self.getBaseConstraintLevelId()
-		startLevelOffset = self.getBaseOffsetValue()
-		levels = self.convertListOfLevelIdsToElements()
-		if index != 0:
-			indexOfNewLevel = None
-			for i in range(index, 0, -1):
-				lvlIndex = i - 1
-				if startLevelOffset <= (levels[lvlIndex].Elevation - levels[index].Elevation):
-					indexOfNewLevel = lvlIndex
-				else:
-					break
-			if indexOfNewLevel != None:
-				self.setNewBaseBoundries(index, indexOfNewLevel)
-
-	# Sets new base boundry for element
-	def setNewBaseBoundries(self, levelIndex, newLevelIndex):
-		offsetDifference = self.getDistanceBetweenLevels(levelIndex, newLevelIndex)
-		newOffset = self.getBaseOffsetValue() + offsetDifference
-		newLevelId = self.levelIdsList[newLevelIndex]
-		TransactionManager.Instance.EnsureInTransaction(doc)
-		self.setBaseLevel(self.element, newLevelId)
-		self.setBaseOffsetValue(self.element, newOffset)
-		TransactionManager.Instance.TransactionTaskDone()
-	
-	# Returns index of top level on the list of levels
-	def getIndexOfTopLevel(self):
-		endLevelId = self.getTopConstraintLevelId()
-		return self.levelIdsList.index(endLevelId)
-
-	# Returns index of base level on the list of levels
-	def getIndexOfBaseLevel(self):
-		startLevelId = self.getBaseConstraintLevelId()
-		return self.levelIdsList.index(startLevelId)
+	# Adds Additional modification after all segments are created
+	def additionalModificationOfSegments(self):
+		pass
 
 
 # Class for walls
 class WallSplitter(ElementSplitter):
 
+	KIND = "Wall"
+	BUILT_IN_CATEGORIES = (db.BuiltInCategory.OST_Walls,)
+
 #GETTERS
 
 	# Returns base constraint levelId
@@ -376,15 +2214,67 @@ class WallSplitter(ElementSplitter):
 	def setTopOffsetValue(self, element, value):
 		element.get_Parameter(db.BuiltInParameter.WALL_TOP_OFFSET).Set(value)
 
-	# Due to openings neccessary to develop additional function
-	def additionalModificationOfElement(self, elementToChange):
-		objectOfOpenings = WallOpenings(self.levelIdsList, elementToChange, self.doc)
-		objectOfOpenings.deleteOpeningsNotInWallRange()
+	# Openings of the wall are read once, before the wall is copied
+	def applyPlan(self, plan):
+		if plan.isSplit:
+			self.getWallOpenings()
+		ElementSplitter.applyPlan(self, plan)
+
+	# Due to openings neccessary to develop additional function. Openings of the segment which are out of its range
+	# are collected and deleted together with openings of other segments
+	def additionalModificationOfElement(self, elementToChange, segment):
+		baseElevation, topElevation = self.getSegmentElevations(segment)
+		self.getWallOpenings().collectOpeningsOfCopy(elementToChange, baseElevation, topElevation)
+
+	# Deletes openings of all segments in one call
+	def additionalModificationOfSegments(self):
+		self.getWallOpenings().deleteCollectedOpenings()
+
+	# Openings index is released together with elements
+	def releaseElements(self):
+		ElementSplitter.releaseElements(self)
+		if hasattr(self, "wallOpenings"):
+			del self.wallOpenings
+
+	# Returns index of openings hosted in the wall. Openings are read only once per wall
+	def getWallOpenings(self):
+		if not hasattr(self, "wallOpenings"):
+			self.wallOpenings = WallOpenings(self.levelIndex, self.element, self.doc)
+		return self.wallOpenings
+
+	# Each segment gets copy of all openings and deletes these which are out of its range
+	def countOpeningsToDelete(self, plan):
+		numberOfOpenings = 0
+		for segment in plan.segments:
+			baseElevation, topElevation = self.getSegmentElevations(segment)
+			numberOfOpenings += self.getWallOpenings().countOpeningsOutOfRange(baseElevation, topElevation)
+		return numberOfOpenings
+
+	# Openings of a segment copy are collected, elevation of each opening to delete is verified
+	def estimateSegmentApiCalls(self, segment):
+		baseElevation, topElevation = self.getSegmentElevations(segment)
+		return 1 + 5 * self.getWallOpenings().countOpeningsOutOfRange(baseElevation, topElevation)
+
+	# Openings are read once and deleted in one call, copies of openings are returned by CopyElements
+	def estimateApiCalls(self, plan):
+		calls = ElementSplitter.estimateApiCalls(self, plan)
+		if plan.isSplit:
+			numberOfOpenings = len(self.getWallOpenings().allOpeningsId)
+			calls += 1 + 5 * numberOfOpenings + 1 + len(plan.segments) * numberOfOpenings
+		return calls
 
 
 # Class for structural columns and columns
 class ColumnSplitter(ElementSplitter):
 
+	KIND = "Column"
+	BUILT_IN_CATEGORIES = (db.BuiltInCategory.OST_StructuralColumns,)
+
+	# Straight columns only
+	@classmethod
+	def canSplit(cls, element):
+		return element.StructuralType == db.Structure.StructuralType.Column and not element.IsSlantedColumn
+
 #GETTERS
 
 	# Returns base constraint
@@ -396,7 +2286,7 @@ class ColumnSplitter(ElementSplitter):
 
 	# Returns unconnected height
 	def getHeight(self):
-		return self.element.LookupParameter("Length").AsDouble()
+		return parameterDefinitions.getParameter(self.element, ("Length",)).AsDouble()
 
 	# Returns top constraint levelId
 	def getTopConstraintLevelId(self):
@@ -428,404 +2318,769 @@ class ColumnSplitter(ElementSplitter):
 # Class for slanted columns
 class SlantedColumnSplitter(ColumnSplitter):
 
+	KIND = "Slanted column"
+
+	@classmethod
+	def canSplit(cls, element):
+		return element.StructuralType == db.Structure.StructuralType.Column and element.IsSlantedColumn
+
+	# Vertical extent is read from location curve
+	@classmethod
+	def getVerticalExtent(cls, element):
+		return getCurveVerticalExtent(element)
+
 #GETTERS  - inherits from parent
 	
-	# Gets data from splitting element
+	# Gets data from splitting element - carried parameters and cut styles
 	def getElementData(self):
-		self.param_Mark = self.element.LookupParameter("Mark").AsString()
+		ElementSplitter.getElementData(self)
 		self.param_BaseCutStyle = self.element.get_Parameter(db.BuiltInParameter.SLANTED_COLUMN_BASE_CUT_STYLE).AsInteger()
 		self.param_TopCutStyle = self.element.get_Parameter(db.BuiltInParameter.SLANTED_COLUMN_TOP_CUT_STYLE).AsInteger()
 
+	# Reads constraints and location curve of the column
+	def readElementRecord(self):
+		record = ColumnSplitter.readElementRecord(self)
+		elementCurve = self.element.Location.Curve
+		record.startPoint = xyzToTuple(elementCurve.GetEndPoint(0))
+		record.endPoint = xyzToTuple(elementCurve.GetEndPoint(1))
+		return record
+
 # SETTERS - inherits from parent
 	
-	# Method prepared for copying all necessary element data. Currently Mark and cut style of top and base
-	# Sets element data got in getElementData
+	# Method prepared for copying all necessary element data. Currently carried parameters and cut style of top and
+	# base. Sets element data got in getElementData
 	def setElementData(self, element):
-		TransactionManager.Instance.EnsureInTransaction(self.doc)
-		try:
-			element.LookupParameter("Mark").Set(self.param_Mark)
-		except TypeError:
-			pass
+		ElementSplitter.setElementData(self, element)
 		element.get_Parameter(db.BuiltInParameter.SLANTED_COLUMN_BASE_CUT_STYLE).Set(self.param_BaseCutStyle)
 		element.get_Parameter(db.BuiltInParameter.SLANTED_COLUMN_TOP_CUT_STYLE).Set(self.param_TopCutStyle)
-		TransactionManager.Instance.TransactionTaskDone()
-
-	# Gets difference between start and end point Z Coordinate
-	def getElementVerticalHeight(self, element):
-		if type(element) == db.ElementId:
-			element = self.doc.GetElement(element)
-		elementCurve = element.Location.Curve
-		return elementCurve.GetEndPoint(1).Z - elementCurve.GetEndPoint(0).Z
-
-	# Splits proper levels for elements which has offset different than 0
-	def setOffsetForLastElement(self, element, index, coefficient):
-		if round(coefficient, Settings.ROUNDING) > 0 and round(coefficient, Settings.ROUNDING) < 1:
-			self.setBaseLevel(element, self.levelIdsList[index + 1])
-			self.setTopLevel(element, self.levelIdsList[index + 1])
-		else:
-			self.setBaseLevel(element, self.levelIdsList[index])
-			self.setTopLevel(element, self.levelIdsList[index + 1])
-	
-	# Split slanted column by coefficient which defines ratio between start and end point of column.
-	# Returns part of eleemnt which is furthure iterated to split entire column
-	def splitSlanterColumn(self, element, index, coefficient):
-		oldElement = element
-		if round(coefficient, Settings.ROUNDING) > 0 and round(coefficient, Settings.ROUNDING) < 1:
-			TransactionManager.Instance.EnsureInTransaction(self.doc)
-			elementBeingSplit = self.doc.GetElement(element.Split(coefficient))
-			TransactionManager.Instance.TransactionTaskDone()
-			self.setBaseLevel(oldElement, self.levelIdsList[index])
-			self.setTopLevel(oldElement, self.levelIdsList[index + 1])
-			self.setElementData(oldElement)
-			return elementBeingSplit
-		else:
-			return element
 
-	# Splits slanded column by intersections with all levels
-	def splitElement(self):
+	# Cut styles are copied together with carried parameters
+	def estimateElementDataApiCalls(self):
+		return ColumnSplitter.estimateElementDataApiCalls(self) + 4
+
+	# Splits column at all planned cuts, from the top one down. Original column always keeps the part below the cut,
+	# so parameter of each cut on the remaining column is its parameter divided by parameter of the cut above. Returns
+	# pieces from the bottom one (the original column)
+	def splitSlantedColumn(self, plan):
+		pieces = list()
+		upperParameter = 1.0
+		for cut in reversed(plan.slantedCuts):
+			pieces.append(self.doc.GetElement(self.element.Split(cut.parameter / upperParameter)))
+			upperParameter = cut.parameter
+		pieces.append(self.element)
+		pieces.reverse()
+		return pieces
+
+	# Column is split in place - each cut is one Split call with constraints and data set to the lower piece
+	def estimateApiCalls(self, plan):
+		calls = 8
+		if plan.baseLevelIndex != None and plan.baseLevelIndex != plan.record.baseLevelIndex:
+			calls += 4
+		if plan.topLevelIndex != None and plan.topLevelIndex != plan.record.topLevelIndex:
+			calls += 4
+		if not plan.isSplit:
+			return calls
+		numberOfCuts = len(plan.slantedCuts)
+		# element data, cuts, and constraints and data of all pieces
+		calls += self.estimateElementDataApiCalls() + numberOfCuts * 2 \
+			+ (numberOfCuts + 1) * (4 + self.estimateElementDataApiCalls())
+		return calls
+
+	# Splits slanded column by intersections with all levels. Column is split in place, so its boundries are
+	# modified first. All cuts are made before constraints and data of pieces are set
+	def applyPlan(self, plan):
+		self.applyBoundries(plan)
+		if not plan.isSplit:
+			return
 		self.getElementData()
-		if self.isElementPossibleToSplit():
-			startLevelIndex = self.getIndexOfBaseLevel()
-			endLevelIndex = self.getIndexOfTopLevel()
-			elementBeingSplit = self.element
-			self.listOfElements.append(self.element)
-			for i in range(startLevelIndex, endLevelIndex):
-				lowerLevel = self.doc.GetElement(self.levelIdsList[i+1]).Elevation
-				higherLevel = self.doc.GetElement(self.levelIdsList[i]).Elevation
-				if i == startLevelIndex:
-					segmentLen = lowerLevel - higherLevel - self.getBaseOffsetValue()
-				elif i == endLevelIndex - 1:
-					segmentLen = lowerLevel - higherLevel + self.getTopOffsetValue()
-				else:
-					segmentLen = lowerLevel - higherLevel
-				splittingRatio = segmentLen/self.getElementVerticalHeight(elementBeingSplit)
-				elementBeingSplit = self.splitSlanterColumn(elementBeingSplit, i, splittingRatio)
-				self.listOfElements.append(elementBeingSplit)
-			try:
-				self.setOffsetForLastElement(elementBeingSplit, i, splittingRatio)
-				self.setElementData(elementBeingSplit)
-			except:
-				pass
-			if IN[2]:
-				self.createGroup()
+		pieces = self.splitSlantedColumn(plan)
+		pieceLevels = [(cut.levelIndex, cut.levelIndex + 1) for cut in plan.slantedCuts]
+		pieceLevels.append((plan.lastPieceLevelIndex, plan.topLevelIndex))
+		for piece, (baseLevelIndex, topLevelIndex) in zip(pieces, pieceLevels):
+			self.setBaseLevel(piece, self.levelIdsList[baseLevelIndex])
+			self.setTopLevel(piece, self.levelIdsList[topLevelIndex])
+			self.setElementData(piece)
+		self.listOfElements.extend(pieces)
+		if IN[2]:
+			self.collectGroupMembers(plan)
+
+
+# Connector stored in ConnectorHash together with its origin and rank given by splitter
+class HashedConnector(object):
+
+	__slots__ = ("connector", "origin", "rank")
+
+	def __init__(self, connector, origin, rank):
+		self.connector = connector
+		self.origin = origin
+		self.rank = rank
+
+# Spatial hash of connectors. Connectors are put into cubic cells of size equal to tolerance, so connectors which
+# are closer than tolerance are found by checking only neighbouring cells. Origin of each connector is read once
+class ConnectorHash():
+
+	def __init__(self, tolerance = Settings.ELEVATION_TOL):
+		self.tolerance = tolerance
+		self.cells = dict()
+		self.connectors = list()
+
+	# Returns cell of a point
+	def getCell(self, point):
+		return tuple([int(math.floor(coordinate / self.tolerance)) for coordinate in point])
+
+	# Adds connector to the hash
+	def add(self, connector, rank):
+		hashedConnector = HashedConnector(connector, xyzToTuple(connector.Origin), rank)
+		cell = self.getCell(hashedConnector.origin)
+		if cell not in self.cells:
+			self.cells[cell] = list()
+		self.cells[cell].append(len(self.connectors))
+		self.connectors.append(hashedConnector)
+
+	# Returns list of (HashedConnector, HashedConnector) pairs closer than tolerance. Each pair is returned once
+	def getCoincidentPairs(self):
+		pairs = list()
+		for i in range(len(self.connectors)):
+			origin = self.connectors[i].origin
+			x, y, z = self.getCell(origin)
+			for dx in (-1, 0, 1):
+				for dy in (-1, 0, 1):
+					for dz in (-1, 0, 1):
+						for j in self.cells.get((x + dx, y + dy, z + dz), ()):
+							if j > i and pointDistance(origin, self.connectors[j].origin) <= self.tolerance:
+								pairs.append((self.connectors[i], self.connectors[j]))
+		return pairs
 
 
 # Abstract class for MEP elements which is inherited by certain MEP categories
 class MEPElementSplitter(ElementSplitter):
-	
+
+	# Vertical extent is read from location curve
+	@classmethod
+	def getVerticalExtent(cls, element):
+		return getCurveVerticalExtent(element)
+
+	# Merges pieces of joint recorded in LevelState into the lower piece - union and upper piece are deleted, lower
+	# piece is extended to the end of upper piece and connected to its neighbours. Returns merged element or None if
+	# pieces don't exist or don't meet at the joint any more
+	@classmethod
+	def mergeJoint(cls, doc, lowerId, unionId, upperId, z):
+		lower = doc.GetElement(db.ElementId(lowerId))
+		upper = doc.GetElement(db.ElementId(upperId))
+		if not isinstance(lower, db.MEPCurve) or not isinstance(upper, db.MEPCurve):
+			return None
+		lowerPoints = sorted([lower.Location.Curve.GetEndPoint(i) for i in range(2)], key = lambda point: abs(point.Z - z))
+		upperPoints = sorted([upper.Location.Curve.GetEndPoint(i) for i in range(2)], key = lambda point: abs(point.Z - z))
+		if lowerPoints[0].DistanceTo(upperPoints[0]) > Settings.OFFSET_TOLERANCE:
+			return None
+		# neighbours connected to the far end of upper piece
+		neighbours = list()
+		connectorManager = upper.ConnectorManager
+		for i in range(2):
+			connector = connectorManager.Lookup(i)
+			if connector.Origin.DistanceTo(upperPoints[1]) > Settings.ELEVATION_TOL:
+				continue
+			for reference in connector.AllRefs:
+				if reference.Owner.Id.IntegerValue not in (lowerId, unionId, upperId):
+					neighbours.append(reference)
+					connector.DisconnectFrom(reference)
+		idsToDelete = [upper.Id]
+		if doc.GetElement(db.ElementId(unionId)) != None:
+			idsToDelete.append(db.ElementId(unionId))
+		doc.Delete(sysList[db.ElementId](idsToDelete))
+		if lower.Location.Curve.GetEndPoint(0).DistanceTo(lowerPoints[1]) <= Settings.ELEVATION_TOL:
+			lower.Location.Curve = db.Line.CreateBound(lowerPoints[1], upperPoints[1])
+		else:
+			lower.Location.Curve = db.Line.CreateBound(upperPoints[1], lowerPoints[1])
+		if neighbours:
+			doc.Regenerate()
+			connectorManager = lower.ConnectorManager
+			for i in range(2):
+				connector = connectorManager.Lookup(i)
+				if connector.Origin.DistanceTo(upperPoints[1]) <= Settings.ELEVATION_TOL:
+					for neighbour in neighbours:
+						connector.ConnectTo(neighbour)
+		return lower
+
+	# Reads start and end point of location curve of the element. With snapshot also ids of connected curves (in
+	# risers mode they are added by riser index). Records read by riser index are not read again
+	def readElementRecord(self):
+		riserIndex = self.run.riserIndex
+		if riserIndex != None and riserIndex.hasRecord(self.element.Id.IntegerValue):
+			return riserIndex.popRecord(self.element.Id.IntegerValue)
+		record = ElementRecord(self.element.Id.IntegerValue, self.KIND)
+		elementCurve = self.element.Location.Curve
+		record.startPoint = xyzToTuple(elementCurve.GetEndPoint(0))
+		record.endPoint = xyzToTuple(elementCurve.GetEndPoint(1))
+		if Settings.SNAPSHOT_FILE != None:
+			record.connectedIds = self.getConnectedCurveIds()
+		return record
+
+	# Returns ids of MEP curves connected with the element directly or through a fitting with two connectors
+	# (ie. union)
+	def getConnectedCurveIds(self):
+		curveIds = list()
+		connectorManager = self.element.ConnectorManager
+		for i in range(2):
+			for reference in self.getConnectedCurveConnectors(connectorManager.Lookup(i)):
+				curveIds.append(reference.Owner.Id.IntegerValue)
+		return curveIds
+
+	# Returns connectors of MEP curves connected with given connector of the element directly or through a fitting
+	# with two connectors
+	def getConnectedCurveConnectors(self, connector):
+		curveConnectors = list()
+		for reference in connector.AllRefs:
+			owner = reference.Owner
+			if owner.Id == self.element.Id:
+				continue
+			if isinstance(owner, db.MEPCurve):
+				curveConnectors.append(reference)
+			else:
+				curveConnectors.extend(self.getCurveConnectorsBehindFitting(owner, reference))
+		return curveConnectors
+
+	# Returns connectors of MEP curves connected to other connector of fitting than given one. Only fittings with two
+	# connectors are passed
+	def getCurveConnectorsBehindFitting(self, fitting, fittingConnector):
+		curveConnectors = list()
+		try:
+			connectors = list(fitting.MEPModel.ConnectorManager.Connectors)
+		except AttributeError:
+			return curveConnectors
+		if len(connectors) != 2:
+			return curveConnectors
+		for connector in connectors:
+			if connector.Id == fittingConnector.Id:
+				continue
+			for reference in connector.AllRefs:
+				if isinstance(reference.Owner, db.MEPCurve) and reference.Owner.Id != self.element.Id:
+					curveConnectors.append(reference)
+		return curveConnectors
+
 	# Main function which splits an element into many elements with assigned level and parameters. For electrical
 	# element first think which must be done is disconnection of start and end connectors. In case of other
-	# instalation it is ommited. Than function checks if is it possible to split an element if so starts iteration
-	# trought list of levels to get all cut points - which are intersection points between level plane and line of
-	# an element
-	def splitElement(self):
-		self.getConnectedElements()
+	# instalation it is ommited. Than element is cut in all planned cut points - which are intersection points
+	# between level plane and line of an element. Pieces are assigned to levels and connected with unions
+	def applyPlan(self, plan):
+		if self.cutPieces(plan):
+			self.doc.Regenerate()
+			self.connectElements()
+			if IN[2]:
+				self.collectGroupMembers(plan)
+
+	# Applies plans of segments of one riser (splitters and plans sorted from the lowest segment). All segments are
+	# cut first and geometry is regenerated once for the whole riser, then pieces of each segment are connected at
+	# its cuts
+	def applyRiserPlans(self, splitters, plans):
+		splitPositions = list()
+		for i in range(len(splitters)):
+			if splitters[i].cutPieces(plans[i]):
+				splitPositions.append(i)
+		if splitPositions:
+			self.doc.Regenerate()
+		for i in splitPositions:
+			splitters[i].connectPiecesAtCuts(plans[i])
+			if IN[2]:
+				splitters[i].collectGroupMembers(plans[i])
+
+	# Cuts the element in planned cut points and assigns pieces to levels - pieces are kept in listOfElements from
+	# the lowest one. Returns False if the element is not split
+	def cutPieces(self, plan):
+		self.MODELING_STYLE = plan.modelingStyle
+		if not plan.isSplit:
+			if plan.baseLevelIndex != None:
+				self.setBaseLevel(self.element, self.levelIdsList[plan.baseLevelIndex])
+			return False
 		self.disconnectElement()
-		if not self.isElementPossibleToSplit():
-			return self.setBaseLevelToElement(self.element)
 		elementToSplit = self.element
-		for level in self.listLevels:
-			levelElevation = level.ProjectElevation
-			if elementToSplit == None:
-				break
-			elif levelElevation > self.startPoint.Z + Settings.OFFSET_TOLERANCE and levelElevation + Settings.ELEVATION_TOL < self.endPoint.Z:
-				elementToSplit = self.splitVerticalElement(elementToSplit, level)
+		for cut in plan.cuts:
+			lowerElement, elementToSplit = self.cutElement(elementToSplit, cut)
+			self.setBaseLevel(lowerElement, self.levelIdsList[cut.lowerLevelIndex])
+			self.listOfElements.append(lowerElement)
+		if plan.cuts:
+			self.setBaseLevel(elementToSplit, self.levelIdsList[plan.lastPieceLevelIndex])
 		self.listOfElements.append(elementToSplit)
-		# Additional method dedicated for conection of electrical elements due to lack of breakCurve method for electrical elements
-		if self.element.GetType() == db.Electrical.CableTray or self.element.GetType() == db.Electrical.Conduit:
-				self.connectElements()
-		if IN[2]:
-			self.createGroup()
-
-	# Implementation in ElectricalElementsSplitter 
+		return True
+
+	# Each cut is one BreakCurve call and level of lower piece. Connectors of pieces are read once at the end
+	def estimateApiCalls(self, plan):
+		if not plan.isSplit:
+			if plan.baseLevelIndex != None:
+				return 2
+			return 0
+		numberOfPieces = len(plan.cuts) + 1
+		# cuts and level of last piece
+		calls = len(plan.cuts) * self.estimateCutApiCalls() + 2
+		# Segment of riser shares regeneration with the riser and reads about two and a half calls for connector at cut
+		if self.isAppliedInRiser(plan):
+			return calls + len(plan.cuts) * 5 + len(plan.cuts)
+		# regeneration, connectors of pieces, their origins and unions
+		calls += 1 + numberOfPieces * 2 * 2 + len(plan.cuts)
+		return calls
+
+	# Returns True if plan is applied together with other segments of its riser (applyRiserPlans)
+	def isAppliedInRiser(self, plan):
+		return self.run.riserIndex != None and self.run.riserIndex.getRiser(plan.record.elementId) != None
+
+	# Returns estimated number of API calls of one cut (cutElement and level of lower piece)
+	def estimateCutApiCalls(self):
+		return 4
+
+	# Connects pieces of the element. Connector origins are read from geometry regenerated after the cuts and
+	# coincident connectors are found in spatial hash. Pieces are connected with unions, other connectors (neighbours of
+	# electrical elements) with union or directly, if union can't be created (counted by failure handler of the run).
+	# Rank of piece of each union is kept in unionRanks, joints of pieces are added to level state of the run
 	def connectElements(self):
-		pass
-	
+		self.unionRanks = list()
+		levelState = self.run.levelState
+		connectorHash = ConnectorHash()
+		# Rank is position of piece from the bottom, neighbours get -1
+		for rank in range(len(self.listOfElements)):
+			connectorManager = self.listOfElements[rank].ConnectorManager
+			# All MEP elements splitted by this script has only two connectors
+			for i in range(2):
+				connectorHash.add(connectorManager.Lookup(i), rank)
+		for connector in self.getConnectorsToReconnect():
+			connectorHash.add(connector, -1)
+		for first, second in connectorHash.getCoincidentPairs():
+			if first.rank == second.rank or (first.rank == -1 and second.rank == -1):
+				continue
+			lower, upper = sorted((first, second), key = lambda x : x.rank)
+			if lower.rank != -1:
+				union = self.createNewUnion(lower.connector, upper.connector)
+				self.unionRanks.append(lower.rank)
+				if levelState != None:
+					levelState.addJoint(self.listOfElements[lower.rank].Id.IntegerValue, union.Id.IntegerValue,
+						self.listOfElements[upper.rank].Id.IntegerValue, lower.origin[2])
+				continue
+			try:
+				self.createNewUnion(lower.connector, upper.connector)
+				self.unionRanks.append(upper.rank)
+			except Exception as exception:
+				lower.connector.ConnectTo(upper.connector)
+				self.run.failureHandler.addFailure("Union not created: %s" % exception, "Script",
+					"Connected directly", [self.listOfElements[upper.rank].Id.IntegerValue])
+
+	# Connects pieces of segment of riser with unions. Pieces are vertical and follow each other from the lowest one,
+	# so connectors at each cut are found by elevation of the cut - the first connector of piece is read with its
+	# origin and the other one only if the first one is not at the cut. Geometry has to be regenerated after the cuts
+	def connectPiecesAtCuts(self, plan):
+		self.unionRanks = list()
+		levelState = self.run.levelState
+		# rank of piece : (its first connector, elevation of the connector)
+		firstConnectors = dict()
+		def getConnectorAt(rank, z):
+			if rank not in firstConnectors:
+				connector = self.listOfElements[rank].ConnectorManager.Lookup(0)
+				firstConnectors[rank] = (connector, connector.Origin.Z)
+			connector, connectorZ = firstConnectors[rank]
+			if abs(connectorZ - z) <= Settings.ELEVATION_TOL:
+				return connector
+			return self.listOfElements[rank].ConnectorManager.Lookup(1)
+		for rank in range(len(plan.cuts)):
+			z = plan.cuts[rank].cutPoint[2]
+			union = self.createNewUnion(getConnectorAt(rank, z), getConnectorAt(rank + 1, z))
+			self.unionRanks.append(rank)
+			if levelState != None:
+				levelState.addJoint(self.listOfElements[rank].Id.IntegerValue, union.Id.IntegerValue,
+					self.listOfElements[rank + 1].Id.IntegerValue, z)
+
+	# Unions get level of the piece below them (or above them, if they are connected to a neighbour below)
+	def getGroupLevelIndices(self, plan):
+		pieceLevelIndices = plan.getPieceLevelIndices()
+		return pieceLevelIndices + [pieceLevelIndices[rank] for rank in self.unionRanks]
+
+	# Connectors of neighbours are released together with elements
+	def releaseElements(self):
+		ElementSplitter.releaseElements(self)
+		self.connectorsToJoin = list()
+		self.connections = list()
+		self.unionRanks = list()
+
+	# Returns connectors of neighbours which have to be connected again to pieces. Implementation in
+	# ElectricalElementsSplitter
+	def getConnectorsToReconnect(self):
+		return []
+
 	# Implementation in ElectricalElementsSplitter 
 	def disconnectElement(self):
 		pass
 
-	# Get connected elements to the element and adds it to a instance variable connectorsToJoin (list)
+	# Get connected elements to the element and adds it to a instance variable connectorsToJoin (list). Pairs of
+	# (connector of the element, connector of neighbour) are kept in connections
 	def getConnectedElements(self):
 		self.connectorsToJoin = list()
+		self.connections = list()
 		# CableTrays always have 2 connectors
 		connectorManager = self.element.ConnectorManager
 		for i in range(2):
-			for j in connectorManager.Lookup(i).AllRefs:
+			connector = connectorManager.Lookup(i)
+			for j in connector.AllRefs:
 				if j.Owner.Id != self.element.Id:
 					self.connectorsToJoin.append(j)
+					self.connections.append((connector, j))
 
-	# Assign levelId to each of MEP element in the list. levelId is assinged to level parameter of an element
-	def assignLevelsToElements(self, elements):
-		for element in elements:
-			self.setBaseLevelToElement(element)
-
-	# Assign levelId to an element. LevelId is assinged to level parameter of an element
-	def setBaseLevelToElement(self, element):
-		elementCurve = element.Location.Curve
+	# Cuts element in planned cut point. Returns tuple (element below cut point, element above cut point)
+	def cutElement(self, elementToSplit, cut):
+		newElement = self.doc.GetElement(self.breakCurve(elementToSplit.Id, tupleToXYZ(cut.cutPoint)))
+		# New element starts in the start point of the curve
 		if self.MODELING_STYLE == "TopToDown":
-			elementStartPoint = elementCurve.GetEndPoint(0)
-		else:
-			elementStartPoint = elementCurve.GetEndPoint(1)
-		for level in self.listLevels:
-			elevation = level.ProjectElevation
-			if self.listLevels.index(level) == 0 and elementStartPoint < elevation:
-				self.setBaseLevel(element, self.levelIdsList[0])
-
-	# Splits element but calculated point. Point Z coordinate is calculate base on level
-	def splitVerticalElement(self, elementToSplit, cutLevel):
-		tempElementCurve = elementToSplit.Location.Curve
-		endPoint = tempElementCurve.GetEndPoint(1)
-		startPoint = tempElementCurve.GetEndPoint(0)
-		vectorFromStartPointToEndPoint = endPoint - startPoint
-		proportionOfDistanceToCutLocation = math.fabs(startPoint.Z - cutLevel.ProjectElevation)/startPoint.DistanceTo(endPoint)
-		cutPoint = startPoint + vectorFromStartPointToEndPoint * proportionOfDistanceToCutLocation
-		return self.cutElementAndAssignUnionsPlusLevels(elementToSplit, cutPoint)
-
-	# checkes if element is almost vertical, it check is horizontal distance ratio between top and down in order 
-	# to vertical distance is less than 0.0001
-	def checkIfElementIsAlmostVertical(self):
-		verticalLength = math.fabs(self.endPoint.Z - self.startPoint.Z)
-		horizontalLength = math.sqrt(math.fabs(self.endPoint.X - self.startPoint.X)**2 + math.fabs(self.endPoint.Y - self.startPoint.Y)**2)
-		try:
-			if horizontalLength/verticalLength <= Settings.VERTICAL_RATIO:
-				return True
-			else:
-				return False
-		#In case if two elements are at the same elevation
-		except ZeroDivisionError:
-			return False
+			return elementToSplit, newElement
+		return newElement, elementToSplit
 
-	# checks style of a MEP element is it model from Top to Down or from Down to Top and assignes parameter
-	def setElementModelingStyle(self):
-		location = self.element.Location.Curve
-		originalStart = location.GetEndPoint(0)
-		originalEnd = location.GetEndPoint(1)
-		if originalStart.Z > originalEnd.Z:
-			self.MODELING_STYLE = "TopToDown"
-			self.startPoint = originalEnd
-			self.endPoint = originalStart
-		else:
-			self.MODELING_STYLE = "DownToTop"
-			self.startPoint = originalStart
-			self.endPoint = originalEnd
-
-	# Checks if elements is possible to split (if cuts at least one level)
-	def isElementPossibleToSplit(self):
-		self.setElementModelingStyle()
-		if not self.checkIfElementIsAlmostVertical():
-			return False
-		for level in self.listLevels:
-			levelElevation = level.ProjectElevation
-			if self.startPoint.Z < levelElevation and self.endPoint.Z > levelElevation + Settings.ELEVATION_TOL:
-				return True
-			else:
-				continue
-		if self.startPoint.Z < levelElevation and self.endPoint.Z > levelElevation + Settings.ELEVATION_TOL:
-				return True
-		return False
-	
-	#GETTERS
-	# Returns base constraint levelId
-	def getBaseConstraintLevelId(self):
-		return self.element.get_Parameter(db.BuiltInParameter.RBS_START_LEVEL_PARAM).AsElementId()
-
-	# Returns base offset value
-	def getBaseOffsetValue(self):
-		return self.element.get_Parameter(db.BuiltInParameter.RBS_START_OFFSET_PARAM).AsDouble()
+	# Implementation in DuctSplitter and PipeSplitter. Returns id of newly created element
+	def breakCurve(self, elementId, cutPoint):
+		pass
 
 	#SETTERS
 	# Sets base constraint level based on level Id
 	def setBaseLevel(self, element, levelId):
-		TransactionManager.Instance.EnsureInTransaction(self.doc)
 		element.get_Parameter(db.BuiltInParameter.RBS_START_LEVEL_PARAM).Set(levelId)
-		TransactionManager.Instance.TransactionTaskDone()
-		return 
-
-	# Sets base level to an element
-	def setNewBaseBoundries(self, levelIndex, newLevelIndex):
-		offsetDifference = self.getDistanceBetweenLevels(levelIndex, newLevelIndex)
-		newLevelId = self.levelIdsList[newLevelIndex]
-		TransactionManager.Instance.EnsureInTransaction(doc)
-		self.setBaseLevel(self.element, newLevelId)
-		TransactionManager.Instance.TransactionTaskDone()
-
-	# Adds a union between connectors
-	def createNewUnion(self, newConnector, oldConnector):
-		TransactionManager.Instance.EnsureInTransaction(self.doc)
-		# It is important due to a assignment of proper level to the newly created union
-		if self.MODELING_STYLE == "TopToDown":
-			union = self.doc.Create.NewUnionFitting(oldConnector, newConnector)
-		else:
-			union = self.doc.Create.NewUnionFitting(newConnector, oldConnector)
-		TransactionManager.Instance.TransactionTaskDone()
-		self.listOfElements.append(union)
-
-	# Search for a common connector location between two elements. It runs method for creation of new union when 
-	# 2 connectors in the same location are found
-	def insertUnion(self, newElement, elementToSplit):
-		newElementManager = newElement.ConnectorManager
-		oldElementManager = elementToSplit.ConnectorManager
-		# All MEP elements splitted by this script has only two connectors
-		for i in range(2):
-			for j in range(2):
-				newConnector = newElementManager.Lookup(i)
-				oldConnector = oldElementManager.Lookup(j)
-				if newConnector.Origin.IsAlmostEqualTo(oldConnector.Origin):
-					self.createNewUnion(newConnector, oldConnector)
-
-	# Function returns Z coordinate of start and end point of linear MEP element
-	def getStartEndZCoordinateTuple(self, element):
-		elementCurve = element.Location.Curve
-		point_1 = elementCurve.GetEndPoint(0).Z
-		point_2 = elementCurve.GetEndPoint(1).Z
-		if point_1 < point_2:
-			return (point_1, point_2)
-		else:
-			return (point_2, point_1)
-
-	# Assigns element to most level where it is located in a model - description of conditions inside the method
-	def assignProperLevelToElement(self, element):
-		# Due to modeling style TopDown or DownTop location of an element might cause issue. That is why coordinates
-		# variable is created. It gets start point as a point with less Z coordinate 
-		coordinates = self.getStartEndZCoordinateTuple(element)
-		startPoint = coordinates[0]
-		endPoint = coordinates[1]
-		for level in self.listLevels:
-			elevation = level.ProjectElevation
-			levelIndex = self.listLevels.index(level)
-			# levels are sorted by elevation in ascending order. Condition checks if start point is located close
-			# to an level. If so it breaks the iteration and sets found level as host level
-			if elevation + Settings.ELEVATION_TOL > startPoint and elevation - Settings.ELEVATION_TOL < startPoint:
-				break
-			# The same as condition for start point. But in case of end point levelIndex is decreased by one (if 
-			# levelIndex != 0), because element has its start point somewhere between levelIndex and levelIndex - 1,
-			# so levelIndex - 1 is choosen.
-			elif elevation + Settings.ELEVATION_TOL > endPoint and elevation - Settings.ELEVATION_TOL < endPoint:
-				if levelIndex != 0 and not (startPoint > elevation and endPoint >= elevation):
-					levelIndex = levelIndex - 1
-				break
-		self.setBaseLevel(element, self.levelIdsList[levelIndex])
 
-	# The method assigns elements into level where they belongs to. Moreover after assignment it runs addUnion
-	# method which connect the elements. 
-	def assignElementsToLevelsAndAddUnion(self, newElement, elementToSplit):
-		if elementToSplit != None:
-			self.assignProperLevelToElement(elementToSplit)
-		if newElement != None:
-			self.assignProperLevelToElement(newElement)
-		if newElement != None:
-			self.insertUnion(newElement, elementToSplit)
+	# Adds a union between connectors. Union gets level of the element which is below
+	def createNewUnion(self, lowerConnector, upperConnector):
+		union = self.doc.Create.NewUnionFitting(lowerConnector, upperConnector)
+		self.listOfElements.append(union)
+		return union
 
 
 # Class dedicated for Ducts. 
 # Inheritst from ElementSplitter -> MEPElementSplitter -> DuctSplitter
 class DuctSplitter(MEPElementSplitter):
 
-	# Function splits duct into two elements. Returning element which might require further splitting
-	def cutElementAndAssignUnionsPlusLevels(self, elementToSplit, cutPoint):
-		TransactionManager.Instance.EnsureInTransaction(self.doc)
-		newElementId = db.Mechanical.MechanicalUtils.BreakCurve(self.doc, elementToSplit.Id, cutPoint)
-		newElement = self.doc.GetElement(newElementId)
-		self.listOfElements.append(newElement)
-		TransactionManager.Instance.TransactionTaskDone()
-		self.assignElementsToLevelsAndAddUnion(newElement, elementToSplit)
-		if self.MODELING_STYLE == "TopToDown":
-			self.listOfElements.append(elementToSplit)
-			return newElement
-		return elementToSplit
+	KIND = "Duct"
+	BUILT_IN_CATEGORIES = (db.BuiltInCategory.OST_DuctCurves,)
+
+	# Function splits duct into two elements. Returns id of new element
+	def breakCurve(self, elementId, cutPoint):
+		return db.Mechanical.MechanicalUtils.BreakCurve(self.doc, elementId, cutPoint)
 
 
 # Class dedicated for Pipes (not conduits). 
 # Inheritst from ElementSplitter -> MEPElementSplitter -> PipeSplitter
 class PipeSplitter(MEPElementSplitter):
 
-	# Function splits pipe into two elements. Returning element which might require further splitting
-	def cutElementAndAssignUnionsPlusLevels(self, elementToSplit, cutPoint):
-		TransactionManager.Instance.EnsureInTransaction(self.doc)
-		newElementId = db.Plumbing.PlumbingUtils.BreakCurve(self.doc, elementToSplit.Id, cutPoint)
-		newElement = self.doc.GetElement(newElementId)
-		self.listOfElements.append(newElement)
-		TransactionManager.Instance.TransactionTaskDone()
-		self.assignElementsToLevelsAndAddUnion(newElement, elementToSplit)
-		if self.MODELING_STYLE == "TopToDown":
-			self.listOfElements.append(elementToSplit)
-			return newElement
-		return elementToSplit
+	KIND = "Pipe"
+	BUILT_IN_CATEGORIES = (db.BuiltInCategory.OST_PipeCurves,)
+
+	# Function splits pipe into two elements. Returns id of new element
+	def breakCurve(self, elementId, cutPoint):
+		return db.Plumbing.PlumbingUtils.BreakCurve(self.doc, elementId, cutPoint)
 
 
 # Class dedicated for splitting conduits and cableTrays. 
 # Inheritst from ElementSplitter -> MEPElementSplitter -> ElectricalElementsSplitter
 class ElectricalElementsSplitter(MEPElementSplitter):
 
-	# Function splits cableTray/conduit into two elements. Returning element which might require further splitting
-	# Depending upon location style points are selected in 2 two ways
-	def cutElementAndAssignUnionsPlusLevels(self, elementToSplit, cutPoint):
-		TransactionManager.Instance.EnsureInTransaction(self.doc)
-		if self.MODELING_STYLE == "TopToDown":
-			elementToSplitLine = db.Line.CreateBound(self.element.Location.Curve.GetEndPoint(0), cutPoint)
-			newElementLine = db.Line.CreateBound(cutPoint, self.element.Location.Curve.GetEndPoint(1))
-		else:
-			elementToSplitLine = db.Line.CreateBound(cutPoint, self.element.Location.Curve.GetEndPoint(1))
-			newElementLine = db.Line.CreateBound(self.element.Location.Curve.GetEndPoint(0), cutPoint)
+	KIND = "CableTray/Conduit"
+	BUILT_IN_CATEGORIES = (db.BuiltInCategory.OST_CableTray, db.BuiltInCategory.OST_Conduit)
+
+	# Function splits cableTray/conduit into two elements - original element is shortened to the part above cut
+	# point and its copy gets the part below. Returns tuple (element below cut point, element above cut point)
+	def cutElement(self, elementToSplit, cut):
+		elementToSplitLine = db.Line.CreateBound(tupleToXYZ(cut.upperPiece[0]), tupleToXYZ(cut.upperPiece[1]))
+		newElementLine = db.Line.CreateBound(tupleToXYZ(cut.lowerPiece[0]), tupleToXYZ(cut.lowerPiece[1]))
 		newElement = self.copyElement()
-		self.listOfElements.append(newElement)
 		elementToSplit.Location.Curve = elementToSplitLine
 		newElement.Location.Curve = newElementLine
-		self.assignElementsToLevels(elementToSplit, newElement)
-		TransactionManager.Instance.TransactionTaskDone()
-		return elementToSplit
-
-	# There is no way to predict location of union in cableTrays, that is why 
-	# decided to implement additional functionality - connectElements, which does it
-	# after full split of elements into sepate db.Elements
-	def assignElementsToLevels(self, newElement, elementToSplit):
-		if elementToSplit != None:
-			self.assignProperLevelToElement(elementToSplit)
-		if newElement != None:
-			self.assignProperLevelToElement(newElement)
-
-	# Adds iterate trought all created elements (cableTrays or conduits)
-	# gets connectors and adds it to instance variable self.connectorsToJoin.
-	def addAllConnectorsToTheList(self):
-		for element in self.listOfElements:
-			connectorsList = list(element.ConnectorManager.Connectors)
-			for connector in connectorsList:
-				self.connectorsToJoin.append(connector)
-
-	# Connects all newly created cableTray/Conduit elements. Method is sorts connectors ordered by elevation and tries 
-	# to insert union. If insertion of union returns exception it means there is required connection with fitting - so
-	# union is not necessary
-	def connectElements(self):
-		self.addAllConnectorsToTheList()
-		sortedByLevel = sorted(self.connectorsToJoin, key = lambda x : x.Origin.Z)
-		for connectorIndex in range(len(sortedByLevel) - 1):
-			mainConnector = sortedByLevel[connectorIndex]
-			# Get next item in list
-			connectorToCheck = sortedByLevel[connectorIndex + 1]
-			if mainConnector.Origin.IsAlmostEqualTo(connectorToCheck.Origin):
-				try:
-					if self.MODELING_STYLE == "TopToDown":
-						self.createNewUnion(connectorToCheck, mainConnector)
-					else:
-						self.createNewUnion(mainConnector, connectorToCheck)
-				except:
-					TransactionManager.Instance.EnsureInTransaction(self.doc)
-					mainConnector.ConnectTo(connectorToCheck)
-					TransactionManager.Instance.TransactionTaskDone
+		return newElement, elementToSplit
 
+	# Each cut copies element, creates two lines and sets curves of both pieces
+	def estimateCutApiCalls(self):
+		return 8
+
+	# Neighbours of each segment of riser are disconnected before its cuts and connected to its pieces again, so
+	# segments are applied one after another
+	def applyRiserPlans(self, splitters, plans):
+		for i in range(len(splitters)):
+			splitters[i].applyPlan(plans[i])
+
+	# Segments of riser are applied one by one (applyRiserPlans)
+	def isAppliedInRiser(self, plan):
+		return False
+
+	# Disconnection of neighbours is added to the estimation of other MEP elements
+	def estimateApiCalls(self, plan):
+		calls = MEPElementSplitter.estimateApiCalls(self, plan)
+		# connected elements and their disconnection
+		if plan.isSplit:
+			calls += 4 + 2
+		return calls
+
+	# Connectors of neighbours were disconnected before the split. Pieces get them back in connectElements - with
+	# union if it is possible. If insertion of union returns exception it means there is required connection with
+	# fitting - so union is not necessary
+	def getConnectorsToReconnect(self):
+		return self.connectorsToJoin
 
 	# Disconnects electrical elements from fitting for splitting process. The method is neccessary, because otherwise
-	# top elements remembers and holds connection with fitting
+	# top elements remembers and holds connection with fitting. Connections are read once, so each of them is
+	# disconnected without checking other connectors
 	def disconnectElement(self):
-		connectorManager = self.element.ConnectorManager
-		for connectorIndex in range(2):
-			connectorOfOriginalElement = connectorManager.Lookup(connectorIndex)
-			for connectorToDisconnect in self.connectorsToJoin:
-				if connectorOfOriginalElement.IsConnectedTo(connectorToDisconnect):
-					TransactionManager.Instance.EnsureInTransaction(self.doc)
-					connectorOfOriginalElement.DisconnectFrom(connectorToDisconnect)
-					TransactionManager.Instance.TransactionTaskDone()
+		self.getConnectedElements()
+		for connectorOfOriginalElement, connectorToDisconnect in self.connections:
+			connectorOfOriginalElement.DisconnectFrom(connectorToDisconnect)
+
+# Registry of splitter classes. Each class is registered for type of Revit element (GetType()). Selected elements
+# are partitioned into batches by splitter class, batches are split in order of registration
+class SplitterRegistry():
+
+	def __init__(self):
+		# type : list of splitter classes registered for it
+		self.classesOfType = dict()
+		self.splitterClasses = list()
+
+	# Registers splitter class for type of element. Splitter class which splits only some elements of the type
+	# overrides canSplit
+	def register(self, elementType, splitterClass):
+		if elementType not in self.classesOfType:
+			self.classesOfType[elementType] = list()
+		self.classesOfType[elementType].append(splitterClass)
+		if splitterClass not in self.splitterClasses:
+			self.splitterClasses.append(splitterClass)
+
+	# Returns splitter class for element or None if element can't be split
+	def getSplitterClass(self, element):
+		try:
+			elementType = element.GetType()
+		except TypeError:
+			return None
+		for splitterClass in self.classesOfType.get(elementType, ()):
+			if splitterClass.canSplit(element):
+				return splitterClass
+		return None
+
+	# Returns list of categories of all registered splitter classes
+	def getBuiltInCategories(self):
+		categories = list()
+		for splitterClass in self.splitterClasses:
+			for category in splitterClass.BUILT_IN_CATEGORIES:
+				if category not in categories:
+					categories.append(category)
+		return categories
+
+	# Returns list of (splitter class, list of elements) in order of registration. Classes without elements are
+	# skipped
+	def partition(self, elements):
+		batches = dict()
+		for element in elements:
+			splitterClass = self.getSplitterClass(element)
+			if splitterClass != None:
+				if splitterClass not in batches:
+					batches[splitterClass] = list()
+				batches[splitterClass].append(element)
+		return [(splitterClass, batches[splitterClass]) for splitterClass in self.splitterClasses if splitterClass in batches]
+
+# Registry used by the run. Splitters of other categories can be registered here, ie.
+# splitterRegistry.register(db.Floor, FloorSplitter)
+splitterRegistry = SplitterRegistry()
+splitterRegistry.register(db.Wall, WallSplitter)
+splitterRegistry.register(db.FamilyInstance, ColumnSplitter)
+splitterRegistry.register(db.FamilyInstance, SlantedColumnSplitter)
+splitterRegistry.register(db.Mechanical.Duct, DuctSplitter)
+splitterRegistry.register(db.Plumbing.Pipe, PipeSplitter)
+splitterRegistry.register(db.Electrical.CableTray, ElectricalElementsSplitter)
+splitterRegistry.register(db.Electrical.Conduit, ElectricalElementsSplitter)
+
+# Rejects elements which don't cross any level before splitters are created (Settings.LEVEL_CROSSING_FILTER).
+# Vertical extents of all elements of a splitter class are read first and tested against project elevations of
+# levels in one pass - with numpy if it is available. Element crosses a level if the level is above its bottom and
+# below its top by more than ELEVATION_TOL. Elements without extent are kept
+class LevelCrossingFilter():
+
+	# Smaller lists are tested without numpy, as its overhead is bigger than the gain
+	NUMPY_MIN_ELEMENTS = 64
+
+	def __init__(self, levelIndex):
+		self.levelIndex = levelIndex
+		# KIND of splitter class : number of rejected elements
+		self.numberOfRejected = dict()
+
+	# Returns elements of splitter class which cross at least one level. Rejected elements are counted by category
+	def filter(self, splitterClass, elements):
+		extents = [splitterClass.getVerticalExtent(element) for element in elements]
+		if numpy != None and len(elements) >= self.NUMPY_MIN_ELEMENTS:
+			crossing = self.areCrossingWithNumpy(extents)
+		else:
+			crossing = self.areCrossing(extents)
+		crossingElements = [elements[i] for i in range(len(elements)) if crossing[i]]
+		numberOfRejected = len(elements) - len(crossingElements)
+		self.numberOfRejected[splitterClass.KIND] = self.numberOfRejected.get(splitterClass.KIND, 0) + numberOfRejected
+		return crossingElements
+
+	# Elements rejected by the filter which are split anyway (segments of risers) are not counted as rejected
+	def restore(self, splitterClass, numberOfElements):
+		self.numberOfRejected[splitterClass.KIND] -= numberOfElements
+
+	# Returns table of elements skipped in the run - not crossing levels by category and done in previous runs
+	# (ProgressJournal). None if no element was skipped
+	def getSkipReport(self, numberOfDoneElements = 0):
+		report = [["Skipped elements", "Category", "Elements"]]
+		for kind in sorted(self.numberOfRejected):
+			if self.numberOfRejected[kind] > 0:
+				report.append(["Not crossing levels", kind, self.numberOfRejected[kind]])
+		if numberOfDoneElements > 0:
+			report.append(["Done in previous runs", "", numberOfDoneElements])
+		if len(report) == 1:
+			return None
+		return report
+
+	# Returns list of booleans - True if extent crosses a level
+	def areCrossing(self, extents):
+		crossing = list()
+		for extent in extents:
+			if extent == None:
+				crossing.append(True)
+			else:
+				levels = self.levelIndex.levelsCrossing(extent[0] + Settings.ELEVATION_TOL,
+					extent[1] - Settings.ELEVATION_TOL, True)
+				crossing.append(len(levels) > 0)
+		return crossing
+
+	# The same as areCrossing, levels above bottoms and below tops are found for all extents at once
+	def areCrossingWithNumpy(self, extents):
+		elevations = numpy.array(self.levelIndex.projectElevations, dtype = float)
+		bounds = numpy.array([extent if extent != None else (numpy.nan, numpy.nan) for extent in extents], dtype = float)
+		firstLevel = numpy.searchsorted(elevations, bounds[:, 0] + Settings.ELEVATION_TOL, "right")
+		lastLevel = numpy.searchsorted(elevations, bounds[:, 1] - Settings.ELEVATION_TOL, "left")
+		crossing = (lastLevel > firstLevel) | numpy.isnan(bounds[:, 0])
+		return crossing.tolist()
+
+# Risers of selected MEP elements (Settings.MEP_RISERS) found in the whole selection before it is divided into
+# planning batches, so each riser is planned and applied as a whole. Records of MEP elements are read here once and
+# kept until their batch is planned. Risers are walked along connectors from vertical elements - to selected curves
+# of the same kind on the same vertical line, connected directly or through a fitting with two connectors. Only the
+# far connector of each reached segment is read. Selected segments which don't cross levels (LevelCrossingFilter)
+# are read only when they are reached, they keep joints of their riser
+class RiserIndex():
+
+	def __init__(self, run):
+		self.run = run
+		self.mepCutEngine = MEPCutEngine(run.levelIndex)
+		# element id : record which is not planned yet (None if element can't be read)
+		self.records = dict()
+		# element id : ids of segments of its riser sorted from the lowest one
+		self.risers = dict()
+		# Ids of selected elements which are read only if they are reached by a riser
+		self.otherIds = set()
+
+	# Reads records of elements of MEP splitter class and finds their risers. Other elements of the class are added
+	# only as segments of risers. Returns ids of elements - segments of each riser follow each other from the lowest
+	# one, at position of the first segment of the riser in elements
+	def addElements(self, splitterClass, elements, otherElements = ()):
+		self.otherIds = set([element.Id.IntegerValue for element in otherElements])
+		for element in elements:
+			self.records[element.Id.IntegerValue] = splitterClass(self.run, element).getElementRecord()
+		walkedIds = set()
+		for element in elements:
+			record = self.records[element.Id.IntegerValue]
+			if record != None and record.elementId not in walkedIds and self.mepCutEngine.isVertical(record):
+				riser = self.walkRiser(splitterClass, element, record)
+				walkedIds.update([segment.elementId for segment in riser])
+				if len(riser) > 1:
+					lowZ = lambda segment : min(segment.startPoint[2], segment.endPoint[2])
+					riserIds = tuple([segment.elementId for segment in sorted(riser, key = lowZ)])
+					for elementId in riserIds:
+						self.risers[elementId] = riserIds
+		elementIds = list()
+		orderedRisers = set()
+		for element in elements:
+			riserIds = self.getRiser(element.Id.IntegerValue)
+			if riserIds == None:
+				elementIds.append(element.Id.IntegerValue)
+			elif riserIds[0] not in orderedRisers:
+				orderedRisers.add(riserIds[0])
+				elementIds.extend(riserIds)
+		self.otherIds = set()
+		return elementIds
+
+	# Returns records of segments of riser of vertical element. Both connectors of the element are followed, from
+	# each reached segment only its other connector. Connected segments are linked in connectedIds of their records,
+	# so the riser is found again by MEPCutEngine when it is planned
+	def walkRiser(self, splitterClass, element, record):
+		riser = [record]
+		connectorManager = element.ConnectorManager
+		connectors = [(record, connectorManager.Lookup(0)), (record, connectorManager.Lookup(1))]
+		while connectors:
+			segmentRecord, connector = connectors.pop()
+			for reference in splitterClass(self.run, connector.Owner).getConnectedCurveConnectors(connector):
+				nextId = reference.Owner.Id.IntegerValue
+				nextRecord = self.records.get(nextId)
+				if nextId in self.otherIds:
+					self.otherIds.discard(nextId)
+					nextRecord = splitterClass(self.run, reference.Owner).getElementRecord()
+				if nextRecord == None or nextRecord in riser or nextRecord.kind != record.kind \
+					or not self.mepCutEngine.isVertical(nextRecord) or not self.mepCutEngine.areCollinear(record, nextRecord):
+					continue
+				self.records[nextId] = nextRecord
+				self.linkRecords(segmentRecord, nextRecord)
+				riser.append(nextRecord)
+				# Connectors of MEP curves are 0 and 1
+				connectors.append((nextRecord, reference.Owner.ConnectorManager.Lookup(1 - reference.Id)))
+		return riser
+
+	# Adds ids of connected records to their connectedIds
+	def linkRecords(self, firstRecord, secondRecord):
+		for record, connectedId in ((firstRecord, secondRecord.elementId), (secondRecord, firstRecord.elementId)):
+			if record.connectedIds == None:
+				record.connectedIds = list()
+			if connectedId not in record.connectedIds:
+				record.connectedIds.append(connectedId)
+
+	# Returns True if record of the element was read and is not planned yet
+	def hasRecord(self, elementId):
+		return elementId in self.records
+
+	# Returns record of the element read by addElements. Record is kept only until it is planned
+	def popRecord(self, elementId):
+		return self.records.pop(elementId)
+
+	# Returns ids of segments of riser of the element or None if element is not a segment of riser
+	def getRiser(self, elementId):
+		return self.risers.get(elementId)
+
+	# Divides ids ordered by addElements into planning batches of batchSize ids. Riser is never divided between
+	# batches, so batch ending with a riser can be bigger
+	def getBatches(self, elementIds, batchSize):
+		batches = [list()]
+		i = 0
+		while i < len(elementIds):
+			numberOfIds = len(self.risers.get(elementIds[i], (elementIds[i],)))
+			if batches[-1] and len(batches[-1]) + numberOfIds > batchSize:
+				batches.append(list())
+			batches[-1].extend(elementIds[i:i + numberOfIds])
+			i += numberOfIds
+		return batches
+
+	# Returns position after the last splitter of riser of splitter at given position (splitters of riser follow
+	# each other). For element which is not a segment of riser it is the next position
+	def getRiserEnd(self, splitters, start):
+		riserIds = self.getRiser(splitters[start].element.Id.IntegerValue)
+		stop = start + 1
+		while riserIds != None and stop < len(splitters) and splitters[stop].element.Id.IntegerValue in riserIds:
+			stop += 1
+		return stop
+
+# Reads records of all splitters and returns their plans in the same order. Records are planned together, so MEP
+# elements are planned in one batch. Records are added to snapshot if it is given. Document is not modified
+def planSplits(splitters, planner, snapshot = None):
+	plans = [None] * len(splitters)
+	records = list()
+	positions = list()
+	for i in range(len(splitters)):
+		record = splitters[i].getElementRecord()
+		if record == None:
+			plans[i] = splitters[i].getEmptyPlan()
+		else:
+			records.append(record)
+			positions.append(i)
+	if snapshot != None:
+		snapshot.addRecords(records)
+	plannedRecords = planner.planMany(records)
+	for i in range(len(positions)):
+		plans[positions[i]] = plannedRecords[i]
+	return plans
 
 # Converts selected in IN[0] node elements into list. No matter if there is only
 # one or multiple input elements
@@ -835,37 +3090,273 @@ def getlistOfElements():
 	else:
 		return [IN[0]]
 
+# Returns list of Revit elements (db.Element) wrapped by selected dynamo elements. Inputs which are not elements,
+# elements deleted since they were selected (e.g. merged in incremental run) and elements done in previous runs
+# (recorded in journal) are skipped
+def getListOfRevitElements(journal = None):
+	revitElements = list()
+	for elementToSplit in getlistOfElements():
+		try:
+			if journal != None and journal.isDone(elementToSplit.Id):
+				journal.numberOfSkippedElements += 1
+				continue
+		except AttributeError:
+			continue
+		try:
+			revitElement = elementToSplit.InternalElement
+		except AttributeError:
+			try:
+				revitElement = doc.GetElement(db.ElementId(elementToSplit.Id))
+			except AttributeError:
+				continue
+		if revitElement != None and revitElement.IsValidObject:
+			revitElements.append(revitElement)
+	return revitElements
+
+
+# Returns list of Revit elements of categories of registered splitters which bounding boxes intersect any level of
+# level index (Settings.COLLECT_ELEMENTS) or given project elevations. Elements are filtered by Revit - by
+# categories, by two flat outlines just below and above each elevation and optionally by workset or phase. Elements done in previous
+# runs (recorded in journal) are skipped
+def collectElements(doc, levelIndex, splitterRegistry, journal = None, elevations = None):
+	categories = splitterRegistry.getBuiltInCategories()
+	if elevations == None:
+		elevations = levelIndex.projectElevations
+	if len(elevations) == 0 or not categories:
+		return []
+	levelFilters = list()
+	for elevation in elevations:
+		# Element passes both flat outlines only if it reaches past the level, elements which only touch it are skipped
+		crossingFilters = list()
+		for z in (elevation - Settings.ELEVATION_TOL, elevation + Settings.ELEVATION_TOL):
+			outline = db.Outline(db.XYZ(-Settings.COLLECTOR_EXTENT, -Settings.COLLECTOR_EXTENT, z),
+				db.XYZ(Settings.COLLECTOR_EXTENT, Settings.COLLECTOR_EXTENT, z))
+			crossingFilters.append(db.BoundingBoxIntersectsFilter(outline))
+		levelFilters.append(db.LogicalAndFilter(crossingFilters[0], crossingFilters[1]))
+	collector = db.FilteredElementCollector(doc).WhereElementIsNotElementType()
+	collector = collector.WherePasses(db.ElementMulticategoryFilter(sysList[db.BuiltInCategory](categories)))
+	if Settings.COLLECTOR_WORKSET_ID != None:
+		collector = collector.WherePasses(db.ElementWorksetFilter(db.WorksetId(Settings.COLLECTOR_WORKSET_ID)))
+	if Settings.COLLECTOR_PHASE_ID != None:
+		collector = collector.WherePasses(db.ElementPhaseStatusFilter(db.ElementId(Settings.COLLECTOR_PHASE_ID),
+			db.ElementOnPhaseStatus.New))
+	collector = collector.WherePasses(db.LogicalOrFilter(sysList[db.ElementFilter](levelFilters)))
+	revitElements = list()
+	for element in collector.ToElements():
+		if journal != None and journal.isDone(element.Id.IntegerValue):
+			journal.numberOfSkippedElements += 1
+			continue
+		revitElements.append(element)
+	return revitElements
+
+
+# Returns elements split in incremental run (LevelState). MEP elements are merged at joints on levels moved or
+# removed since the last run (only counted in dry run), merged elements are split again together with elements
+# collected around levels added or moved since the last run
+def getElementsAroundChangedLevels(doc, levelState, levelIndex, splitterRegistry):
+	oldElevations, newElevations = levelState.getChangedElevations(levelIndex)
+	joints = levelState.getJointsOnElevations(oldElevations)
+	elements = list()
+	if isDryRun:
+		splitForecast.numberOfJointsToMerge = len(joints)
+	else:
+		# id of deleted upper piece : id of lower piece it was merged into, so joints above are merged in chain
+		mergedIds = dict()
+		for joint in joints:
+			lowerId, unionId, upperId, z = joint
+			lowerId = mergedIds.get(lowerId, lowerId)
+			transactionScope.start()
+			element = MEPElementSplitter.mergeJoint(doc, lowerId, unionId, upperId, z)
+			if element != None:
+				mergedIds[upperId] = lowerId
+				elements = [mergedElement for mergedElement in elements if mergedElement.Id.IntegerValue != lowerId]
+				elements.append(element)
+			# Joint is removed from the state when the merge is committed
+			levelState.removeJoints([joint])
+			transactionScope.elementDone()
+	mergedIds = set([element.Id.IntegerValue for element in elements])
+	for element in collectElements(doc, levelIndex, splitterRegistry, elevations = newElevations):
+		if element.Id.IntegerValue not in mergedIds:
+			elements.append(element)
+	return elements
+
 
 # #### RUNS HERE ####
-for elementToSplit in getlistOfElements():
-	try:
-		# Converts dynamo element into db.Element (from revit API)
-		revitElement = doc.GetElement(db.ElementId(elementToSplit.Id))
-	except AttributeError:
-		continue		
-	try:
-		elementType = revitElement.GetType()
-	except TypeError:
-		elementType = None
-	element = None
-	if elementType == db.Wall:
-		element = WallSplitter(doc, revitElement)
-	elif elementType == db.FamilyInstance:
-		# Depending upon structural type of column most suitable class is used for
-		# element creation
-		structuralType = revitElement.StructuralType
-		if structuralType == db.Structure.StructuralType.Column and not revitElement.IsSlantedColumn:
-			element = ColumnSplitter(doc, revitElement)
-		elif structuralType == db.Structure.StructuralType.Column and revitElement.IsSlantedColumn:
-			element = SlantedColumnSplitter(doc, revitElement)
-	elif elementType == db.Mechanical.Duct:
-		element = DuctSplitter(doc, revitElement)
-	elif elementType == db.Plumbing.Pipe:
-		element = PipeSplitter(doc, revitElement)
-	elif elementType == db.Electrical.CableTray or elementType == db.Electrical.Conduit:
-		element = ElectricalElementsSplitter(doc, revitElement)
-	# If class instance was created element is splitted
-	if element != None:
-		element.splitElement()
-
-OUT = "done"
\ No newline at end of file
+# Optional IN[3] - dry run. Elements are only planned and forecast of the run is returned
+isDryRun = len(IN) > 3 and IN[3] == True
+profiler = None
+if Settings.PROFILE:
+	profiler = Profiler()
+	profiledClasses = [TransactionScope, FailureHandler, ParameterDefinitions, GeometryJoiner, ElementGrouper, LevelCrossingFilter, RiserIndex, LevelState, SplitPlanner, PlanningPool, MEPCutEngine, ConnectorHash,
+		WallOpenings, ElementSplitter, MEPElementSplitter]
+	# Registered splitters, including splitters of other categories
+	for splitterClass in splitterRegistry.splitterClasses:
+		if splitterClass not in profiledClasses:
+			profiledClasses.append(splitterClass)
+	profiler.instrument(profiledClasses)
+run = SplitRun(doc, IN[1])
+transactionScope = TransactionScope(doc)
+transactionScope.failureHandler = run.failureHandler
+splitForecast = SplitForecast(transactionScope)
+planner = SplitPlanner(run.levelIndex)
+if Settings.PLANNING_WORKERS > 1:
+	planner = PlanningPool(planner, Settings.PLANNING_WORKERS)
+snapshot = None
+if Settings.SNAPSHOT_FILE != None:
+	snapshot = ModelSnapshot()
+	snapshot.setLevels(run.levelIndex)
+journal = None
+if Settings.JOURNAL_FILE != None:
+	journal = ProgressJournal(Settings.JOURNAL_FILE, doc)
+	# Element is recorded only together with its joins and groups, journal is written after each commit
+	transactionScope.beforeCommit.append(run.geometryJoiner.joinAll)
+	if IN[2]:
+		transactionScope.beforeCommit.append(run.elementGrouper.createGroups)
+	transactionScope.afterCommit.append(journal.flush)
+	transactionScope.afterRollBack.append(journal.discard)
+if run.levelState != None:
+	transactionScope.afterCommit.append(run.levelState.commit)
+	transactionScope.afterRollBack.append(run.levelState.rollBack)
+if Settings.CHUNK_REGENERATE:
+	transactionScope.beforeCommit.append(doc.Regenerate)
+if Settings.CHUNK_COLLECT_GARBAGE:
+	transactionScope.afterCommit.append(gc.collect)
+
+# Plans splits of a batch of elements before the document is modified and applies them. Segments of one riser are
+# applied together and count as one element of transaction scope. In dry run plans are only added to the forecast
+def splitBatch(splitters):
+	plans = planSplits(splitters, planner, snapshot)
+	i = 0
+	while i < len(splitters):
+		stop = i + 1
+		if run.riserIndex != None:
+			stop = run.riserIndex.getRiserEnd(splitters, i)
+		if profiler != None:
+			profiler.elementClass = splitters[i].__class__.__name__
+		if isDryRun:
+			for j in range(i, stop):
+				splitForecast.addPlan(splitters[j], plans[j])
+		else:
+			transactionScope.start()
+			if stop - i > 1:
+				splitters[i].applyRiserPlans(splitters[i:stop], plans[i:stop])
+			else:
+				splitters[i].applyPlan(plans[i])
+			for j in range(i, stop):
+				if journal != None:
+					journal.elementDone(splitters[j], plans[j])
+				splitters[j].releaseElements()
+			transactionScope.elementDone()
+		i = stop
+
+# Failures of transactions of the run are handled by the script. Dry run doesn't modify the document
+failureHandler = run.failureHandler
+if Settings.FAILURE_HANDLING and not isDryRun:
+	failureHandler.attach()
+# When the run fails, changes of the element which failed are rolled back and handler is detached, so it doesn't
+# handle failures of other transactions
+try:
+	# Selected elements are split in batches of one splitter class
+	levelState = run.levelState
+	selectedElements = list()
+	if levelState != None and levelState.isIncremental():
+		selectedElements = getElementsAroundChangedLevels(doc, levelState, run.levelIndex, splitterRegistry)
+	# In incremental run selected (or collected) elements are split too, after elements around changed levels were
+	# merged. Elements found in both are split once
+	incrementalIds = set([element.Id.IntegerValue for element in selectedElements])
+	if Settings.COLLECT_ELEMENTS:
+		otherElements = collectElements(doc, run.levelIndex, splitterRegistry, journal)
+	else:
+		otherElements = getListOfRevitElements(journal)
+	selectedElements += [element for element in otherElements if element.Id.IntegerValue not in incrementalIds]
+	otherElements = None
+	if journal != None:
+		splitForecast.numberOfDoneElements = journal.numberOfSkippedElements
+	# Only ids of elements are kept for the run, elements are got from the document again when their batch is split
+	levelCrossingFilter = LevelCrossingFilter(run.levelIndex)
+	batches = list()
+	for splitterClass, elements in splitterRegistry.partition(selectedElements):
+		numberOfElements = len(elements)
+		rejectedElements = list()
+		if Settings.LEVEL_CROSSING_FILTER:
+			crossingElements = levelCrossingFilter.filter(splitterClass, elements)
+			if len(crossingElements) < numberOfElements:
+				crossingIds = set([element.Id.IntegerValue for element in crossingElements])
+				rejectedElements = [element for element in elements if element.Id.IntegerValue not in crossingIds]
+			elements = crossingElements
+		# Risers are found in all selected elements of the class and their segments are kept in one planning batch.
+		# Segments which don't cross levels are split with their riser
+		if run.riserIndex != None and issubclass(splitterClass, MEPElementSplitter):
+			elementIds = run.riserIndex.addElements(splitterClass, elements, rejectedElements)
+			if len(elementIds) > len(elements):
+				levelCrossingFilter.restore(splitterClass, len(elementIds) - len(elements))
+				riserIds = set(elementIds)
+				rejectedElements = [element for element in rejectedElements if element.Id.IntegerValue not in riserIds]
+		else:
+			elementIds = [element.Id.IntegerValue for element in elements]
+		if Settings.LEVEL_CROSSING_FILTER:
+			splitForecast.addFilteredElements(splitterClass, numberOfElements, len(rejectedElements))
+			# Records of elements which don't cross levels are read only for snapshot, so it holds all elements
+			if snapshot != None and rejectedElements:
+				records = [splitterClass(run, element).getElementRecord() for element in rejectedElements]
+				snapshot.addRecords([record for record in records if record != None])
+		batches.append((splitterClass, elementIds))
+	selectedElements = None
+	elements = None
+	rejectedElements = None
+	for splitterClass, elementIds in batches:
+		if run.riserIndex != None and issubclass(splitterClass, MEPElementSplitter):
+			idBatches = run.riserIndex.getBatches(elementIds, Settings.PLANNING_BATCH_SIZE)
+		else:
+			idBatches = [elementIds[i:i + Settings.PLANNING_BATCH_SIZE] for i in range(0, len(elementIds), Settings.PLANNING_BATCH_SIZE)]
+		for batchIds in idBatches:
+			# Elements deleted since they were selected are skipped
+			elements = [doc.GetElement(db.ElementId(elementId)) for elementId in batchIds]
+			splitBatch([splitterClass(run, element) for element in elements if element != None])
+
+	if snapshot != None:
+		snapshot.write(Settings.SNAPSHOT_FILE)
+
+	if isDryRun:
+		OUT = splitForecast.getReport()
+	else:
+		if profiler != None:
+			profiler.elementClass = "Run"
+		# Segments of all split elements are joined and grouped together in one transaction
+		geometryJoiner = run.geometryJoiner
+		elementGrouper = run.elementGrouper
+		if geometryJoiner.pairs or elementGrouper.keys:
+			transactionScope.start()
+			geometryJoiner.joinAll()
+			elementGrouper.createGroups()
+		transactionScope.finish()
+		# State is not written after rollback, so the next run finds the same changes of levels again
+		if levelState != None and transactionScope.numberOfRolledBackTransactions == 0:
+			levelState.write(run.levelIndex)
+finally:
+	transactionScope.abort()
+	failureHandler.detach()
+	# Workers of planning pool are stopped also when planning fails
+	if isinstance(planner, PlanningPool):
+		planner.close()
+if not isDryRun:
+	# Tables of skipped elements, failed joins and failures of the run are returned next to the result
+	numberOfDoneElements = 0
+	if journal != None:
+		numberOfDoneElements = journal.numberOfSkippedElements
+	reports = [report for report in (levelCrossingFilter.getSkipReport(numberOfDoneElements),
+		run.geometryJoiner.getFailureReport(), failureHandler.getFailureReport()) if report != None]
+	# Failure handler rolled back all transactions or some of them
+	if transactionScope.numberOfRolledBackTransactions == 0:
+		OUT = "done"
+	elif transactionScope.numberOfRolledBackTransactions == transactionScope.numberOfTransactions:
+		OUT = "rolled back"
+	else:
+		OUT = "partially done - %d transactions rolled back" % transactionScope.numberOfRolledBackTransactions
+	if reports:
+		OUT = [OUT] + reports
+
+if profiler != None and Settings.PROFILE_FILE != None:
+	profiler.writeSummary(Settings.PROFILE_FILE)
+elif profiler != None:
+	OUT = [OUT, profiler.getSummary()]
\ No newline at end of file